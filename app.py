@@ -1,17 +1,18 @@
 # app.py
+import logging
+
 from flask import render_template
 from project import create_app
 
-print("🔥 USING THIS APP.PY:", __file__)
-
 # Use the REAL create_app inside project/__init__.py
 app = create_app()
 
 app.config['PROPAGATE_EXCEPTIONS'] = True
+logging.getLogger(__name__).info("using app.py", extra={"file": __file__})
 
 @app.route('/', methods=['GET'])
 def Home():
-    print(">>> HOME ROUTE REACHED <<<")
+    logging.getLogger(__name__).debug("home route reached")
     return render_template('index.html')
 
 if __name__ == '__main__':
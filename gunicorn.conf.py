@@ -0,0 +1,44 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn wsgi:app` (see Procfile).
+import os
+
+# Concurrency mode. "sync" (default) gives each request a whole worker
+# process. "gevent" lets one worker overlap many I/O waits -- DB round trips
+# to ClearDB, the Resend call in confirm_final, open SSE seat streams --
+# which PyMySQL supports because it is pure Python on patched sockets.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+
+if worker_class == "gevent":
+    # Patch before the app is imported (preload imports it in the master),
+    # otherwise locks created at import time stay real thread locks.
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    # Max concurrent requests per worker. Keep DB_POOL_SIZE + DB_MAX_OVERFLOW
+    # in line with this; greenlets beyond the pool wait on DB_POOL_TIMEOUT.
+    worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+# Build the app once in the master and fork it into workers, so imports,
+# blueprint registration and template setup aren't repeated per worker.
+# Set GUNICORN_PRELOAD=0 to go back to per-worker app loading.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Workers and bind address keep gunicorn's defaults, which already honour
+# WEB_CONCURRENCY and PORT on Heroku.
+# With more than one worker (Heroku sets WEB_CONCURRENCY by dyno size),
+# set PUBSUB_URL=redis://... so cache invalidations reach every worker;
+# without it each worker logs a warning and relies on the cache TTLs.
+
+
+def post_fork(server, worker):
+    # Pooled DB connections must never be shared across processes, and
+    # the log writer thread didn't survive the fork.
+    from wsgi import app
+    from project import dispose_engines
+    from project.logs import after_fork
+    from project.pubsub import warn_if_unshared
+
+    dispose_engines(app)
+    after_fork()
+    warn_if_unshared(server.cfg.workers)
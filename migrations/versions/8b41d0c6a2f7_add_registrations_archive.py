@@ -0,0 +1,37 @@
+"""Add registrations_archive table
+
+Revision ID: 8b41d0c6a2f7
+Revises: 3e2f1c1b89da
+Create Date: 2026-10-19 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '8b41d0c6a2f7'
+down_revision = '3e2f1c1b89da'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'registrations_archive',
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('registration_id', sa.String(10)),
+        sa.Column('exam_id', sa.Integer, nullable=False),
+        sa.Column('user_id', sa.Integer, nullable=False),
+        sa.Column('timeslot_id', sa.Integer),
+        sa.Column('location_id', sa.Integer),
+        sa.Column('registration_date', sa.DateTime),
+        sa.Column('status', sa.Enum('Active', 'Canceled')),
+        sa.Column('archived_at', sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_index('ix_reg_archive_user', 'registrations_archive', ['user_id'])
+    op.create_index('ix_reg_archive_exam', 'registrations_archive', ['exam_id'])
+    op.create_index('ix_reg_archive_regid', 'registrations_archive', ['registration_id'])
+
+
+def downgrade():
+    op.drop_table('registrations_archive')
@@ -0,0 +1,23 @@
+"""Add locations.max_seats (room limit for exam capacity)
+
+Revision ID: a4e7c0d2b958
+Revises: f3d9b6e81a27
+Create Date: 2026-10-19 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a4e7c0d2b958'
+down_revision = 'f3d9b6e81a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('locations', sa.Column('max_seats', sa.Integer, nullable=True))
+
+
+def downgrade():
+    op.drop_column('locations', 'max_seats')
@@ -0,0 +1,40 @@
+"""Add booking_events (append-only booking audit log)
+
+Revision ID: b6f1d3e8a047
+Revises: a4e7c0d2b958
+Create Date: 2026-10-19 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b6f1d3e8a047'
+down_revision = 'a4e7c0d2b958'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'booking_events',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('registration_id', sa.Integer, nullable=False),
+        sa.Column('user_id', sa.Integer, nullable=False),
+        sa.Column('exam_id', sa.Integer, nullable=False),
+        sa.Column('location_id', sa.Integer, nullable=True),
+        sa.Column('timeslot_id', sa.Integer, nullable=True),
+        sa.Column('from_location_id', sa.Integer, nullable=True),
+        sa.Column('from_timeslot_id', sa.Integer, nullable=True),
+        sa.Column('kind', sa.String(10), nullable=False),
+        sa.Column('actor_id', sa.Integer, nullable=True),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_index('ix_booking_events_user', 'booking_events', ['user_id', 'id'])
+    op.create_index('ix_booking_events_session', 'booking_events', ['exam_id', 'location_id', 'id'])
+    op.create_index('ix_booking_events_registration', 'booking_events', ['registration_id'])
+    # Existing registrations: run `flask booking-events-backfill` after upgrading.
+
+
+def downgrade():
+    op.drop_table('booking_events')
@@ -0,0 +1,40 @@
+"""Unique (exam_id, user_id) on registrations
+
+schema_prod.sql always had the key (unnamed, so MySQL called it
+``exam_id``); databases built from the models did not. Name it
+uq_registrations_exam_user, unless an equivalent unique key is already
+there.
+
+Revision ID: b8e3d5f0a614
+Revises: e4a9c6b2f158
+Create Date: 2026-10-19 23:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b8e3d5f0a614'
+down_revision = 'e4a9c6b2f158'
+branch_labels = None
+depends_on = None
+
+NAME = 'uq_registrations_exam_user'
+COLUMNS = ['exam_id', 'user_id']
+
+
+def _existing():
+    inspector = sa.inspect(op.get_bind())
+    keys = inspector.get_unique_constraints('registrations')
+    keys += [ix for ix in inspector.get_indexes('registrations') if ix.get('unique')]
+    return {key['name']: key['column_names'] for key in keys}
+
+
+def upgrade():
+    if COLUMNS not in _existing().values():
+        op.create_unique_constraint(NAME, 'registrations', COLUMNS)
+
+
+def downgrade():
+    if NAME in _existing():
+        op.drop_constraint(NAME, 'registrations', type_='unique')
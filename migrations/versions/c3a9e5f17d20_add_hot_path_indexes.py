@@ -0,0 +1,55 @@
+"""Add composite indexes for the hot registration/exam queries
+
+Revision ID: c3a9e5f17d20
+Revises: 8b41d0c6a2f7
+Create Date: 2026-10-19 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c3a9e5f17d20'
+down_revision = '8b41d0c6a2f7'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns)
+INDEXES = [
+    # seat counts: COUNT(*) ... WHERE exam_id = ? AND location_id = ? AND status = 'Active'
+    ('ix_reg_exam_loc_status', 'registrations', ['exam_id', 'location_id', 'status']),
+    # 3-active limit / duplicate checks: WHERE user_id = ? AND status = 'Active' [AND exam_id = ?]
+    ('ix_reg_user_status_exam', 'registrations', ['user_id', 'status', 'exam_id']),
+    # JOIN buildings b ON b.location_id = l.id
+    ('ix_buildings_location', 'buildings', ['location_id']),
+    # ORDER BY exam_date, id with keyset paging
+    ('ix_exams_date_id', 'exams', ['exam_date', 'id']),
+]
+
+# Left-most prefix of ix_reg_user_status_exam, so it only costs writes.
+SUPERSEDED = ('ix_reg_user_status', 'registrations', ['user_id', 'status'])
+
+
+def _existing(table):
+    return {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing(table):
+            op.create_index(name, table, columns)
+
+    name, table, _ = SUPERSEDED
+    if name in _existing(table):
+        op.drop_index(name, table_name=table)
+
+
+def downgrade():
+    name, table, columns = SUPERSEDED
+    if name not in _existing(table):
+        op.create_index(name, table, columns)
+
+    for name, table, _ in reversed(INDEXES):
+        if name in _existing(table):
+            op.drop_index(name, table_name=table)
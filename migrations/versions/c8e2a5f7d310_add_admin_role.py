@@ -0,0 +1,32 @@
+"""Add the admin role (admin_ui blueprint)
+
+Revision ID: c8e2a5f7d310
+Revises: b6f1d3e8a047
+Create Date: 2026-10-19 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c8e2a5f7d310'
+down_revision = 'b6f1d3e8a047'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    exists = conn.execute(sa.text("SELECT 1 FROM roles WHERE name = 'admin'")).first()
+    if not exists:
+        conn.execute(sa.text("INSERT INTO roles (name) VALUES ('admin')"))
+    # Promote an account with `flask grant-admin EMAIL`.
+
+
+def downgrade():
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        "UPDATE users SET role_id = (SELECT id FROM roles WHERE name = 'faculty') "
+        "WHERE role_id = (SELECT id FROM roles WHERE name = 'admin')"
+    ))
+    conn.execute(sa.text("DELETE FROM roles WHERE name = 'admin'"))
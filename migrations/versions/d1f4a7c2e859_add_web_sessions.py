@@ -0,0 +1,33 @@
+"""Add web_sessions (server-side session store)
+
+Revision ID: d1f4a7c2e859
+Revises: c8e2a5f7d310
+Create Date: 2026-10-19 19:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+revision = 'd1f4a7c2e859'
+down_revision = 'c8e2a5f7d310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'web_sessions',
+        sa.Column('id',
+                  sa.String(43).with_variant(
+                      mysql.VARCHAR(43, charset='ascii', collation='ascii_bin'), 'mysql'),
+                  primary_key=True),
+        sa.Column('data', sa.LargeBinary, nullable=False),
+        sa.Column('expires_at', sa.Integer, nullable=False),
+    )
+    op.create_index('ix_web_sessions_expires', 'web_sessions', ['expires_at'])
+
+
+def downgrade():
+    op.drop_table('web_sessions')
@@ -0,0 +1,31 @@
+"""Add checkins table for the exam-day kiosk
+
+Revision ID: d5b8f2a4c913
+Revises: c3a9e5f17d20
+Create Date: 2026-10-19 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd5b8f2a4c913'
+down_revision = 'c3a9e5f17d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'checkins',
+        sa.Column('registration_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('location_id', sa.Integer, nullable=False),
+        sa.Column('exam_date', sa.Date, nullable=False),
+        sa.Column('checked_in_at', sa.DateTime, nullable=False),
+        sa.Column('checked_in_by', sa.Integer),
+    )
+    op.create_index('ix_checkins_location_date', 'checkins', ['location_id', 'exam_date'])
+
+
+def downgrade():
+    op.drop_table('checkins')
@@ -0,0 +1,35 @@
+"""Claim reminders before sending (status 'Sending', claimed_by/claimed_at)
+
+Revision ID: e4a9c6b2f158
+Revises: d1f4a7c2e859
+Create Date: 2026-10-19 21:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e4a9c6b2f158'
+down_revision = 'd1f4a7c2e859'
+branch_labels = None
+depends_on = None
+
+OLD_STATUS = sa.Enum('Queued', 'Sent', 'Failed', 'Skipped')
+NEW_STATUS = sa.Enum('Queued', 'Sending', 'Sent', 'Failed', 'Skipped')
+
+
+def upgrade():
+    op.alter_column('reminders', 'status', existing_type=OLD_STATUS, type_=NEW_STATUS,
+                    existing_nullable=False, existing_server_default='Queued')
+    op.add_column('reminders', sa.Column('claimed_by', sa.String(32), nullable=True))
+    op.add_column('reminders', sa.Column('claimed_at', sa.DateTime, nullable=True))
+    op.create_index('ix_reminders_claimed_by', 'reminders', ['claimed_by'])
+
+
+def downgrade():
+    op.drop_index('ix_reminders_claimed_by', table_name='reminders')
+    op.execute("UPDATE reminders SET status = 'Queued' WHERE status = 'Sending'")
+    op.drop_column('reminders', 'claimed_at')
+    op.drop_column('reminders', 'claimed_by')
+    op.alter_column('reminders', 'status', existing_type=NEW_STATUS, type_=OLD_STATUS,
+                    existing_nullable=False, existing_server_default='Queued')
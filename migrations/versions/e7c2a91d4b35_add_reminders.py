@@ -0,0 +1,37 @@
+"""Add reminders queue
+
+Revision ID: e7c2a91d4b35
+Revises: d5b8f2a4c913
+Create Date: 2026-10-19 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e7c2a91d4b35'
+down_revision = 'd5b8f2a4c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'reminders',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('registration_id', sa.Integer, nullable=False),
+        sa.Column('kind', sa.String(8), nullable=False),
+        sa.Column('exam_date', sa.Date, nullable=False),
+        sa.Column('status', sa.Enum('Queued', 'Sent', 'Failed', 'Skipped'), nullable=False,
+                  server_default='Queued'),
+        sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+        sa.Column('sent_at', sa.DateTime),
+        sa.UniqueConstraint('registration_id', 'kind', name='uq_reminders_reg_kind'),
+    )
+    op.create_index('ix_reminders_status_id', 'reminders', ['status', 'id'])
+    op.create_index('ix_reminders_exam_date', 'reminders', ['exam_date'])
+
+
+def downgrade():
+    op.drop_table('reminders')
@@ -0,0 +1,34 @@
+"""Add booking_rollups for the capacity dashboard
+
+Revision ID: f3d9b6e81a27
+Revises: e7c2a91d4b35
+Create Date: 2026-10-19 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'f3d9b6e81a27'
+down_revision = 'e7c2a91d4b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'booking_rollups',
+        sa.Column('exam_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('location_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('timeslot_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('exam_date', sa.Date, nullable=False),
+        sa.Column('capacity', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('bookings', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('cancellations', sa.Integer, nullable=False, server_default='0'),
+    )
+    op.create_index('ix_booking_rollups_date', 'booking_rollups', ['exam_date', 'location_id'])
+    # Existing data: fill with `flask rollups-rebuild` after upgrading.
+
+
+def downgrade():
+    op.drop_table('booking_rollups')
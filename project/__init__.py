@@ -2,7 +2,7 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-# from flask_migrate import Migrate
+from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 import os
 from dotenv import load_dotenv
@@ -13,7 +13,7 @@ from dotenv import load_dotenv
 db = SQLAlchemy()
 login_manager = LoginManager()
 csrf = CSRFProtect()
-# migrate = Migrate()
+migrate = Migrate()
 
 # Load env vars (for local dev; harmless on Heroku)
 load_dotenv()
@@ -52,14 +52,6 @@ def create_app():
         or os.getenv("JAWSDB_URL")
     )
 
-    if db_url:
-        if db_url.startswith("mysql://"):
-            db_url = db_url.replace("mysql://", "mysql+pymysql://", 1)
-        app.config["SQLALCHEMY_DATABASE_URI"] = db_url
-    else:
-        app.config["SQLALCHEMY_DATABASE_URI"] = default_uri
-
-
     if db_url:
         # Heroku ClearDB uses mysql://, SQLAlchemy needs mysql+pymysql://
         if db_url.startswith("mysql://"):
@@ -70,15 +62,57 @@ def create_app():
 
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # Connection pool. Sized for sync workers by default; under gevent
+    # (GUNICORN_WORKER_CLASS=gevent) raise DB_POOL_SIZE/DB_MAX_OVERFLOW so
+    # concurrent greenlets aren't all queued behind a handful of connections.
+    # pool_recycle stays under ClearDB's idle timeout; pre_ping drops
+    # connections the server already closed.
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("mysql"):
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+            "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "280")),
+            "pool_pre_ping": True,
+        }
+
+    # Live seat updates. An SSE connection holds its worker for up to
+    # SSE_MAX_SECONDS, which only async (gevent) workers can afford, so the
+    # stream is served only under GUNICORN_WORKER_CLASS=gevent (the same
+    # variable gunicorn.conf.py reads). Sync workers get a short JSON poll
+    # every SEAT_POLL_SECONDS instead.
+    app.config["SEAT_STREAM"] = os.getenv("GUNICORN_WORKER_CLASS", "sync") == "gevent"
+    app.config["SSE_MAX_SECONDS"] = int(os.getenv("SSE_MAX_SECONDS", "300"))
+    app.config["SEAT_POLL_SECONDS"] = int(os.getenv("SEAT_POLL_SECONDS", "20"))
 
     # --------------------------
     # Initialize extensions
     # --------------------------
     db.init_app(app)
     csrf.init_app(app)
-    # migrate.init_app(app, db)
+    migrate.init_app(app, db)
     login_manager.init_app(app)
 
+    from .logs import init_logging
+    from .templating import init_templating
+    from .emails import init_emails
+    from .instrumentation import init_instrumentation
+    from .profiling import init_profiling
+    from .pubsub import init_pubsub
+    from .idempotency import init_idempotency
+    from .sessions import init_sessions
+    from .cli import init_cli
+
+    init_logging(app)
+    init_templating(app)
+    init_emails(app)
+    init_instrumentation(app)
+    init_profiling(app)
+    init_pubsub(app)
+    init_idempotency(app)
+    init_sessions(app)
+    init_cli(app)
+
     # --------------------------
     # Login manager setup
     # --------------------------
@@ -95,11 +129,15 @@ def create_app():
     # --------------------------
     # Create database tables (dev only)
     # --------------------------
-    if app.config["DEBUG"]:
+    # Opt out with CREATE_ALL_ON_STARTUP=0 so debug reloads don't pay for
+    # a metadata round trip on every boot.
+    app.config["CREATE_ALL_ON_STARTUP"] = (
+        os.environ.get("CREATE_ALL_ON_STARTUP", "1" if app.config["DEBUG"] else "0") == "1"
+    )
+    if app.config["CREATE_ALL_ON_STARTUP"]:
         with app.app_context():
             db.create_all()
 
-
     # --------------------------
     # Register Blueprints (active)
     # --------------------------
@@ -107,16 +145,30 @@ def create_app():
     from .auth import auth
     from .student_ui import student_ui
     from .faculty_ui import faculty_ui
-
-    print("✅ Registering blueprints...")
+    from .admin_ui import admin_ui
 
     app.register_blueprint(main)
     app.register_blueprint(auth)
     app.register_blueprint(student_ui, url_prefix="/student")
     app.register_blueprint(faculty_ui, url_prefix="/faculty")
+    app.register_blueprint(admin_ui, url_prefix="/admin")
 
     @app.shell_context_processor
     def make_shell_context():
         return {"db": db, "User": User}
 
     return app
+
+
+# ==========================================================
+#  Fork safety (gunicorn --preload)
+# ==========================================================
+def dispose_engines(app):
+    """Drop pooled connections inherited from a parent process.
+
+    Call this in every forked worker when the app was built in the
+    master (``preload_app``). ``close=False`` leaves the parent's sockets
+    alone and just gives the child a fresh, empty pool.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,468 @@
+# project/admin.py
+"""Back office for users, courses, exams and exam sessions.
+
+This maintenance used to be raw SQL against production. Each
+``Entity`` below describes one list for project.admin_ui: its columns,
+the filters it takes, which columns may be edited, and what has to be
+invalidated when they are.
+
+* Lists are keyset-paged on the primary key (queries.admin_list_query),
+  so a page costs the same at 100k users as at 100. No page ever runs
+  COUNT(*) or OFFSET.
+* Bulk edits apply one value to every selected row with a single
+  ``UPDATE ... WHERE id IN (...)``. Inline edits (capacities) are one
+  executemany for all the changed rows.
+* CSV export streams the filtered list EXPORT_BATCH rows per query.
+  Import reads the upload row by row. It updates rows that have an id
+  and, for courses and sessions, inserts the rest, committing every
+  IMPORT_BATCH rows. Rows that fail validation are reported and skipped.
+
+Every write ends like the booking service's: in the same transaction,
+copies kept elsewhere (booking_rollups capacity, the authentication
+role) are synced; after the commit, caches are told. Session capacity
+goes through seats_changed(), so open schedule pages get the new seat
+counts. Exam and course edits call catalog_changed() and drop the
+snapshots of students booked on them.
+"""
+import csv
+import datetime
+import io
+import os
+from collections import namedtuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db, queries
+from .loaders import catalog_changed
+from .refdata import refdata
+from .schedule import invalidate_many
+from .seats import seats_changed
+
+PAGE_SIZE = int(os.environ.get("ADMIN_PAGE_SIZE", "50"))
+EXPORT_BATCH = 2000
+IMPORT_BATCH = 500
+MAX_REPORTED_ERRORS = 20
+
+Page = namedtuple("Page", "rows before after")          # cursors for the previous / next page
+BulkAction = namedtuple("BulkAction", "label parse statements")   # statements: [(Query, bind name)]
+
+
+class ImportResult:
+    def __init__(self):
+        self.updated = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []      # first MAX_REPORTED_ERRORS messages
+        self.aborted = False
+
+    def reject(self, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+# ----------------------------------------------------------
+# Value parsers (form fields, CSV cells): return the value or raise ValueError
+# ----------------------------------------------------------
+def _text(max_length, required=True):
+    def parse(value):
+        value = (value or "").strip()
+        if not value:
+            if required:
+                raise ValueError("is required")
+            return None
+        if len(value) > max_length:
+            raise ValueError(f"is longer than {max_length} characters")
+        return value
+    return parse
+
+
+def _whole(minimum=0, required=True):
+    def parse(value):
+        value = (value or "").strip() if isinstance(value, str) else value
+        if value in (None, ""):
+            if required:
+                raise ValueError("is required")
+            return None
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValueError("must be a whole number") from None
+        if number < minimum:
+            raise ValueError(f"must be at least {minimum}")
+        return number
+    return parse
+
+
+def _choice(*options):
+    def parse(value):
+        value = (value or "").strip()
+        if value not in options:
+            raise ValueError(f"must be one of {', '.join(options)}")
+        return value
+    return parse
+
+
+def _reference(lookup, required=True):
+    """An id that must exist in one of refdata's ``*_by_id`` dicts."""
+    whole = _whole(1, required)
+
+    def parse(value):
+        number = whole(value)
+        if number is not None and number not in getattr(refdata(), lookup):
+            raise ValueError(f"{number} does not exist")
+        return number
+    return parse
+
+
+def _prefix_range(value):
+    """Binds for ``email >= prefix AND email < next prefix`` (emails are stored lower-case)."""
+    prefix = value.strip().lower()
+    return {"email": prefix, "email_end": prefix[:-1] + chr(ord(prefix[-1]) + 1)}
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat((value or "").strip())
+    except ValueError:
+        raise ValueError("must be a date (YYYY-MM-DD)") from None
+
+
+# ----------------------------------------------------------
+# Syncs (inside the transaction) and notifications (after commit)
+# ----------------------------------------------------------
+def _sync_users(ids, inserted):
+    if ids:
+        queries.ADMIN_SYNC_AUTH_ROLE.execute(ids=ids)
+    return ids
+
+
+def _sync_sessions(ids, inserted):
+    keys = [(r["exam_id"], r["location_id"])
+            for r in queries.ADMIN_SESSION_KEYS.all(ids=ids)] if ids else []
+    new = [(r["exam_id"], r["location_id"]) for r in inserted]
+    if keys:
+        queries.ADMIN_SYNC_ROLLUP_CAPACITY.execute(sessions=keys)
+    if new:
+        queries.ADMIN_INSERT_SESSION_ROLLUPS.execute(sessions=new)
+    return keys + new
+
+
+def _sessions_changed(keys):
+    seats_changed(keys)
+
+
+def _exams_changed(ids):
+    catalog_changed()
+    invalidate_many(r["user_id"] for r in queries.ADMIN_EXAM_STUDENTS.all(ids=ids))
+
+
+def _courses_changed(ids):
+    catalog_changed()
+    invalidate_many(r["user_id"] for r in queries.ADMIN_COURSE_STUDENTS.all(ids=ids))
+
+
+class Entity:
+    """One admin list and how it may be edited.
+
+    ``fields`` parses every column a form or CSV may set; ``editable``
+    are the ones an update may change and ``required`` the ones an
+    insert needs (no inserts when empty). ``sync(ids, inserted)`` runs
+    before the commit and returns what ``changed()`` is told after it.
+    """
+
+    def __init__(self, name, title, table, columns, filters, fields, editable,
+                 bulk=None, required=(), inline=None, sync=None, changed=None):
+        self.name = name
+        self.title = title
+        self.table = table
+        self.columns = columns
+        self.filters = filters
+        self.fields = fields
+        self.editable = editable
+        self.bulk = bulk or {}
+        self.required = required
+        self.inline = inline
+        self.sync = sync
+        self.changed = changed
+
+
+ENTITIES = {e.name: e for e in (
+    Entity(
+        "users", "Users", "users",
+        columns=("id", "name", "email", "phone", "nshe_id", "employee_id",
+                 "role_id", "department_id", "major_id", "status"),
+        filters={"email": _prefix_range, "role_id": _whole(1),
+                 "status": _choice("Active", "Inactive")},
+        fields={
+            "name": _text(150), "phone": _text(20),
+            "role_id": _reference("roles_by_id"),
+            "department_id": _reference("departments_by_id", required=False),
+            "major_id": _reference("majors_by_id", required=False),
+            "status": _choice("Active", "Inactive"),
+        },
+        editable=("name", "phone", "role_id", "department_id", "major_id", "status"),
+        bulk={
+            "status": BulkAction("Set status", _choice("Active", "Inactive"),
+                                 [(queries.ADMIN_SET_USER_STATUS, "status")]),
+            "role": BulkAction("Set role", _reference("roles_by_id"),
+                               [(queries.ADMIN_SET_USER_ROLE, "role_id")]),
+            "department": BulkAction("Set department", _reference("departments_by_id"),
+                                     [(queries.ADMIN_SET_USER_DEPARTMENT, "department_id")]),
+        },
+        sync=_sync_users,
+    ),
+    Entity(
+        "courses", "Courses", "courses",
+        columns=("id", "course_code", "course_name", "department_id"),
+        filters={"code": lambda v: f"{v.strip().upper()}%", "department_id": _whole(1)},
+        fields={"course_code": _text(20), "course_name": _text(150),
+                "department_id": _reference("departments_by_id")},
+        editable=("course_code", "course_name", "department_id"),
+        required=("course_code", "course_name", "department_id"),
+        bulk={
+            "department": BulkAction("Set department", _reference("departments_by_id"),
+                                     [(queries.ADMIN_SET_COURSE_DEPARTMENT, "department_id")]),
+        },
+        changed=_courses_changed,
+    ),
+    Entity(
+        "exams", "Exams", "exams",
+        columns=("id", "exam_type", "course_id", "course_code", "exam_date", "timeslot_id",
+                 "location_id", "capacity", "professor_id"),
+        filters={"start": _date, "end": _date, "course_id": _whole(1),
+                 "exam_type": lambda v: f"%{v.strip()}%"},
+        fields={"exam_type": _text(255), "capacity": _whole(0),
+                "professor_id": _whole(1, required=False)},
+        editable=("exam_type", "capacity", "professor_id"),
+        bulk={
+            "capacity": BulkAction("Set expected enrollment", _whole(0),
+                                   [(queries.ADMIN_SET_EXAM_CAPACITY, "capacity")]),
+            "professor": BulkAction("Set professor id", _whole(1),
+                                    [(queries.ADMIN_SET_EXAM_PROFESSOR, "professor_id")]),
+        },
+        inline="capacity",
+        changed=_exams_changed,
+    ),
+    Entity(
+        "sessions", "Exam sessions", "exam_locations",
+        columns=("id", "exam_id", "exam_type", "exam_date", "location_id", "capacity", "booked"),
+        filters={"exam_id": _whole(1), "location_id": _whole(1), "start": _date, "end": _date},
+        fields={"exam_id": _whole(1), "location_id": _reference("locations_by_id"),
+                "capacity": _whole(0)},
+        editable=("capacity",),
+        required=("exam_id", "location_id", "capacity"),
+        bulk={
+            "capacity": BulkAction("Set seats", _whole(0),
+                                   [(queries.ADMIN_SET_SESSION_CAPACITY, "capacity")]),
+            "add": BulkAction("Add seats (negative removes)", _whole(-100000),
+                              [(queries.ADMIN_ADD_SESSION_CAPACITY, "delta")]),
+        },
+        inline="capacity",
+        sync=_sync_sessions,
+        changed=_sessions_changed,
+    ),
+)}
+
+
+def parse_filters(entity, args):
+    """Bind values for the filters set in ``args``; ones that don't parse are dropped.
+
+    A parser may return a dict when its filter needs several binds.
+    """
+    binds = {}
+    for name, parse in entity.filters.items():
+        raw = (args.get(name) or "").strip()
+        if raw:
+            try:
+                value = parse(raw)
+            except ValueError:
+                continue
+            binds.update(value if isinstance(value, dict) else {name: value})
+    return binds
+
+
+def page(entity, filters, after=None, before=None, size=PAGE_SIZE):
+    """One page of rows plus the cursors for the pages either side (None at an end)."""
+    if before is not None:
+        rows = queries.admin_list_query(entity.name, filters, backwards=True).all(
+            before=before, limit=size + 1, **filters)
+        more = len(rows) > size
+        rows = list(reversed(rows[:size]))
+        return Page(rows, rows[0]["id"] if more and rows else None,
+                    rows[-1]["id"] if rows else None)
+
+    rows = queries.admin_list_query(entity.name, filters).all(after=after or 0, limit=size + 1,
+                                                              **filters)
+    more = len(rows) > size
+    rows = rows[:size]
+    return Page(rows, rows[0]["id"] if after and rows else None, rows[-1]["id"] if more else None)
+
+
+def display(entity, row):
+    """Cell text for a row, with reference ids shown by name."""
+    ref = refdata()
+    names = {
+        "role_id": lambda v: ref.roles_by_id[v].name if v in ref.roles_by_id else v,
+        "department_id": lambda v: (ref.departments_by_id[v].name
+                                    if v in ref.departments_by_id else v),
+        "major_id": lambda v: ref.majors_by_id[v].name if v in ref.majors_by_id else v,
+        "location_id": lambda v: ref.label(v) or v,
+    }
+    cells = []
+    for column in entity.columns:
+        value = row[column]
+        if value is not None and column in names:
+            value = names[column](value)
+        cells.append("" if value is None else value)
+    return cells
+
+
+def _write(entity, run, ids, inserted=()):
+    try:
+        run()
+        touched = entity.sync(ids, inserted) if entity.sync else ids
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if entity.changed and touched:
+        entity.changed(touched)
+
+
+def bulk_edit(entity, action, ids, value):
+    """Apply one bulk action to the selected ids; returns how many were selected.
+
+    Raises KeyError for an unknown action and ValueError for a bad value.
+    """
+    bulk = entity.bulk[action]
+    parsed = bulk.parse(value)
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        return 0
+
+    def run():
+        for query, name in bulk.statements:
+            query.execute(ids=ids, **{name: parsed})
+
+    _write(entity, run, ids)
+    return len(ids)
+
+
+def inline_edit(entity, values):
+    """Save {id: new value} for the entity's inline column; one executemany."""
+    column = entity.inline
+    rows = [{"id": int(i), column: entity.fields[column](v)} for i, v in values.items()]
+    if not rows:
+        return 0
+    _write(entity, lambda: queries.admin_update_query(entity.table, [column]).execute(rows),
+           [r["id"] for r in rows])
+    return len(rows)
+
+
+# ----------------------------------------------------------
+# CSV
+# ----------------------------------------------------------
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def export_csv(entity, filters, batch_size=EXPORT_BATCH):
+    """Yield the filtered list as CSV text, one chunk per batch query."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(entity.columns)
+    query = queries.admin_list_query(entity.name, filters)
+    after = 0
+    while True:
+        rows = query.all(after=after, limit=batch_size, **filters)
+        for r in rows:
+            writer.writerow([_csv_value(r[c]) for c in entity.columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if len(rows) < batch_size:
+            return
+        after = rows[-1]["id"]
+
+
+def import_csv(entity, stream):
+    """Apply an uploaded CSV (binary stream) to ``entity``; returns an ImportResult.
+
+    Columns the entity can't edit (names, counts from an export) are
+    ignored. Rows with an id update it; rows without one are inserted
+    where the entity allows inserts and rejected otherwise.
+    """
+    result = ImportResult()
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    header = reader.fieldnames or []
+    columns = [c for c in entity.editable if c in header]
+    can_insert = bool(entity.required) and all(c in header for c in entity.required)
+    if "id" not in header and not can_insert:
+        raise ValueError("The file needs an id column"
+                         + (f" or all of {', '.join(entity.required)}."
+                            if entity.required else "."))
+    if "id" in header and not columns and not can_insert:
+        raise ValueError(f"The file has no editable columns ({', '.join(entity.editable)}).")
+
+    parse_id = _whole(1)
+    updates, inserts, first_line = [], [], 2
+
+    def flush(last_line):
+        if not updates and not inserts:
+            return True
+
+        def run():
+            if updates:
+                queries.admin_update_query(entity.table, columns).execute(updates)
+            if inserts:
+                queries.admin_insert_query(entity.table, entity.required).execute(inserts)
+
+        try:
+            _write(entity, run, [r["id"] for r in updates], inserts)
+        except SQLAlchemyError as e:
+            reason = getattr(e, "orig", None) or e.__class__.__name__
+            result.reject(f"lines {first_line}-{last_line}: not saved ({reason})")
+            result.aborted = True
+            return False
+        result.updated += len(updates)
+        result.inserted += len(inserts)
+        updates.clear()
+        inserts.clear()
+        return True
+
+    line = 1
+    for line, raw in enumerate(reader, start=2):
+        try:
+            try:
+                row_id = parse_id(raw.get("id")) if (raw.get("id") or "").strip() else None
+            except ValueError as e:
+                raise ValueError(f"id {e}") from None
+            if row_id is None and not can_insert:
+                raise ValueError("id is required")
+            wanted = columns if row_id is not None else entity.required
+            row = {}
+            for c in wanted:
+                try:
+                    row[c] = entity.fields[c](raw.get(c))
+                except ValueError as e:
+                    raise ValueError(f"{c} {e}") from None
+        except ValueError as e:
+            result.reject(f"line {line}: {e}")
+            continue
+        if row_id is not None:
+            if columns:
+                row["id"] = row_id
+                updates.append(row)
+        else:
+            inserts.append(row)
+        if len(updates) + len(inserts) >= IMPORT_BATCH:
+            if not flush(line):
+                return result
+            first_line = line + 1
+    flush(line)
+    return result
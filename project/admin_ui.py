@@ -0,0 +1,197 @@
+from flask import (Blueprint, Response, abort, current_app, flash, redirect, render_template,
+                   request, send_file, session, stream_with_context, url_for)
+from flask_login import current_user
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import login_manager
+from .admin import (ENTITIES, PAGE_SIZE, bulk_edit, display, export_csv, import_csv, inline_edit,
+                    page, parse_filters)
+from .profiling import SESSION_FLAG, folded_path, profile_dir, recent
+from .refdata import refdata
+
+admin_ui = Blueprint("admin_ui", __name__)
+
+
+@admin_ui.before_request
+def require_admin():
+    if not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    if current_user.role_name != "admin":
+        abort(403)
+
+
+def _entity(name):
+    entity = ENTITIES.get(name)
+    if entity is None:
+        abort(404)
+    return entity
+
+
+def _cursor(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _back(entity):
+    """The list page the form was posted from (its filters and page), else the first page."""
+    back = request.form.get("back") or ""
+    if back.startswith(url_for("admin_ui.admin_list", entity=entity.name)):
+        return back
+    return url_for("admin_ui.admin_list", entity=entity.name)
+
+
+def _plural(n, word):
+    return f"{n} {word}{'' if n == 1 else 's'}"
+
+
+# ==========================================================
+# ADMIN HOME
+# ==========================================================
+@admin_ui.route("/", methods=["GET"])
+def admin_index():
+    return render_template("admin_index.html", entities=ENTITIES.values())
+
+
+# ==========================================================
+# LISTS (keyset-paged) + CSV EXPORT
+# ==========================================================
+@admin_ui.route("/<entity>", methods=["GET"])
+def admin_list(entity):
+    entity = _entity(entity)
+    filters = parse_filters(entity, request.args)
+    result = page(entity, filters,
+                  after=_cursor(request.args.get("after")),
+                  before=_cursor(request.args.get("before")))
+
+    # Filter values as typed, for the form and the paging/export links.
+    args = {name: request.args[name] for name in entity.filters if request.args.get(name)}
+    ref = refdata()
+    return render_template(
+        "admin_list.html",
+        entity=entity,
+        rows=[(r, display(entity, r)) for r in result.rows],
+        page=result,
+        args=args,
+        page_size=PAGE_SIZE,
+        roles=ref.roles,
+        departments=ref.departments,
+        locations=[{"id": loc.id, "label": ref.label(loc.id)} for loc in ref.locations],
+    )
+
+
+@admin_ui.route("/<entity>/export.csv", methods=["GET"])
+def admin_export(entity):
+    entity = _entity(entity)
+    filters = parse_filters(entity, request.args)
+    return Response(
+        stream_with_context(export_csv(entity, filters)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={entity.name}.csv"},
+    )
+
+
+# ==========================================================
+# BULK + INLINE EDITS
+# ==========================================================
+@admin_ui.route("/<entity>/edit", methods=["POST"])
+def admin_edit(entity):
+    entity = _entity(entity)
+    back = _back(entity)
+
+    try:
+        if request.form.get("save") == "inline" and entity.inline:
+            prefix = f"{entity.inline}:"
+            changed = {}
+            for key, value in request.form.items():
+                if key.startswith(prefix) and value != request.form.get(f"was:{key[len(prefix):]}"):
+                    changed[key[len(prefix):]] = value
+            saved = inline_edit(entity, changed)
+            if saved:
+                flash(f"Saved {_plural(saved, 'row')}.", "success")
+            else:
+                flash("Nothing changed.", "info")
+        else:
+            action = request.form.get("action") or ""
+            if action not in entity.bulk:
+                flash("Please choose an action.", "error")
+                return redirect(back)
+            ids = request.form.getlist("ids")
+            updated = bulk_edit(entity, action, ids, request.form.get("value"))
+            if updated:
+                flash(f"{entity.bulk[action].label}: updated {_plural(updated, 'row')}.", "success")
+            else:
+                flash("No rows selected.", "info")
+    except ValueError as e:
+        flash(f"Not saved: the value {e}.", "error")
+    except SQLAlchemyError as e:
+        flash(f"Not saved: the database rejected the change ({getattr(e, 'orig', None) or e}).",
+              "error")
+    return redirect(back)
+
+
+# ==========================================================
+# CSV IMPORT
+# ==========================================================
+@admin_ui.route("/<entity>/import", methods=["POST"])
+def admin_import(entity):
+    entity = _entity(entity)
+    back = _back(entity)
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        flash("Please choose a CSV file.", "error")
+        return redirect(back)
+
+    try:
+        result = import_csv(entity, upload.stream)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(back)
+
+    summary = f"Import: {_plural(result.updated, 'row')} updated, {result.inserted} inserted"
+    if result.rejected:
+        summary += f", {result.rejected} rejected"
+    if result.aborted:
+        summary += "; stopped at the first batch the database refused"
+    flash(summary + ".", "error" if result.aborted else "success")
+    for message in result.errors:
+        flash(message, "error")
+    return redirect(back)
+
+
+# ==========================================================
+# REQUEST PROFILES (project.profiling)
+# ==========================================================
+@admin_ui.route("/profiles", methods=["GET"])
+def admin_profiles():
+    order = request.args.get("order")
+    if order not in ("total_ms", "db_ms", "at"):
+        order = "total_ms"
+    return render_template(
+        "admin_profiles.html",
+        profiles=recent(current_app, limit=50, order=order),
+        order=order,
+        directory=profile_dir(current_app),
+        sample_rate=current_app.config["PROFILE_SAMPLE_RATE"],
+        profiling_me=bool(session.get(SESSION_FLAG)),
+    )
+
+
+@admin_ui.route("/profiles/toggle", methods=["POST"])
+def admin_profiles_toggle():
+    if session.pop(SESSION_FLAG, None):
+        flash("Stopped profiling your requests.", "info")
+    else:
+        session[SESSION_FLAG] = True
+        flash("Your requests are now profiled until you turn this off or log out.", "success")
+    return redirect(url_for("admin_ui.admin_profiles"))
+
+
+@admin_ui.route("/profiles/<name>.folded", methods=["GET"])
+def admin_profile_folded(name):
+    path = folded_path(current_app, name)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype="text/plain", as_attachment=True,
+                     download_name=f"{name}.folded")
@@ -0,0 +1,155 @@
+# project/analytics.py
+"""Capacity-planning rollups and the faculty utilization dashboard.
+
+`booking_rollups` holds, per (exam, location, timeslot), how many
+registrations were placed there and how many of those are canceled,
+plus the session's capacity and exam date. The dashboard only reads
+these rows (one indexed range query), never the raw registrations join.
+
+The rollups are kept current incrementally. Every write in
+project.bookings calls ``record()`` inside its own transaction with the
+deltas it caused, which costs one UPDATE per touched slot. ``rebuild()``
+creates a row for every (session, timeslot), so the INSERT fallback only
+runs for sessions added since the last rebuild. A move takes rows out of
+one slot and puts them in another. The archive job does not touch
+rollups, because archived registrations still count.
+
+``rebuild()`` recomputes everything from registrations and
+registrations_archive in one set-based statement (after a schema change,
+a capacity edit, or hand-edited rows). ``verify()`` compares the
+rollups with a fresh raw count. Both are exposed as
+`flask rollups-rebuild` / `flask rollups-verify`, and
+tools/check_rollups.py exercises the incremental path against verify().
+"""
+from collections import defaultdict
+
+from sqlalchemy.exc import IntegrityError
+
+from . import db, queries
+from .refdata import refdata
+
+_COUNTS = ("capacity", "bookings", "cancellations")
+
+
+def record(changes):
+    """Apply rollup deltas inside the caller's transaction.
+
+    ``changes`` is an iterable of (exam_id, location_id, timeslot_id,
+    bookings_delta, cancellations_delta); deltas for the same slot are
+    merged first.
+    """
+    merged = defaultdict(lambda: [0, 0])
+    for exam_id, location_id, timeslot_id, booked, canceled in changes:
+        slot = merged[(int(exam_id), int(location_id), int(timeslot_id or 0))]
+        slot[0] += booked
+        slot[1] += canceled
+
+    for (e, l, t), (b, c) in merged.items():
+        if b == 0 and c == 0:
+            continue
+        params = {"e": e, "l": l, "t": t, "b": b, "c": c}
+        if queries.ROLLUP_BUMP.execute(**params).rowcount:
+            continue
+        # New slot. A concurrent booking may create it first; the savepoint
+        # keeps the outer transaction alive so we can add to its row.
+        try:
+            with db.session.begin_nested():
+                queries.ROLLUP_INSERT.execute(**params)
+        except IntegrityError:
+            queries.ROLLUP_BUMP.execute(**params)
+
+
+def rebuild():
+    """Recompute every rollup row from raw registrations; returns the row count."""
+    try:
+        queries.DELETE_ROLLUPS.execute()
+        queries.REBUILD_ROLLUPS.execute()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(queries.ROLLUPS_ALL.all())
+
+
+def verify():
+    """Slots whose rollup differs from a raw count: [(key, rollup, raw)]."""
+    def by_key(rows):
+        return {
+            (r["exam_id"], r["location_id"], r["timeslot_id"]):
+                {k: int(r[k] or 0) for k in _COUNTS}
+            for r in rows
+        }
+
+    raw = by_key(queries.RAW_ROLLUPS.all())
+    rolled = by_key(queries.ROLLUPS_ALL.all())
+    zero = {k: 0 for k in _COUNTS}
+
+    mismatches = []
+    for key in sorted(set(raw) | set(rolled)):
+        have, want = rolled.get(key, zero), raw.get(key, zero)
+        # A slot emptied by moves keeps its row with zero counts.
+        if (have["bookings"] == want["bookings"] == 0
+                and have["cancellations"] == want["cancellations"] == 0):
+            continue
+        if have != want:
+            mismatches.append((key, have, want))
+    return mismatches
+
+
+class Utilization:
+    """Rollup rows for a date range, aggregated the ways the dashboard shows them."""
+
+    def __init__(self, rows, ref):
+        sessions = {}          # (exam_id, location_id) -> [date, capacity, active]
+        slots = defaultdict(lambda: [0, 0, 0])   # timeslot -> [bookings, cancellations, active]
+        for r in rows:
+            active = r["bookings"] - r["cancellations"]
+            s = sessions.setdefault((r["exam_id"], r["location_id"]),
+                                    [r["exam_date"], r["capacity"], 0])
+            s[2] += active
+            slot = slots[r["timeslot_id"]]
+            slot[0] += r["bookings"]
+            slot[1] += r["cancellations"]
+            slot[2] += active
+
+        # (date, location) / location -> [sessions, capacity, active]
+        by_day = defaultdict(lambda: [0, 0, 0])
+        by_campus = defaultdict(lambda: [0, 0, 0])
+        for (_, location_id), (day, capacity, active) in sessions.items():
+            for bucket in (by_day[(day, location_id)], by_campus[location_id]):
+                bucket[0] += 1
+                bucket[1] += capacity
+                bucket[2] += active
+
+        def fill(capacity, active):
+            return round(100.0 * active / capacity, 1) if capacity else None
+
+        self.by_day = [
+            {"date": day, "location": ref.label(loc), "sessions": n,
+             "capacity": cap, "active": act, "fill": fill(cap, act)}
+            for (day, loc), (n, cap, act) in sorted(by_day.items(),
+                                                    key=lambda kv: (kv[0][0], ref.label(kv[0][1])))
+        ]
+        self.by_campus = [
+            {"location": ref.label(loc), "sessions": n,
+             "capacity": cap, "active": act, "fill": fill(cap, act)}
+            for loc, (n, cap, act) in sorted(by_campus.items(), key=lambda kv: ref.label(kv[0]))
+        ]
+        total_active = sum(s[2] for s in slots.values())
+        self.by_timeslot = [
+            {"timeslot_id": t, "bookings": b, "cancellations": c, "active": a,
+             "share": round(100.0 * a / total_active, 1) if total_active else None}
+            for t, (b, c, a) in sorted(slots.items())
+        ]
+        self.totals = {
+            "capacity": sum(s[1] for s in sessions.values()),
+            "active": sum(s[2] for s in sessions.values()),
+            "bookings": sum(s[0] for s in slots.values()),
+            "cancellations": sum(s[1] for s in slots.values()),
+        }
+        self.totals["fill"] = fill(self.totals["capacity"], self.totals["active"])
+
+
+def utilization(start, end):
+    """Utilization for exams dated start..end (one query on booking_rollups)."""
+    return Utilization(queries.ROLLUPS_IN_RANGE.all(start=start, end=end), refdata())
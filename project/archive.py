@@ -0,0 +1,69 @@
+# project/archive.py
+"""Move finished terms out of `registrations`.
+
+`registrations` only ever needs the current term: seat counts, the
+student schedule and faculty search all filter on live bookings. Rows
+whose exam date is before the cutoff are copied to
+`registrations_archive` (same columns, same ids) and deleted, in small
+batches so the job never holds long locks on the hot table.
+
+Faculty can still search history explicitly; see
+faculty_ui.faculty_search_appointments (include_history).
+
+A run that moved rows calls ``archive_changed()``. That bumps the
+"archive" version here and, through the "archive" channel, in every
+worker, so bookings.next_registration_code re-reads the highest archived
+code instead of trusting its cached copy.
+"""
+from . import db
+from . import queries
+from .cache import bump_version
+from .pubsub import broker
+
+ARCHIVE_CHANNEL = "archive"
+
+
+def archive_registrations(before, batch_size=1000, dry_run=False):
+    """Archive registrations for exams dated before ``before``; returns the count."""
+    if dry_run:
+        return queries.ARCHIVE_COUNT.scalar(before=before)
+
+    moved = 0
+    while True:
+        ids = queries.ARCHIVE_SELECT_BATCH.execute(
+            before=before, batch_size=batch_size
+        ).scalars().all()
+        if not ids:
+            break
+
+        try:
+            queries.ARCHIVE_COPY_BATCH.execute(ids=ids)
+            queries.ARCHIVE_DELETE_BATCH.execute(ids=ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        moved += len(ids)
+
+    if moved:
+        archive_changed()
+    return moved
+
+
+def archived_code_floor():
+    """Highest CSN number already used in the archive (0 if empty)."""
+    return queries.MAX_ARCHIVED_CODE.scalar() or 0
+
+
+def archive_changed():
+    """Call after committing rows into registrations_archive."""
+    bump_version("archive")
+    broker.publish(ARCHIVE_CHANNEL, {})
+
+
+def _on_archive_change(message):
+    bump_version("archive")
+
+
+broker.listen(ARCHIVE_CHANNEL, _on_archive_change)
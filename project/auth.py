@@ -6,7 +6,9 @@ from sqlalchemy import or_
 import re
 
 from . import db
-from .models import User, Role, Department, Major
+from .models import User
+from .refdata import refdata
+from .sessions import regenerate
 
 auth = Blueprint('auth', __name__)
 
@@ -26,8 +28,9 @@ def _email_lower(s: str) -> str:
 @auth.route('/signup', methods=['GET', 'POST'])
 def signup():
     roles = ['Student', 'Faculty']
-    departments = Department.query.all()
-    majors = Major.query.all()
+    ref = refdata()
+    departments = ref.departments
+    majors = ref.majors
 
     def render_signup_page(role_lower=None):
         return render_template(
@@ -98,7 +101,7 @@ def signup():
 
         password_plain = employee_id
 
-    role_obj = Role.query.filter_by(name=role_lower.title()).first()
+    role_obj = ref.roles_by_name.get(role_lower)
     if not role_obj:
         flash('Role not configured; contact admin.', 'signup')
         return render_signup_page(role_lower)
@@ -107,18 +110,18 @@ def signup():
     major = None
 
     if role_lower == 'student':
-        major = Major.query.filter_by(name=major_name).first()
+        major = ref.majors_by_name.get(major_name)
         if not major:
             flash('Selected major not found.', 'signup')
             return render_signup_page(role_lower)
-        dept = Department.query.get(major.department_id)
+        dept = ref.departments_by_id.get(major.department_id)
     else:
         try:
             dept_id_int = int(department_id)
         except (TypeError, ValueError):
             flash('Invalid department selection.', 'signup')
             return render_signup_page(role_lower)
-        dept = Department.query.get(dept_id_int)
+        dept = ref.departments_by_id.get(dept_id_int)
 
     if not dept:
         flash('Invalid department selected.', 'signup')
@@ -179,6 +182,7 @@ def signup():
         return render_signup_page(role_lower)
 
     login_user(new_user, remember=True)
+    regenerate(session)
     flash('Account created successfully!', 'auth')
 
     if role_lower == 'faculty':
@@ -200,9 +204,12 @@ def login():
             return render_template('login.html')
 
         login_user(user, remember=remember)
+        regenerate(session)
         flash('Login successful.', 'auth')
 
-        role_name = (user.role.name if user.role else '').lower()
+        role_name = user.role_name
+        if role_name == 'admin':
+            return redirect(url_for('admin_ui.admin_index'))
         if role_name == 'faculty':
             return redirect(url_for('faculty_ui.faculty_dashboard'))
         return redirect(url_for('student_ui.student_dashboard'))
@@ -214,6 +221,7 @@ def login():
 def logout():
     logout_user()
     session.clear()
+    regenerate(session)
     flash('You have been logged out.', 'logout')
     return redirect(url_for('auth.login'))
 
@@ -221,17 +229,11 @@ def logout():
 # ==========================================================
 # Password Reset (Forgot Password)
 # ==========================================================
-# Optional email sending: works if Flask-Mail is configured.
-from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
-
-try:
-    from flask_mail import Message
-    from . import mail  # only if you initialized Mail() in __init__.py
-    _MAIL_OK = True
-except Exception:
-    _MAIL_OK = False
-
+# itsdangerous is imported on first use so it stays off the worker boot
+# path.
 def _serializer():
+    from itsdangerous import URLSafeTimedSerializer
+
     # Uses your existing SECRET_KEY
     return URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
 
@@ -239,6 +241,8 @@ def _make_token(email):
     return _serializer().dumps(email, salt='password-reset-salt')
 
 def _read_token(token, max_age=3600):
+    from itsdangerous import SignatureExpired, BadSignature
+
     try:
         return _serializer().loads(token, salt='password-reset-salt', max_age=max_age)
     except (SignatureExpired, BadSignature):
@@ -255,7 +259,7 @@ def forgot_password():
             return render_template("forgot_password.html", user=None)
 
         # Determine hint
-        if user.role.name.lower() == "student":
+        if user.role_name == "student":
             hint = f"Your default password was your NSHE ID"
         else:
             hint = f"Your default password was your Employee ID"
@@ -0,0 +1,330 @@
+# project/bookings.py
+"""Registration writes: book, reschedule, cancel.
+
+Every status change goes through these functions so the follow-up work
+after the commit lives in one place: live seat counts for open schedule
+pages (project.seats) and the student's schedule snapshot
+(project.schedule), which is updated write-through instead of reloaded.
+Each write also updates the capacity rollups (project.analytics) and
+appends to the booking event log (project.events) in the same
+transaction; ``actor_id`` is the user making the change.
+
+The callers (student_ui / faculty_ui) keep doing the validation, flashing
+and redirects; these functions only write and raise on database errors
+(after rolling back). The student rules checked against the schedule
+snapshot (at most MAX_ACTIVE bookings, one per exam, no two in the same
+timeslot on a day) are enforced again by the INSERT itself, because the
+snapshot can be up to STUDENT_SCHEDULE_TTL old and another worker may
+have booked in between; ``create_booking`` raises BookingRejected when
+they refuse.
+
+Faculty can also cancel or move a whole session at once
+(``cancel_session`` / ``move_session``): one UPDATE per timeslot over
+the session's ids (re-read and retried if any of them changed since the
+read), the affected students' notices queued in the same transaction
+(project.reminders sends them), then one seats and one schedule
+announcement for everybody.
+"""
+from . import analytics
+from . import db
+from . import events
+from . import queries
+from . import schedule
+from .archive import archived_code_floor
+from .cache import TTLCache, get_version
+from .seats import seats_changed
+
+# The archive only grows when the archive job runs, so its highest code is
+# cached rather than scanned on every booking. The cache is keyed on the
+# "archive" version, which every archive run bumps (archive_changed), so a
+# floor read before the run is never used after it.
+_archive_floor = TTLCache(default_ttl=3600, max_entries=1)
+
+# Bulk session writes re-read and retry when a row changes between the
+# read and the UPDATE (see _update_session).
+SESSION_ATTEMPTS = 3
+
+
+class BookingRejected(Exception):
+    """The database re-check refused a booking.
+
+    ``reason`` is "limit" (MAX_ACTIVE reached), "duplicate" (already booked
+    for the exam), "canceled" (canceled this exam before; registrations are
+    unique per exam and student), "conflict" (busy at that timeslot that
+    day) or "exam" (no such exam, or the booking being moved is gone).
+    """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class SessionChanged(Exception):
+    """A bulk session write kept finding its rows changed; nothing was written.
+
+    cancel_session / move_session give up after SESSION_ATTEMPTS reads.
+    """
+
+
+def _rejection(user_id, exam_id, timeslot_id):
+    row = queries.BOOKING_RULES.first(u=user_id, e=exam_id, t=timeslot_id)
+    if row["active"] >= schedule.MAX_ACTIVE:
+        return BookingRejected("limit")
+    if row["same_exam"]:
+        return BookingRejected("duplicate")
+    if row["any_exam"]:
+        return BookingRejected("canceled")
+    if row["same_slot"]:
+        return BookingRejected("conflict")
+    return BookingRejected("exam")
+
+
+def next_registration_code():
+    row = queries.MAX_REGISTRATION_CODE.first()
+
+    # Never reuse a code that now lives in registrations_archive.
+    floor = _archive_floor.get_or_set(get_version("archive"), archived_code_floor)
+    return f"CSN{max(row['max_num'] or 0, floor) + 1:03d}"
+
+
+def create_booking(user_id, exam_id, location_id, timeslot_id, details=None, replaces=None,
+                   actor_id=None):
+    """Insert an Active registration and return it as a schedule booking.
+
+    ``replaces`` is the id of a registration to cancel in the same
+    transaction (reschedule); if it is for the same exam, that row is moved
+    instead (see _move_booking). ``details`` carries the already-resolved
+    display fields (exam_type, exam_date, course_code, professor_name,
+    exam_time, full_location) for the snapshot write-through; without it
+    the student's snapshot is simply dropped and reloaded on next read.
+    """
+    exam_id, location_id, timeslot_id = int(exam_id), int(location_id), int(timeslot_id)
+    changed_sessions = [(exam_id, location_id)]
+    rollup = [(exam_id, location_id, timeslot_id, 1, 0)]
+    logged = []
+
+    old = None
+    if replaces:
+        old = schedule.get_schedule(user_id).find(replaces)
+        if old is not None and old["exam_id"] == exam_id:
+            return _move_booking(user_id, old, location_id, timeslot_id, actor_id)
+        if old is not None:
+            changed_sessions.append((old["exam_id"], old["location_id"]))
+    code = next_registration_code()
+
+    try:
+        # If reschedule → cancel old *first*
+        if replaces:
+            canceled = queries.CANCEL_OWN_REGISTRATION.execute(old=replaces, u=user_id).rowcount
+            if canceled and old is not None and old["status"] == "Active":
+                rollup.append((old["exam_id"], old["location_id"], old["timeslot_id"], 0, 1))
+                logged.append(events.event("canceled", dict(old, user_id=user_id), actor_id))
+
+        # Insert new appointment (only if the booking rules still hold)
+        result = queries.INSERT_REGISTRATION.execute(
+            rid=code, u=user_id, e=exam_id, t=timeslot_id, l=location_id,
+            max_active=schedule.MAX_ACTIVE,
+        )
+        if not result.rowcount:
+            raise _rejection(user_id, exam_id, timeslot_id)
+        new_id = result.lastrowid
+        logged.append(events.event("booked", {
+            "id": new_id, "user_id": user_id, "exam_id": exam_id,
+            "location_id": location_id, "timeslot_id": timeslot_id,
+        }, actor_id))
+
+        analytics.record(rollup)
+        events.log(logged)
+        db.session.commit()
+    except BookingRejected:
+        db.session.rollback()
+        # The snapshot let this through, so it is behind the database.
+        schedule.invalidate(user_id)
+        raise
+    except Exception:
+        db.session.rollback()
+        raise
+
+    seats_changed(changed_sessions)
+
+    booking = {
+        "reg_id": new_id,
+        "confirmation_code": code,
+        "status": "Active",
+        "exam_id": exam_id,
+        "location_id": location_id,
+        "timeslot_id": timeslot_id,
+    }
+    if replaces:
+        schedule.record_status(user_id, replaces, "Canceled")
+    if details is not None and new_id:
+        booking.update(details)
+        schedule.record_booking(user_id, booking)
+    else:
+        schedule.invalidate(user_id)
+    return booking
+
+
+def _move_booking(user_id, old, location_id, timeslot_id, actor_id=None):
+    """Reschedule within one exam by moving the student's own row.
+
+    A second row for the same exam would break uq_registrations_exam_user,
+    so the registration keeps its id and code and is logged as 'moved'.
+    Its pending reminders are dropped so they are queued again for the
+    new time.
+    """
+    exam_id = old["exam_id"]
+    try:
+        moved = queries.MOVE_OWN_REGISTRATION.execute(
+            old=old["reg_id"], u=user_id, e=exam_id, l=location_id, t=timeslot_id
+        ).rowcount
+        if not moved:
+            row = queries.BOOKING_RULES.first(u=user_id, e=exam_id, t=timeslot_id)
+            raise BookingRejected("conflict" if row["same_slot"] else "exam")
+        queries.RESET_REMINDERS.execute(ids=[old["reg_id"]])
+        analytics.record([(exam_id, old["location_id"], old["timeslot_id"], -1, 0),
+                          (exam_id, location_id, timeslot_id, 1, 0)])
+        events.log([events.event("moved", dict(old, user_id=user_id), actor_id,
+                                 location_id=location_id, timeslot_id=timeslot_id)])
+        db.session.commit()
+    except BookingRejected:
+        db.session.rollback()
+        schedule.invalidate(user_id)
+        raise
+    except Exception:
+        db.session.rollback()
+        raise
+
+    seats_changed({(exam_id, old["location_id"]), (exam_id, location_id)})
+    schedule.invalidate(user_id)
+    return dict(old, location_id=location_id, timeslot_id=timeslot_id)
+
+
+def cancel_booking(reg, actor_id=None):
+    """Cancel one Active registration row (needs id, user_id, exam_id, location_id, timeslot_id)."""
+    try:
+        if queries.CANCEL_REGISTRATION.execute(rid=reg["id"]).rowcount:
+            analytics.record([(reg["exam_id"], reg["location_id"], reg["timeslot_id"], 0, 1)])
+            events.log([events.event("canceled", reg, actor_id)])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    seats_changed([(reg["exam_id"], reg["location_id"])])
+    schedule.record_status(reg["user_id"], reg["id"], "Canceled")
+
+
+def session_registrations(exam_id, location_id, timeslot_id=None):
+    """Active registrations of a session, optionally one timeslot only."""
+    rows = queries.SESSION_REGISTRATIONS.all(e=exam_id, l=location_id)
+    if timeslot_id is not None:
+        rows = [r for r in rows if r["timeslot_id"] == timeslot_id]
+    return rows
+
+
+def _notices(regs, kind):
+    return [{"rid": r["id"], "kind": kind, "day": r["exam_date"]} for r in regs]
+
+
+def _update_session(query, regs, location_id, **binds):
+    """Run a session UPDATE once per timeslot of ``regs``; returns rows changed.
+
+    Each statement only matches rows still Active at the room and time
+    they were read with, so a total short of ``len(regs)`` means one
+    changed in between and the caller's deltas would be off.
+    """
+    slots = {}
+    for r in regs:
+        slots.setdefault(r["timeslot_id"] or 0, []).append(r["id"])
+    return sum(
+        query.execute(ids=ids, from_l=location_id, from_t=slot, **binds).rowcount
+        for slot, ids in slots.items()
+    )
+
+
+def cancel_session(exam_id, location_id, timeslot_id=None, actor_id=None):
+    """Cancel every Active registration of a session; returns how many.
+
+    Raises SessionChanged if its registrations keep changing underneath.
+    """
+    for _ in range(SESSION_ATTEMPTS):
+        regs = session_registrations(exam_id, location_id, timeslot_id)
+        if not regs:
+            return 0
+        try:
+            if _update_session(queries.CANCEL_REGISTRATIONS, regs, location_id) != len(regs):
+                db.session.rollback()
+                continue
+            queries.INSERT_REMINDERS.execute(_notices(regs, "canceled"))
+            analytics.record((exam_id, location_id, r["timeslot_id"], 0, 1) for r in regs)
+            events.log(events.event("canceled", dict(r, exam_id=exam_id, location_id=location_id),
+                                    actor_id)
+                       for r in regs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        break
+    else:
+        raise SessionChanged(exam_id, location_id)
+
+    seats_changed([(exam_id, location_id)])
+    schedule.invalidate_many(r["user_id"] for r in regs)
+    return len(regs)
+
+
+def move_session(exam_id, location_id, to_location_id, to_timeslot_id, timeslot_id=None,
+                 actor_id=None):
+    """Move every Active registration of a session to another room/time.
+
+    Students who already have another exam at ``to_timeslot_id`` that day
+    are left where they are, since moving them would double-book them.
+    Returns (moved count, registrations left in place), or raises
+    SessionChanged like cancel_session. The caller checks that the target
+    session exists and has the seats.
+    """
+    for _ in range(SESSION_ATTEMPTS):
+        regs = session_registrations(exam_id, location_id, timeslot_id)
+        if not regs:
+            return 0, []
+
+        busy = schedule.busy_users(
+            queries.OTHER_BOOKINGS_ON_DAY.all(users=sorted({r["user_id"] for r in regs}), e=exam_id,
+                                              day=regs[0]["exam_date"]),
+            regs[0]["exam_date"], to_timeslot_id,
+        )
+        clashes = [r for r in regs if r["user_id"] in busy]
+        regs = [r for r in regs if r["user_id"] not in busy]
+        if not regs:
+            return 0, clashes
+
+        try:
+            if _update_session(queries.MOVE_REGISTRATIONS, regs, location_id,
+                               l=to_location_id, t=to_timeslot_id) != len(regs):
+                db.session.rollback()
+                continue
+            ids = [r["id"] for r in regs]
+            queries.RESET_REMINDERS.execute(ids=ids)
+            queries.INSERT_REMINDERS.execute(_notices(regs, "moved"))
+            analytics.record(
+                change
+                for r in regs
+                for change in ((exam_id, location_id, r["timeslot_id"], -1, 0),
+                               (exam_id, to_location_id, to_timeslot_id, 1, 0))
+            )
+            events.log(events.event("moved", dict(r, exam_id=exam_id, location_id=location_id),
+                                    actor_id, location_id=to_location_id,
+                                    timeslot_id=to_timeslot_id)
+                       for r in regs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        break
+    else:
+        raise SessionChanged(exam_id, location_id)
+
+    seats_changed({(exam_id, location_id), (exam_id, to_location_id)})
+    schedule.invalidate_many(r["user_id"] for r in regs)
+    return len(regs), clashes
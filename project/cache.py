@@ -0,0 +1,88 @@
+# project/cache.py
+"""Small in-process caches shared by the blueprints.
+
+Everything here lives in the worker's memory: it is cheap to read and is
+lost on restart. Anything that must be consistent across workers is
+either keyed by a version counter (bumped when the underlying rows
+change) or kept short-lived. The counters are per process too; other
+workers bump theirs when the change is announced through project.pubsub.
+"""
+import threading
+import time
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe dict with per-entry expiry and a size bound."""
+
+    def __init__(self, default_ttl=300, max_entries=1024):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            with self._lock:
+                self._data.pop(key, None)
+            return default
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._evict()
+            self._data[key] = (time.monotonic() + ttl, value)
+        return value
+
+    def get_or_set(self, key, factory, ttl=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.set(key, factory(), ttl)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _evict(self):
+        # Drop expired entries first; if still full, drop the oldest tenth.
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in self._data.items() if exp < now]:
+            del self._data[k]
+        if len(self._data) >= self.max_entries:
+            for k in list(self._data)[: max(1, self.max_entries // 10)]:
+                del self._data[k]
+
+
+# ==========================================================
+#  Version counters
+# ==========================================================
+# Cached data is keyed by the version of what it was built from, e.g.
+# "catalog" (exam sessions + seat counts). Bumping a version makes every
+# entry keyed on the old value unreachable; TTLs clean them up.
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def get_version(name):
+    return _versions.get(name, 0)
+
+
+def bump_version(name):
+    with _versions_lock:
+        _versions[name] = _versions.get(name, 0) + 1
+        return _versions[name]
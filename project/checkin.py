@@ -0,0 +1,148 @@
+# project/checkin.py
+"""Exam-day check-in for proctor kiosks.
+
+On exam day every room used to refresh the faculty print log, which
+re-runs the full registrations join each time. A kiosk instead needs two
+things:
+
+* the room's roster for the day, which barely changes once the day has
+  started. ``roster()`` builds it with one indexed query and caches it
+  as compact JSON with an ETag. Kiosks poll with If-None-Match and almost
+  always get a 304. A booking or cancel for that room (the "seats"
+  channel) bumps the room's version, so the next poll rebuilds it.
+* a place to record arrivals. Kiosks queue check-ins locally and send
+  them in batches. ``record_checkins()`` filters a batch against the
+  cached roster, skips rows already stored, and writes the rest in a
+  single multi-row INSERT. The response carries the room's full
+  checked-in set so every kiosk in the room converges.
+"""
+import datetime
+import hashlib
+import json
+import os
+
+from sqlalchemy.exc import IntegrityError
+
+from . import db, queries
+from .cache import TTLCache, bump_version, get_version
+from .pubsub import broker
+from .refdata import refdata
+from .schedule import format_time
+from .seats import SEATS_CHANNEL
+
+# The largest batch one sync may carry; kiosks send far fewer.
+MAX_BATCH = 500
+
+ROSTER_COLUMNS = ("reg_id", "code", "name", "nshe_id", "exam", "time")
+
+_rosters = TTLCache(
+    default_ttl=int(os.environ.get("ROSTER_TTL", "900")),
+    max_entries=512,
+)
+
+
+def _room_version(location_id):
+    return get_version(f"roster:{location_id}")
+
+
+class Roster:
+    """One room's Active registrations for one day, serialised once."""
+
+    __slots__ = ("location_id", "day", "reg_ids", "body", "etag")
+
+    def __init__(self, location_id, day, rows, label):
+        self.location_id = location_id
+        self.day = day
+        self.reg_ids = frozenset(r["reg_id"] for r in rows)
+
+        payload = {
+            "location_id": location_id,
+            "location": label,
+            "date": day.isoformat(),
+            "columns": ROSTER_COLUMNS,
+            "rows": [
+                [r["reg_id"], r["confirmation_code"], r["student_name"], r["nshe_id"],
+                 r["exam_type"], format_time(r["exam_time"])]
+                for r in rows
+            ],
+        }
+        self.body = json.dumps(payload, separators=(",", ":")).encode()
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+
+def roster(location_id, day):
+    """The cached Roster for a room and day (one query on a miss)."""
+    key = (location_id, day, _room_version(location_id), get_version("refdata"))
+    return _rosters.get_or_set(key, lambda: Roster(
+        location_id, day,
+        queries.ROOM_ROSTER.all(loc=location_id, day=day),
+        refdata().label(location_id),
+    ))
+
+
+def checked_in(location_id, day):
+    """Registration ids already checked in for this room and day."""
+    return {r["registration_id"] for r in queries.ROOM_CHECKINS.all(loc=location_id, day=day)}
+
+
+def _arrival_time(value, day, now):
+    """The kiosk's local timestamp if it is on the exam day, else now."""
+    try:
+        at = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return now
+    if at.tzinfo is not None or at.date() != day or at > now:
+        return now
+    return at
+
+
+def record_checkins(location_id, day, items, proctor_id):
+    """Store a batch of arrivals for one room and day.
+
+    ``items`` is a list of {"reg_id": int, "at": "YYYY-MM-DDTHH:MM:SS"}.
+    Returns (accepted, rejected, checked_in): the ids written now, the ids
+    not on this room's roster, and the room's full checked-in set.
+    """
+    room = roster(location_id, day)
+    now = datetime.datetime.now().replace(microsecond=0)
+
+    arrivals, rejected = {}, []
+    for item in items[:MAX_BATCH]:
+        try:
+            rid = int(item.get("reg_id"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if rid not in room.reg_ids:
+            rejected.append(rid)
+        elif rid not in arrivals:
+            arrivals[rid] = _arrival_time(item.get("at"), day, now)
+
+    # A second kiosk in the same room can insert between our read and
+    # write; re-read and retry once instead of failing the whole batch.
+    for attempt in (1, 2):
+        done = checked_in(location_id, day)
+        rows = [
+            {"rid": rid, "loc": location_id, "day": day, "at": at, "by": proctor_id}
+            for rid, at in arrivals.items() if rid not in done
+        ]
+        if not rows:
+            return [], rejected, done
+        try:
+            queries.INSERT_CHECKINS.execute(rows)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == 2:
+                raise
+            continue
+        accepted = [r["rid"] for r in rows]
+        return accepted, rejected, done | set(accepted)
+
+
+def _on_seats_change(message):
+    location_id = message.get("location_id")
+    if location_id is not None:
+        bump_version(f"roster:{location_id}")
+
+
+broker.listen(SEATS_CHANNEL, _on_seats_change)
@@ -0,0 +1,309 @@
+# project/cli.py
+"""Operational commands, run with `flask --app wsgi <command>`."""
+from datetime import date, timedelta
+
+import click
+
+
+def init_cli(app):
+    app.cli.add_command(archive_registrations_command)
+    app.cli.add_command(refdata_reload_command)
+    app.cli.add_command(send_reminders_command)
+    app.cli.add_command(rollups_rebuild_command)
+    app.cli.add_command(rollups_verify_command)
+    app.cli.add_command(forecast_capacity_command)
+    app.cli.add_command(forecast_backtest_command)
+    app.cli.add_command(timetable_command)
+    app.cli.add_command(booking_events_backfill_command)
+    app.cli.add_command(booking_events_replay_command)
+    app.cli.add_command(booking_history_command)
+    app.cli.add_command(grant_admin_command)
+    app.cli.add_command(sessions_cleanup_command)
+    app.cli.add_command(profile_token_command)
+
+
+@click.command("archive-registrations")
+@click.option("--before", type=click.DateTime(formats=["%Y-%m-%d"]),
+              help="Archive registrations for exams dated before this day.")
+@click.option("--older-than-days", type=int, default=30, show_default=True,
+              help="Used when --before is not given.")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@click.option("--dry-run", is_flag=True, help="Only count what would be moved.")
+def archive_registrations_command(before, older_than_days, batch_size, dry_run):
+    """Move past-term registrations into registrations_archive.
+
+    Running workers hear about it (to refresh their highest archived
+    registration code) only through a shared PUBSUB_URL broker; with a
+    single worker and no broker, restart it after archiving.
+    """
+    from .archive import archive_registrations
+
+    cutoff = before.date() if before else date.today() - timedelta(days=older_than_days)
+    moved = archive_registrations(cutoff, batch_size=batch_size, dry_run=dry_run)
+    verb = "would move" if dry_run else "moved"
+    click.echo(f"{verb} {moved} registrations with exams before {cutoff}")
+
+
+@click.command("refdata-reload")
+def refdata_reload_command():
+    """Tell running workers to reload roles/departments/majors/locations/buildings.
+
+    Use after editing those tables by hand. Reaches other processes only
+    through a shared PUBSUB_URL broker; otherwise restart the workers.
+    """
+    from .refdata import refdata_changed
+
+    refdata_changed()
+    click.echo("refdata version bumped")
+
+
+@click.command("send-reminders")
+@click.option("--batch-size", type=int, default=200, show_default=True,
+              help="Queue rows read (and updated) per round trip.")
+@click.option("--limit", type=int, help="Send at most this many emails this run.")
+@click.option("--rate", type=float, help="Emails per second (default EMAIL_RATE_PER_SECOND or 2).")
+@click.option("--dry-run", is_flag=True, help="Only report what would be queued.")
+def send_reminders_command(batch_size, limit, rate, dry_run):
+    """Queue due 24h/1h exam reminders and send the queue. Run from cron."""
+    from .email_utils import RateLimitedTransport, email_configured
+    from .reminders import enqueue_due, send_queued
+
+    queued = enqueue_due(dry_run=dry_run)
+    summary = ", ".join(f"{n} {kind}" for kind, n in queued.items())
+    click.echo(f"{'would queue' if dry_run else 'queued'} {summary}")
+    if dry_run:
+        return
+    if not email_configured():
+        click.echo("RESEND_API_KEY not set; leaving reminders queued")
+        return
+
+    counts = send_queued(RateLimitedTransport(rate), batch_size=batch_size, limit=limit)
+    click.echo(f"sent {counts['sent']}, failed {counts['failed']}, skipped {counts['skipped']}")
+
+
+@click.command("rollups-rebuild")
+def rollups_rebuild_command():
+    """Recompute booking_rollups from registrations + registrations_archive."""
+    from .analytics import rebuild
+
+    rows = rebuild()
+    click.echo(f"rebuilt {rows} rollup rows")
+
+
+@click.command("rollups-verify")
+@click.option("--show", type=int, default=20, show_default=True, help="Mismatches to print.")
+def rollups_verify_command(show):
+    """Compare booking_rollups with a raw recount; exits 1 on any mismatch."""
+    from .analytics import verify
+
+    mismatches = verify()
+    for (exam_id, location_id, timeslot_id), have, want in mismatches[:show]:
+        click.echo(f"exam {exam_id} location {location_id} timeslot {timeslot_id}: "
+                   f"rollup {have} != raw {want}")
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} rollup slot(s) differ; run `flask rollups-rebuild`")
+    click.echo("rollups match raw registrations")
+
+
+@click.command("forecast-capacity")
+@click.option("--min-days-out", type=int, default=14, show_default=True,
+              help="Only resize exams at least this many days away.")
+@click.option("--margin", type=float, default=0.1, show_default=True,
+              help="Headroom over forecast demand when sharing seats out.")
+@click.option("--min-seats", type=int, default=5, show_default=True,
+              help="Never size a session below this.")
+@click.option("--show", type=int, default=30, show_default=True, help="Changed sessions to print.")
+@click.option("--apply", "apply_", is_flag=True, help="Write the proposed capacities.")
+def forecast_capacity_command(min_days_out, margin, min_seats, show, apply_):
+    """Forecast session demand and move seats between an exam's locations."""
+    from .forecast import apply, plan
+    from .refdata import refdata
+
+    proposals = plan(min_days_out=min_days_out, margin=margin, min_seats=min_seats)
+    changes = [p for p in proposals if p.proposed != p.capacity]
+    ref = refdata()
+    for p in changes[:show]:
+        click.echo(f"exam {p.exam_id} {p.exam_date} {ref.label(p.location_id) or p.location_id}: "
+                   f"booked {p.booked}, forecast {p.forecast:g}, "
+                   f"capacity {p.capacity} -> {p.proposed} (room {p.max_seats})")
+    if len(changes) > show:
+        click.echo(f"... {len(changes) - show} more")
+    if not apply_:
+        click.echo(f"{len(changes)} of {len(proposals)} sessions would change; rerun with --apply")
+        return
+    click.echo(f"resized {apply(proposals)} of {len(proposals)} sessions")
+
+
+@click.command("forecast-backtest")
+@click.option("--terms", type=int, default=2, show_default=True, help="Past terms to replay.")
+@click.option("--term-days", type=int, default=90, show_default=True)
+@click.option("--days-out", type=int, default=14, show_default=True,
+              help="Forecast from the bookings this many days before each exam.")
+@click.option("--margin", type=float, default=0.1, show_default=True)
+def forecast_backtest_command(terms, term_days, days_out, margin):
+    """Replay past terms: forecast error and students turned away, static vs planned."""
+    from .forecast import backtest
+
+    results = backtest(terms=terms, term_days=term_days, days_out=days_out, margin=margin)
+    if not results:
+        click.echo("not enough history to backtest")
+        return
+    for r in results:
+        click.echo(f"term from {r['start']}: {r['sessions']} sessions, demand {r['demand']}, "
+                   f"MAE {r['mae']}, WAPE {r['wape']}; turned away "
+                   f"{r['turned_away_static']} static -> {r['turned_away_planned']} planned, "
+                   f"empty seats {r['empty_static']} -> {r['empty_planned']}")
+
+
+@click.command("timetable")
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), required=True)
+@click.option("--end", type=click.DateTime(formats=["%Y-%m-%d"]), required=True)
+@click.option("--seconds", type=float, default=5.0, show_default=True,
+              help="Time budget for the local search.")
+@click.option("--show", type=int, default=20, show_default=True, help="Placements to print.")
+@click.option("--apply", "apply_", is_flag=True, help="Write rooms, timeslots and sessions.")
+def timetable_command(start, end, seconds, show, apply_):
+    """Assign conflict-free rooms and timeslots to exams dated start..end."""
+    from .refdata import refdata
+    from .timetable import load, provision, solve
+
+    exams, rooms, timeslots, fixed = load(start.date(), end.date())
+    if not exams:
+        click.echo("no unbooked exams in that range")
+        return
+    timetable = solve(exams, rooms, timeslots, fixed, seconds=seconds)
+
+    ref = refdata()
+    placements = sorted(timetable.placements.items(),
+                        key=lambda kv: (kv[1].exam_date, kv[1].timeslot_id))
+    for exam_id, p in placements[:show]:
+        rooms_text = "; ".join(ref.label(room) or str(room) for room in p.rooms)
+        click.echo(f"exam {exam_id} {p.exam_date} timeslot {p.timeslot_id}: "
+                   f"{timetable.exams[exam_id].enrollment}/{p.seats} seats in {rooms_text}")
+    click.echo(f"placed {len(timetable.placements)} of {len(exams)} exams "
+               f"({len(fixed)} room slots held by booked exams), "
+               f"utilization {timetable.utilization}%, {timetable.elapsed:.2f}s")
+    if timetable.unplaced:
+        click.echo(f"no room for exams: {', '.join(map(str, timetable.unplaced))}")
+    if apply_:
+        click.echo(f"provisioned {provision(timetable)} exams")
+
+
+@click.command("booking-events-backfill")
+def booking_events_backfill_command():
+    """Add 'booked'/'canceled' events for registrations that predate the event log."""
+    from .events import backfill
+
+    click.echo(f"added {backfill()} events")
+
+
+@click.command("booking-events-replay")
+@click.option("--batch-size", type=int, default=20000, show_default=True)
+@click.option("--show", type=int, default=20, show_default=True, help="Mismatches to print.")
+@click.option("--apply", "apply_", is_flag=True,
+              help="Write the replayed counts to booking_rollups.")
+def booking_events_replay_command(batch_size, show, apply_):
+    """Rebuild seat counts and rollups from booking_events and compare them.
+
+    Exits 1 when the log disagrees with registrations (before --apply,
+    also when it disagrees with booking_rollups).
+    """
+    import time
+
+    from .events import apply_replay, replay
+
+    started = time.perf_counter()
+    result = replay(batch_size=batch_size)
+    seats = result.seats_taken()
+    click.echo(f"replayed {result.events} events: {len(result.states)} registrations, "
+               f"{sum(seats.values())} seats taken in {len(seats)} sessions "
+               f"({time.perf_counter() - started:.2f}s)")
+
+    states = result.state_mismatches()
+    for rid, row, replayed in states[:show]:
+        click.echo(f"registration {rid}: table {row} != replay {replayed}")
+    for event_id, rid, kind in result.problems[:show]:
+        click.echo(f"event {event_id or '-'}: '{kind}' out of order for registration {rid}")
+
+    if apply_:
+        click.echo(f"wrote {apply_replay(result)} rollup slots")
+        rollups = []
+    else:
+        rollups = result.rollup_mismatches()
+        for (exam_id, location_id, timeslot_id), have, want in rollups[:show]:
+            click.echo(f"exam {exam_id} location {location_id} timeslot {timeslot_id}: "
+                       f"rollup {have} != replay {want}")
+
+    if states or rollups:
+        raise SystemExit(f"{len(states)} registration(s) and {len(rollups)} rollup slot(s) differ")
+    click.echo("event log matches registrations" + ("" if apply_ else " and rollups"))
+
+
+@click.command("booking-history")
+@click.option("--student", type=int, help="users.id of the student.")
+@click.option("--exam", type=int)
+@click.option("--location", type=int)
+@click.option("--limit", type=int, default=50, show_default=True)
+@click.option("--before", type=int, help="Event id to page back from.")
+def booking_history_command(student, exam, location, limit, before):
+    """Print booking events for a student or an (exam, location) session, newest first."""
+    from .events import session_history, student_history
+
+    if student:
+        rows = student_history(student, limit=limit, before=before)
+    elif exam and location:
+        rows = session_history(exam, location, limit=limit, before=before)
+    else:
+        raise click.UsageError("give --student, or --exam and --location")
+    for e in rows:
+        where = f"location {e['location_id']} timeslot {e['timeslot_id']}"
+        if e["kind"] == "moved":
+            where = f"location {e['from_location_id']} timeslot {e['from_timeslot_id']} -> " + where
+        click.echo(f"#{e['id']} {e['created_at']} {e['kind']:<8} "
+                   f"registration {e['registration_id']} "
+                   f"(student {e['user_id']}, exam {e['exam_id']}) {where} "
+                   f"by {e['actor_id'] or '-'}")
+
+
+@click.command("grant-admin")
+@click.argument("email")
+@click.option("--revoke", is_flag=True, help="Make the account faculty again.")
+def grant_admin_command(email, revoke):
+    """Give an existing account the admin role (/admin), or take it back."""
+    from . import queries
+    from .admin import ENTITIES, bulk_edit
+    from .refdata import refdata
+
+    role = refdata().roles_by_name.get("faculty" if revoke else "admin")
+    if role is None:
+        raise click.ClickException("no such role in the roles table; run `flask db upgrade`")
+    user = queries.ADMIN_USER_BY_EMAIL.first(email=email.strip().lower())
+    if user is None:
+        raise click.ClickException(f"no user with email {email}")
+    bulk_edit(ENTITIES["users"], "role", [user["id"]], role.id)
+    click.echo(f"{user['name']} <{email}> is now {role.name}")
+
+
+@click.command("sessions-cleanup")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+def sessions_cleanup_command(batch_size):
+    """Delete expired server-side sessions (schedule it, e.g. hourly)."""
+    from flask import current_app
+
+    from .sessions import ServerSessionInterface
+
+    interface = current_app.session_interface
+    if not isinstance(interface, ServerSessionInterface):
+        click.echo("cookie sessions in use; nothing to clean up")
+        return
+    click.echo(f"deleted {interface.store.cleanup(batch_size=batch_size)} expired sessions")
+
+
+@click.command("profile-token")
+def profile_token_command():
+    """Print a signed X-Profile header value (valid PROFILE_TOKEN_MAX_AGE seconds)."""
+    from flask import current_app
+
+    from .profiling import make_token
+
+    click.echo(make_token(current_app))
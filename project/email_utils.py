@@ -1,9 +1,10 @@
 # project/email_utils.py
+import logging
 import os
-import resend
+import threading
+import time
 
-# Load API key from environment variable (correct)
-resend.api_key = os.environ.get("RESEND_API_KEY")
+log = logging.getLogger(__name__)
 
 # Default from email (used if env var not set)
 FROM_EMAIL = os.environ.get(
@@ -12,10 +13,30 @@ FROM_EMAIL = os.environ.get(
 )
 
 
+def _resend_client():
+    """Import the Resend SDK on first send instead of at app boot.
 
-def send_exam_confirmation(to_email, subject, html_body):
-    if not resend.api_key:
-        print("⚠ RESEND_API_KEY not set; skipping email send.")
+    Returns None when RESEND_API_KEY is not configured, so environments
+    without email never import the SDK at all.
+    """
+    api_key = os.environ.get("RESEND_API_KEY")
+    if not api_key:
+        return None
+
+    import resend
+
+    resend.api_key = api_key
+    return resend
+
+
+def email_configured():
+    return bool(os.environ.get("RESEND_API_KEY"))
+
+
+def send_exam_confirmation(to_email, subject, html_body, text_body=None):
+    resend = _resend_client()
+    if resend is None:
+        log.warning("RESEND_API_KEY not set; skipping email send")
         return None
 
     params = {
@@ -24,12 +45,41 @@ def send_exam_confirmation(to_email, subject, html_body):
         "subject": subject,
         "html": html_body,
     }
+    if text_body:
+        params["text"] = text_body
 
     try:
         email = resend.Emails.send(params)
-        print("📧 Email sent:", email)
+        log.info("email sent", extra={"email_id": (email or {}).get("id")})
         return email
 
-    except Exception as e:
-        print("❌ Error sending email:", e)
+    except Exception:
+        log.exception("email send failed")
         return None
+
+
+class RateLimitedTransport:
+    """``send_exam_confirmation`` paced to at most ``per_second`` calls.
+
+    For bulk jobs (reminders): Resend rejects bursts above the account's
+    request rate, so calls are spaced evenly instead of retried. Returns
+    whatever ``send`` returns (None on failure).
+    """
+
+    def __init__(self, per_second=None, send=send_exam_confirmation):
+        if per_second is None:
+            per_second = float(os.environ.get("EMAIL_RATE_PER_SECOND", "2"))
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self.send = send
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, to_email, subject, html_body, text_body=None):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+        return self.send(to_email=to_email, subject=subject, html_body=html_body,
+                         text_body=text_body)
@@ -0,0 +1,85 @@
+# project/emails.py
+"""Email rendering: Jinja templates under templates/email/, compiled once.
+
+Each message is a pair of templates, ``<name>.html`` and ``<name>.txt``.
+The text template sets the subject::
+
+    {% set subject = "Reminder: " ~ exam_type %}
+
+HTML templates are autoescaped, so student names and exam titles can't
+inject markup. Templates are compiled at app startup (``init_emails``)
+and kept for the life of the process. Rendering needs no app or request
+context, so CLI jobs use the same templates as the web app.
+
+``render()`` builds one message from a plain dict; callers pass data they
+already hold (the booking context, a reminder row) so rendering never
+queries. ``render_batch()`` renders many messages with the same
+compiled templates for the reminder job.
+"""
+import os
+from collections import namedtuple
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+from .schedule import format_time
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates", "email")
+
+Email = namedtuple("Email", "subject html text")
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    undefined=StrictUndefined,
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False,   # never stat the files again once compiled
+    cache_size=-1,
+)
+_env.filters["time"] = lambda value: format_time(value) or "TBA"
+_env.filters["date"] = lambda value: (
+    value.strftime("%Y-%m-%d") if hasattr(value, "strftime") else str(value)
+)
+
+_compiled = {}  # name -> (html Template, text Template)
+
+
+def _templates(name):
+    pair = _compiled.get(name)
+    if pair is None:
+        pair = _compiled[name] = (
+            _env.get_template(f"{name}.html"),
+            _env.get_template(f"{name}.txt"),
+        )
+    return pair
+
+
+def precompile():
+    """Compile every email template now; returns their names."""
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(TEMPLATE_DIR)
+                    if f.endswith((".html", ".txt"))})
+    for name in names:
+        _templates(name)
+    return names
+
+
+def render(name, context):
+    """One Email(subject, html, text) from ``context`` (a dict)."""
+    html_tpl, text_tpl = _templates(name)
+    text_module = text_tpl.make_module(context)
+    return Email(
+        subject=" ".join(str(text_module.subject).split()),
+        html=html_tpl.render(context),
+        text=str(text_module).strip() + "\n",
+    )
+
+
+def render_batch(name, contexts):
+    """Render one Email per context, lazily, with the same compiled templates."""
+    _templates(name)
+    for context in contexts:
+        yield render(name, context)
+
+
+def init_emails(app):
+    app.extensions["email_templates"] = precompile()
@@ -0,0 +1,206 @@
+# project/events.py
+"""Append-only booking event log.
+
+``registrations.status`` is overwritten in place, so the table alone
+can't say who canceled a booking, or where a moved booking used to be.
+Every write in project.bookings therefore also appends to
+``booking_events`` in the same transaction, one row per registration
+touched:
+
+    booked     a new registration (including the new half of a reschedule
+               to another exam)
+    canceled   by the student, by faculty, or as the old half of a reschedule
+    moved      faculty moved it, or the student rescheduled within the same
+               exam; from_location_id / from_timeslot_id hold where it was
+
+Rows are never updated or deleted, not even by the archive job. Bulk
+actions write all their rows with one executemany.
+
+``student_history()`` and ``session_history()`` page through the log
+newest first, each backed by its own index. ``replay()`` folds the whole
+log, in id order, into per-slot booking/cancellation counts and
+per-registration state. Those can be checked against booking_rollups and
+registrations (``Replay.rollup_mismatches``/``state_mismatches``), or
+written back to booking_rollups with ``apply_replay()``. Registrations
+made before the log existed get synthetic events from ``backfill()``.
+Run as `flask booking-events-backfill`, `flask booking-events-replay
+[--apply]` and `flask booking-history`.
+"""
+from collections import defaultdict
+
+from . import db, queries
+
+
+def event(kind, reg, actor_id=None, location_id=None, timeslot_id=None):
+    """One INSERT_BOOKING_EVENTS row for a registration dict.
+
+    ``reg`` needs id/reg_id, user_id, exam_id, location_id and
+    timeslot_id. For 'moved', ``location_id``/``timeslot_id`` are the new
+    room and time, and the registration's own are recorded as from_*.
+    """
+    row = {
+        "rid": reg["id"] if "id" in reg else reg["reg_id"],
+        "u": reg["user_id"],
+        "e": reg["exam_id"],
+        "l": reg["location_id"],
+        "t": reg["timeslot_id"],
+        "fl": None,
+        "ft": None,
+        "kind": kind,
+        "actor": actor_id,
+    }
+    if kind == "moved":
+        row.update(l=location_id, t=timeslot_id, fl=reg["location_id"], ft=reg["timeslot_id"])
+    return row
+
+
+def log(rows):
+    """Append event rows inside the caller's transaction (one round trip)."""
+    rows = list(rows)
+    if rows:
+        queries.INSERT_BOOKING_EVENTS.execute(rows)
+
+
+def _page(query, limit, before, **params):
+    return query.all(limit=limit, before=before if before is not None else 2 ** 31 - 1, **params)
+
+
+def student_history(user_id, limit=50, before=None):
+    """A student's events, newest first; pass the last id as ``before`` for the next page."""
+    return _page(queries.STUDENT_EVENTS, limit, before, u=user_id)
+
+
+def session_history(exam_id, location_id, limit=50, before=None):
+    """Events in or moved out of an (exam, location) session, newest first."""
+    return _page(queries.SESSION_EVENTS, limit, before, e=exam_id, l=location_id)
+
+
+def backfill():
+    """Create events for registrations that predate the log; returns rows added."""
+    try:
+        added = queries.BACKFILL_BOOKED_EVENTS.execute().rowcount
+        added += queries.BACKFILL_CANCELED_EVENTS.execute().rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return added
+
+
+class Replay:
+    """Counts rebuilt from the event log.
+
+    Slot counts are sums, so event order only matters for each
+    registration's state. A backfilled 'booked' event can come after the
+    registration's later events; it then only adds its booking.
+    """
+
+    def __init__(self):
+        self.events = 0
+        # (exam, location, timeslot) -> [bookings, cancellations]
+        self.slots = defaultdict(lambda: [0, 0])
+        # registration id -> (exam, location, timeslot, status)
+        self.states = {}
+        # registrations with a 'booked' event
+        self.booked = set()
+        # (event id, registration id, kind) that don't fit
+        self.problems = []
+
+    def apply(self, e):
+        self.events += 1
+        rid, kind = e["registration_id"], e["kind"]
+        slot = (e["exam_id"], e["location_id"], e["timeslot_id"] or 0)
+        state = self.states.get(rid)
+        if kind == "booked":
+            self.slots[slot][0] += 1
+            if rid in self.booked:
+                self.problems.append((e["id"], rid, kind))
+            self.booked.add(rid)
+            if state is None:
+                self.states[rid] = (*slot, "Active")
+            return
+        if state is not None and state[3] != "Active":
+            self.problems.append((e["id"], rid, kind))
+        if kind == "canceled":
+            self.slots[slot][1] += 1
+            self.states[rid] = (*slot, "Canceled")
+        elif kind == "moved":
+            self.slots[(e["exam_id"], e["from_location_id"], e["from_timeslot_id"] or 0)][0] -= 1
+            self.slots[slot][0] += 1
+            self.states[rid] = (*slot, "Active")
+
+    def finish(self):
+        for rid in self.states.keys() - self.booked:
+            self.problems.append((None, rid, "never booked"))
+        return self
+
+    def seats_taken(self):
+        """{(exam_id, location_id): active registrations}."""
+        taken = defaultdict(int)
+        for exam_id, location_id, _, status in self.states.values():
+            if status == "Active":
+                taken[(exam_id, location_id)] += 1
+        return dict(taken)
+
+    def rollup_mismatches(self):
+        """Slots where booking_rollups differs from the replay: [(key, rollup, replay)]."""
+        rolled = {
+            (r["exam_id"], r["location_id"], r["timeslot_id"]): (r["bookings"], r["cancellations"])
+            for r in queries.ROLLUPS_ALL.all()
+        }
+        mismatches = []
+        for key in sorted(set(rolled) | set(self.slots)):
+            have = rolled.get(key, (0, 0))
+            want = tuple(self.slots.get(key, (0, 0)))
+            if have != want:
+                mismatches.append((key, have, want))
+        return mismatches
+
+    def state_mismatches(self):
+        """Registrations whose row differs from the replay: [(id, row, replay)]."""
+        mismatches = []
+        seen = set()
+        for r in queries.REGISTRATION_STATES.all():
+            seen.add(r["id"])
+            row = (r["exam_id"], r["location_id"], r["timeslot_id"] or 0, r["status"])
+            replayed = self.states.get(r["id"])
+            if replayed != row:
+                mismatches.append((r["id"], row, replayed))
+        mismatches.extend((rid, None, state)
+                          for rid, state in self.states.items() if rid not in seen)
+        return mismatches
+
+
+def replay(batch_size=20000):
+    """Fold the whole event log in id order; returns a Replay."""
+    result = Replay()
+    after = 0
+    while True:
+        rows = queries.BOOKING_EVENTS_PAGE.all(after=after, batch_size=batch_size)
+        if not rows:
+            break
+        for e in rows:
+            result.apply(e)
+        after = rows[-1]["id"]
+    return result.finish()
+
+
+def apply_replay(result):
+    """Overwrite booking_rollups counts with a replay's; returns slots written."""
+    existing = {(r["exam_id"], r["location_id"], r["timeslot_id"])
+                for r in queries.ROLLUPS_ALL.all()}
+    bump, insert = [], []
+    for (e, l, t), (b, c) in result.slots.items():
+        row = {"e": e, "l": l, "t": t, "b": b, "c": c}
+        (bump if (e, l, t) in existing else insert).append(row)
+    try:
+        queries.ZERO_ROLLUPS.execute()
+        if bump:
+            queries.ROLLUP_BUMP.execute(bump)
+        if insert:
+            queries.ROLLUP_INSERT.execute(insert)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(bump) + len(insert)
@@ -1,11 +1,41 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from flask_login import login_required
-from sqlalchemy import text
-from datetime import date
-from . import db
+from flask import (Blueprint, Response, abort, jsonify, render_template, request, flash, redirect,
+                   url_for)
+from flask_login import current_user, login_required
+from datetime import date, timedelta
+from . import login_manager, queries
+from .analytics import utilization
+from .bookings import (SessionChanged, cancel_booking, cancel_session, move_session,
+                       session_registrations)
+from .checkin import record_checkins, roster
+from .idempotency import idempotent
+from .loaders import exam_catalog
+from .refdata import refdata
+from .schedule import TIMESLOT_IDS, format_time
+from .seats import remaining_seats
+from .student_ui import get_timeslot_label
 
 faculty_ui = Blueprint("faculty_ui", __name__)
 
+STAFF_ROLES = ("faculty", "admin")
+SESSION_CHANGED_MESSAGE = ("This session's appointments changed while saving. "
+                           "Nothing was changed; please try again.")
+
+
+@faculty_ui.before_request
+def require_staff():
+    # Every page here shows or changes other students' bookings.
+    if not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    if current_user.role_name not in STAFF_ROLES:
+        abort(403)
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
 
 # ==========================================================
 # FACULTY DASHBOARD
@@ -28,55 +58,34 @@ def faculty_print_log():
     exam_q = (request.args.get("exam") or "").strip()
     status = (request.args.get("status") or "").strip()
 
-    where = []
     params = {}
 
     if start:
-        where.append("e.exam_date >= :start")
-        params["start"] = start
+        params["start"] = _parse_date(start)
 
     if end:
-        where.append("e.exam_date <= :end")
-        params["end"] = end
+        params["end"] = _parse_date(end)
 
     if exam_q:
-        where.append("e.exam_type LIKE :exam_q")
         params["exam_q"] = f"%{exam_q}%"
 
     if status in ("Active", "Canceled"):
-        where.append("r.status = :status")
         params["status"] = status
 
-    where_sql = ""
-    if where:
-        where_sql = "WHERE " + " AND ".join(where)
-
-    rows = db.session.execute(text(f"""
-        SELECT 
-            e.exam_type       AS exam_name,
-            e.exam_date,
-            ts.start_time     AS exam_time,
-            l.name            AS campus,
-            b.name            AS building,
-            l.room_number     AS room,
-            u.name            AS student_name,
-            r.registration_id AS confirmation_code,
-            r.status
-        FROM registrations r
-        JOIN exams e      ON e.id = r.exam_id
-        JOIN users u      ON u.id = r.user_id
-        JOIN locations l  ON l.id = r.location_id
-        JOIN buildings b  ON b.location_id = l.id
-        JOIN timeslots ts ON ts.id = r.timeslot_id
-        {where_sql}
-        ORDER BY e.exam_date, ts.start_time, campus, building, room, student_name
-    """), params).mappings().all()
+    # Drop filters whose date didn't parse instead of erroring the page.
+    params = {k: v for k, v in params.items() if v is not None}
+    rows = queries.print_log_query(params).all(**params)
 
+    ref = refdata()
     exams = []
     for row in rows:
         d = dict(row)
-        d["full_location"] = f"{d['campus']} – {d['building']}, Room {d['room']}"
+        d["full_location"] = ref.label(d["location_id"])
         exams.append(d)
+    # SQL orders by date/time/location id; rooms read better alphabetically.
+    exams.sort(key=lambda d: (
+        d["exam_date"], format_time(d["exam_time"]) or "", d["full_location"], d["student_name"]
+    ))
 
     return render_template(
         "faculty_print_log.html",
@@ -89,6 +98,28 @@ def faculty_print_log():
     )
 
 
+# ==========================================================
+# FACULTY CAPACITY DASHBOARD (booking_rollups only)
+# ==========================================================
+@faculty_ui.route("/analytics", methods=["GET"])
+@login_required
+def faculty_analytics():
+    start = _parse_date((request.args.get("start") or "").strip()) or date.today()
+    end = _parse_date((request.args.get("end") or "").strip()) or start + timedelta(days=30)
+
+    usage = utilization(start, end)
+    timeslot_labels = {t["id"]: t["label"] for t in _timeslot_choices()}
+    for row in usage.by_timeslot:
+        row["label"] = timeslot_labels.get(row["timeslot_id"], "No time")
+
+    return render_template(
+        "faculty_analytics.html",
+        usage=usage,
+        start=start.isoformat(),
+        end=end.isoformat(),
+    )
+
+
 # ==========================================================
 # FACULTY SEARCH APPOINTMENTS
 # ==========================================================
@@ -98,59 +129,31 @@ def faculty_search_appointments():
 
     results = []
     search_term = ""
+    include_history = False
 
     if request.method == "POST":
         search_term = (request.form.get("search_term") or "").strip()
+        include_history = request.form.get("include_history") == "1"
 
-        rows = db.session.execute(text("""
-            SELECT
-                r.id                AS reg_id,
-                r.registration_id   AS confirmation_code,
-                r.status,
-
-                u.name              AS student_name,
-                c.course_code       AS course_code,
-
-                e.exam_type,
-                e.exam_date,
-
-                ts.start_time       AS exam_time,
-
-                profuser.name       AS professor_name,
-
-                l.name              AS campus,
-                b.name              AS building,
-                l.room_number       AS room
-            FROM registrations r
-            JOIN users u        ON u.id = r.user_id
-            JOIN exams e        ON e.id = r.exam_id
-            JOIN courses c      ON c.id = e.course_id
-
-            JOIN professors p   ON p.id = e.professor_id
-            JOIN users profuser ON profuser.id = p.user_id
-
-            JOIN locations l    ON l.id = r.location_id
-            JOIN buildings b    ON b.location_id = l.id
-            JOIN timeslots ts   ON ts.id = r.timeslot_id
-
-            WHERE u.name LIKE :term
-               OR e.exam_type LIKE :term
-               OR r.registration_id LIKE :term
-               OR c.course_code LIKE :term
-               OR profuser.name LIKE :term
-
-            ORDER BY e.exam_date, ts.start_time
-        """), {"term": f"%{search_term}%"}).mappings().all()
+        # Live registrations only, unless faculty explicitly ask for past
+        # terms moved to registrations_archive.
+        if include_history:
+            query = queries.SEARCH_APPOINTMENTS_WITH_HISTORY
+        else:
+            query = queries.SEARCH_APPOINTMENTS
+        rows = query.all(term=f"%{search_term}%")
 
+        ref = refdata()
         for row in rows:
             d = dict(row)
-            d["full_location"] = f"{d['campus']} – {d['building']}, Room {d['room']}"
+            d["full_location"] = ref.label(d["location_id"])
             results.append(d)
 
     return render_template(
         "faculty_search_appointments.html",
         results=results,
-        search_term=search_term
+        search_term=search_term,
+        include_history=include_history,
     )
 
 
@@ -159,16 +162,13 @@ def faculty_search_appointments():
 # ==========================================================
 @faculty_ui.route("/cancel/<int:reg_id>", methods=["POST"])
 @login_required
+@idempotent
 def cancel_registration(reg_id):
     """
     Faculty cancellation MUST use the numeric ID.
     """
 
-    reg = db.session.execute(text("""
-        SELECT id, status
-        FROM registrations
-        WHERE id = :rid
-    """), {"rid": reg_id}).mappings().first()
+    reg = queries.REGISTRATION.first(rid=reg_id)
 
     if not reg:
         flash("Appointment not found.", "error")
@@ -178,12 +178,201 @@ def cancel_registration(reg_id):
         flash("This appointment is already canceled.", "info")
         return redirect(url_for("faculty_ui.faculty_search_appointments"))
 
-    db.session.execute(text("""
-        UPDATE registrations
-        SET status = 'Canceled'
-        WHERE id = :rid
-    """), {"rid": reg_id})
-    db.session.commit()
+    cancel_booking(reg, actor_id=current_user.id)
 
     flash("Appointment canceled successfully.", "success")
     return redirect(url_for("faculty_ui.faculty_search_appointments"))
+
+
+# ==========================================================
+# SESSIONS: BULK CANCEL / MOVE
+# ==========================================================
+def _timeslot_choices():
+    return [{"id": t, "label": "–".join(get_timeslot_label(t))} for t in TIMESLOT_IDS]
+
+
+def _optional_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@faculty_ui.route("/sessions", methods=["GET"])
+@login_required
+def faculty_sessions():
+    today = date.today()
+    sessions = sorted(
+        (s for s in exam_catalog().sessions.values() if s["exam_date"] >= today),
+        key=lambda s: (s["exam_date"], s["exam_type"], s["full_location"]),
+    )
+    return render_template("faculty_sessions.html", sessions=sessions)
+
+
+@faculty_ui.route("/sessions/<int:exam_id>/<int:location_id>", methods=["GET"])
+@login_required
+def faculty_session(exam_id, location_id):
+    catalog = exam_catalog()
+    session_info = catalog.session(exam_id, location_id)
+    if session_info is None:
+        abort(404)
+
+    counts = {r["timeslot_id"]: r["booked"]
+              for r in queries.SESSION_TIMESLOT_COUNTS.all(e=exam_id, l=location_id)}
+    timeslots = [dict(t, booked=counts.get(t["id"], 0)) for t in _timeslot_choices()]
+    targets = [s for (e, _), s in catalog.sessions.items() if e == exam_id]
+
+    return render_template(
+        "faculty_session.html",
+        session_info=session_info,
+        timeslots=timeslots,
+        total=sum(counts.values()),
+        targets=sorted(targets, key=lambda s: s["full_location"]),
+    )
+
+
+@faculty_ui.route("/sessions/<int:exam_id>/<int:location_id>/cancel", methods=["POST"])
+@login_required
+def faculty_session_cancel(exam_id, location_id):
+    back = url_for("faculty_ui.faculty_session", exam_id=exam_id, location_id=location_id)
+    if exam_catalog().session(exam_id, location_id) is None:
+        abort(404)
+
+    timeslot_id = _optional_int(request.form.get("timeslot_id"))
+    try:
+        canceled = cancel_session(exam_id, location_id, timeslot_id, actor_id=current_user.id)
+    except SessionChanged:
+        flash(SESSION_CHANGED_MESSAGE, "error")
+        return redirect(back)
+
+    if canceled:
+        flash(f"Canceled {canceled} appointment{'s' if canceled != 1 else ''}; "
+              "students will be notified by email.", "success")
+    else:
+        flash("No active appointments to cancel.", "info")
+    return redirect(back)
+
+
+@faculty_ui.route("/sessions/<int:exam_id>/<int:location_id>/move", methods=["POST"])
+@login_required
+def faculty_session_move(exam_id, location_id):
+    back = url_for("faculty_ui.faculty_session", exam_id=exam_id, location_id=location_id)
+    catalog = exam_catalog()
+    if catalog.session(exam_id, location_id) is None:
+        abort(404)
+
+    timeslot_id = _optional_int(request.form.get("timeslot_id"))
+    to_location_id = _optional_int(request.form.get("to_location_id"))
+    to_timeslot_id = _optional_int(request.form.get("to_timeslot_id"))
+
+    if catalog.session(exam_id, to_location_id) is None:
+        flash("This exam is not offered in the selected room.", "error")
+        return redirect(back)
+    if to_timeslot_id not in TIMESLOT_IDS:
+        flash("Please choose a new time.", "error")
+        return redirect(back)
+    if to_location_id == location_id and to_timeslot_id == timeslot_id:
+        flash("The new room and time are the same as the current ones.", "info")
+        return redirect(back)
+
+    if to_location_id != location_id:
+        # Seats are per (exam, room); moving within a room needs none.
+        needed = len(session_registrations(exam_id, location_id, timeslot_id))
+        left = remaining_seats([(exam_id, to_location_id)]).get((exam_id, to_location_id), 0)
+        if needed > left:
+            flash(f"The selected room has {left} seat{'s' if left != 1 else ''} left; "
+                  f"{needed} are needed.", "error")
+            return redirect(back)
+
+    try:
+        moved, clashes = move_session(exam_id, location_id, to_location_id, to_timeslot_id,
+                                      timeslot_id, actor_id=current_user.id)
+    except SessionChanged:
+        flash(SESSION_CHANGED_MESSAGE, "error")
+        return redirect(back)
+
+    if moved:
+        flash(f"Moved {moved} appointment{'s' if moved != 1 else ''}; "
+              "students will be notified by email.", "success")
+    elif not clashes:
+        flash("No active appointments to move.", "info")
+    if clashes:
+        n = len(clashes)
+        flash(f"{n} student{'s' if n != 1 else ''} already {'have' if n != 1 else 'has'} "
+              f"another exam at the new time and {'were' if n != 1 else 'was'} not moved.",
+              "error")
+    if not moved:
+        return redirect(back)
+    return redirect(url_for("faculty_ui.faculty_session", exam_id=exam_id,
+                            location_id=to_location_id))
+
+
+# ==========================================================
+# EXAM-DAY CHECK-IN (room kiosk)
+# ==========================================================
+def _kiosk_day():
+    return _parse_date((request.args.get("date") or "").strip()) or date.today()
+
+
+def _kiosk_location(location_id):
+    if location_id not in refdata().locations_by_id:
+        abort(404)
+    return location_id
+
+
+@faculty_ui.route("/checkin", methods=["GET"])
+@login_required
+def checkin_rooms():
+    ref = refdata()
+    rooms = [{"id": loc.id, "label": ref.label(loc.id)} for loc in ref.locations]
+    return render_template(
+        "faculty_checkin_rooms.html",
+        rooms=rooms,
+        today=date.today().strftime("%Y-%m-%d"),
+    )
+
+
+@faculty_ui.route("/checkin/<int:location_id>", methods=["GET"])
+@login_required
+def checkin_kiosk(location_id):
+    _kiosk_location(location_id)
+    day = _kiosk_day()
+    return render_template(
+        "faculty_checkin_kiosk.html",
+        location_id=location_id,
+        location=refdata().label(location_id),
+        day=day.isoformat(),
+    )
+
+
+@faculty_ui.route("/checkin/<int:location_id>/roster.json", methods=["GET"])
+@login_required
+def checkin_roster(location_id):
+    """The room's roster for the day; 304 while the kiosk's copy is current."""
+    _kiosk_location(location_id)
+    room = roster(location_id, _kiosk_day())
+
+    resp = Response(room.body, mimetype="application/json")
+    resp.set_etag(room.etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
+
+@faculty_ui.route("/checkin/<int:location_id>/sync", methods=["POST"])
+@login_required
+def checkin_sync(location_id):
+    """Record a batch of queued arrivals; returns the room's checked-in set."""
+    _kiosk_location(location_id)
+    data = request.get_json(silent=True) or {}
+    day = _parse_date(str(data.get("date") or "")) or date.today()
+    items = data.get("checkins") or []
+    if not isinstance(items, list):
+        abort(400)
+
+    accepted, rejected, done = record_checkins(location_id, day, items, current_user.id)
+    return jsonify(
+        date=day.isoformat(),
+        accepted=accepted,
+        rejected=rejected,
+        checked_in=sorted(done),
+    )
@@ -0,0 +1,303 @@
+# project/forecast.py
+"""Demand forecasting and capacity sizing for exam sessions.
+
+Every exam_locations row starts with the same capacity, so the popular
+campus for an exam fills on the first morning while the others sit
+half empty. This module predicts each session's final demand and spreads
+the exam's seats across its locations to match.
+
+The model is built from booking curves. For each past session we count
+how many (non-canceled) registrations were made d days before the exam,
+for d = 0..HORIZON; bookings made earlier than that land in the HORIZON
+bucket. Summed over all history, this gives the pickup curve F[d], the
+share of final demand already booked d days out. An upcoming session
+with b bookings at d days out has a pace estimate of b / F[d]. This is
+blended with a prior, the mean final demand of earlier sessions of the
+same course at the same location, falling back to the course mean and
+then the overall mean. The blend weight is F[d], so the forecast works
+out to b + (1 - F[d]) * prior: what is booked, plus the prior's share of
+demand still to come. Everything after the two history queries is
+array arithmetic over all sessions at once (NumPy).
+
+``plan()`` turns the forecasts into capacities. Each exam keeps its
+total seat count, and that pool is split across its locations in
+proportion to forecast demand. Each location is bounded below by what is
+already booked (and ``min_seats``) and above by the room's
+locations.max_seats (refdata's DEFAULT_ROOM_SEATS when not set).
+Capacity is per (exam, location), and every timeslot at a location
+shares it, so seats move between locations; timeslots are not sized
+individually. ``apply()`` writes the plan with one executemany UPDATE
+and publishes the seat change, so the catalog and open pages pick it up.
+
+``backtest()`` replays past terms. It trains on everything before the
+term, forecasts from the bookings each session had ``days_out`` days
+before its exam, and counts the students who would have been turned away
+under the static capacities and under the planned ones.
+
+Run as `flask forecast-capacity` (add --apply to write) and
+`flask forecast-backtest`. NumPy is imported on first use, so web
+workers that never forecast don't load it.
+"""
+import datetime
+from collections import namedtuple
+
+from . import db, queries
+from .refdata import refdata
+
+HORIZON = 120            # days of booking curve kept per session
+HISTORY_DAYS = 730       # how far back the training history reaches
+
+_KEY = 1 << 20           # packs (a, b) id pairs into one int64 key
+
+Proposal = namedtuple(
+    "Proposal", "exam_id location_id exam_date booked forecast capacity proposed max_seats"
+)
+
+
+def _np():
+    import numpy
+
+    return numpy
+
+
+def _dates(values):
+    """datetime64[D] array from DATE columns (date objects or ISO strings)."""
+    np = _np()
+    return np.array([str(v)[:10] for v in values], dtype="datetime64[D]")
+
+
+class History:
+    """Past sessions with their booking curves.
+
+    ``cum[i, d]`` is how many bookings session i had d or more days before
+    its exam; ``cum[:, 0]`` is its final demand.
+    """
+
+    def __init__(self, sessions, bookings):
+        np = _np()
+        self.exam_id = np.array([r["exam_id"] for r in sessions], dtype=np.int64)
+        self.location_id = np.array([r["location_id"] for r in sessions], dtype=np.int64)
+        self.course_id = np.array([r["course_id"] or 0 for r in sessions], dtype=np.int64)
+        self.capacity = np.array([r["capacity"] for r in sessions], dtype=np.int64)
+        self.exam_date = _dates([r["exam_date"] for r in sessions])
+
+        daily = np.zeros((len(sessions), HORIZON + 1), dtype=np.int64)
+        if bookings and sessions:
+            keys = self.exam_id * _KEY + self.location_id   # sorted: query orders by exam, location
+            want = (np.array([r["exam_id"] for r in bookings], dtype=np.int64) * _KEY
+                    + np.array([r["location_id"] for r in bookings], dtype=np.int64))
+            idx = np.clip(np.searchsorted(keys, want), 0, len(keys) - 1)
+            # False for registrations at a location the exam no longer offers
+            known = keys[idx] == want
+            idx = idx[known]
+            booked_on = _dates([r["booked_on"] for r in bookings])[known]
+            days = (self.exam_date[idx] - booked_on).astype(np.int64)
+            counts = np.array([r["n"] for r in bookings], dtype=np.int64)[known]
+            np.add.at(daily, (idx, np.clip(days, 0, HORIZON)), counts)
+        self.cum = np.cumsum(daily[:, ::-1], axis=1)[:, ::-1]
+
+    @classmethod
+    def load(cls, since, before):
+        return cls(queries.FORECAST_HISTORY_SESSIONS.all(since=since, before=before),
+                   queries.FORECAST_HISTORY_BOOKINGS.all(since=since, before=before))
+
+    def __len__(self):
+        return len(self.exam_id)
+
+    @property
+    def final(self):
+        return self.cum[:, 0]
+
+    def subset(self, mask):
+        part = object.__new__(History)
+        for name in ("exam_id", "location_id", "course_id", "capacity", "exam_date", "cum"):
+            setattr(part, name, getattr(self, name)[mask])
+        return part
+
+
+def _group_mean(keys, values, lookup):
+    """Mean of ``values`` per key, looked up for ``lookup``; (means, found)."""
+    np = _np()
+    if not len(keys):
+        return np.zeros(len(lookup)), np.zeros(len(lookup), dtype=bool)
+    groups, inverse = np.unique(keys, return_inverse=True)
+    means = np.bincount(inverse, weights=values) / np.bincount(inverse)
+    idx = np.clip(np.searchsorted(groups, lookup), 0, len(groups) - 1)
+    found = groups[idx] == lookup
+    return np.where(found, means[idx], 0.0), found
+
+
+class Model:
+    """Pickup curve and demand priors fitted on a History."""
+
+    def __init__(self, history):
+        np = _np()
+        final = history.final.astype(float)
+        total = final.sum()
+        self.pickup = history.cum.sum(axis=0) / total if total else np.zeros(HORIZON + 1)
+        self.global_mean = final.mean() if len(final) else 0.0
+        self._course = history.course_id
+        self._course_loc = history.course_id * _KEY + history.location_id
+        self._final = final
+
+    def prior(self, course_id, location_id):
+        np = _np()
+        by_pair, has_pair = _group_mean(self._course_loc, self._final,
+                                        course_id * _KEY + location_id)
+        by_course, has_course = _group_mean(self._course, self._final, course_id)
+        return np.where(has_pair, by_pair, np.where(has_course, by_course, self.global_mean))
+
+    def predict(self, course_id, location_id, booked, days_out):
+        """Expected final demand per session (float array)."""
+        np = _np()
+        share = self.pickup[np.clip(days_out, 0, HORIZON)]
+        return booked + (1.0 - share) * self.prior(course_id, location_id)
+
+
+def _split(pool, weight, lo, hi):
+    """Integer seats per location: sum == pool, lo <= seats <= hi, ~ weight.
+
+    ``pool`` is first moved into [sum(lo), sum(hi)]. Seats are
+    clip(scale * weight, lo, hi), and the scale is found by bisection
+    (the sum only grows with it), so a location pinned at a bound passes
+    its share on to the others.
+    """
+    np = _np()
+    pool = min(max(pool, int(lo.sum())), int(hi.sum()))
+    weight = np.where(weight > 0, weight, 1e-9)
+    low, high = 0.0, float(hi.max()) / weight.min()
+    for _ in range(60):
+        scale = (low + high) / 2
+        if np.clip(scale * weight, lo, hi).sum() < pool:
+            low = scale
+        else:
+            high = scale
+    seats = np.clip(high * weight, lo, hi)
+
+    # Largest remainder, never above a room's limit.
+    whole = np.floor(seats).astype(np.int64)
+    short = pool - int(whole.sum())
+    if short > 0:
+        order = np.argsort(-(seats - whole))
+        for i in order:
+            if short == 0:
+                break
+            if whole[i] < hi[i]:
+                whole[i] += 1
+                short -= 1
+    return whole
+
+
+def _allocate(exam_id, capacity, forecast, booked, limit, margin, min_seats):
+    """Proposed capacity per session, exam by exam."""
+    np = _np()
+    proposed = capacity.copy()
+    lo = np.maximum(booked, min_seats)
+    hi = np.maximum(limit, lo)
+    want = forecast * (1.0 + margin)
+    starts = np.flatnonzero(np.r_[True, exam_id[1:] != exam_id[:-1]])
+    for a, b in zip(starts, np.r_[starts[1:], len(exam_id)]):
+        proposed[a:b] = _split(int(capacity[a:b].sum()), want[a:b], lo[a:b], hi[a:b])
+    return proposed
+
+
+def _room_limits(location_ids, ref):
+    np = _np()
+    return np.array([ref.seat_limit(int(loc)) for loc in location_ids], dtype=np.int64)
+
+
+def plan(today=None, min_days_out=14, margin=0.1, min_seats=5):
+    """Proposals for every upcoming session at least ``min_days_out`` days away.
+
+    Sessions closer than that keep their capacity: students are already
+    booking them, and seats should not move under them.
+    """
+    np = _np()
+    today = today or datetime.date.today()
+    first = today + datetime.timedelta(days=min_days_out)
+    rows = queries.FORECAST_UPCOMING_SESSIONS.all(first=first)
+    if not rows:
+        return []
+
+    model = Model(History.load(today - datetime.timedelta(days=HISTORY_DAYS), today))
+    exam_id = np.array([r["exam_id"] for r in rows], dtype=np.int64)
+    location_id = np.array([r["location_id"] for r in rows], dtype=np.int64)
+    course_id = np.array([r["course_id"] or 0 for r in rows], dtype=np.int64)
+    capacity = np.array([r["capacity"] for r in rows], dtype=np.int64)
+    booked = np.array([r["booked"] for r in rows], dtype=np.int64)
+    days_out = (_dates([r["exam_date"] for r in rows]) - np.datetime64(today, "D")).astype(np.int64)
+
+    forecast = model.predict(course_id, location_id, booked, days_out)
+    limit = _room_limits(location_id, refdata())
+    proposed = _allocate(exam_id, capacity, forecast, booked, limit, margin, min_seats)
+
+    return [
+        Proposal(int(exam_id[i]), int(location_id[i]), rows[i]["exam_date"], int(booked[i]),
+                 round(float(forecast[i]), 1), int(capacity[i]), int(proposed[i]), int(limit[i]))
+        for i in range(len(rows))
+    ]
+
+
+def apply(proposals):
+    """Write proposed capacities; returns how many sessions changed."""
+    from .seats import seats_changed
+
+    changed = [{"capacity": p.proposed, "e": p.exam_id, "l": p.location_id}
+               for p in proposals if p.proposed != p.capacity]
+    if not changed:
+        return 0
+    try:
+        queries.SET_SESSION_CAPACITY.execute(changed)
+        queries.SET_ROLLUP_CAPACITY.execute(changed)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    seats_changed([(row["e"], row["l"]) for row in changed])
+    return len(changed)
+
+
+def backtest(today=None, terms=2, term_days=90, days_out=14, margin=0.1, min_seats=5):
+    """Replay the last ``terms`` terms; one result dict per term, oldest first.
+
+    Each term is forecast with a model trained only on exams before it,
+    from the bookings its sessions had ``days_out`` days before the exam.
+    ``mae``/``wape`` measure the forecast against actual demand;
+    ``turned_away_*`` count students beyond capacity, and ``empty_*``
+    the seats left unused, under the static and the planned capacities.
+    """
+    np = _np()
+    today = today or datetime.date.today()
+    oldest = today - datetime.timedelta(days=terms * term_days)
+    history = History.load(oldest - datetime.timedelta(days=HISTORY_DAYS), today)
+    ref = refdata()
+
+    results = []
+    for k in range(terms, 0, -1):
+        start = np.datetime64(today - datetime.timedelta(days=k * term_days), "D")
+        end = start + np.timedelta64(term_days, "D")
+        train = history.subset(history.exam_date < start)
+        term = history.subset((history.exam_date >= start) & (history.exam_date < end))
+        if not len(term) or not len(train):
+            continue
+
+        actual = term.final
+        booked = term.cum[:, min(days_out, HORIZON)]
+        forecast = Model(train).predict(term.course_id, term.location_id, booked,
+                                        np.full(len(term), days_out))
+        limit = _room_limits(term.location_id, ref)
+        planned = _allocate(term.exam_id, term.capacity, forecast, booked, limit, margin, min_seats)
+
+        error = np.abs(forecast - actual)
+        results.append({
+            "start": start.item(),
+            "sessions": len(term),
+            "demand": int(actual.sum()),
+            "mae": round(float(error.mean()), 2),
+            "wape": round(float(error.sum() / actual.sum()), 3) if actual.sum() else None,
+            "turned_away_static": int(np.maximum(actual - term.capacity, 0).sum()),
+            "turned_away_planned": int(np.maximum(actual - planned, 0).sum()),
+            "empty_static": int(np.maximum(term.capacity - actual, 0).sum()),
+            "empty_planned": int(np.maximum(planned - actual, 0).sum()),
+        })
+    return results
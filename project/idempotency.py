@@ -0,0 +1,171 @@
+# project/idempotency.py
+"""Idempotency keys for the booking and cancel forms.
+
+A double-clicked "Confirm", or a refresh or back button that resubmits
+the review form, used to run confirm-final again: every check query ran
+a second time, and the student got a confusing "already reserved" error,
+or on a race a second booking and a second email. Now each of these
+forms carries a fresh key (``{{ idempotency_key() }}`` in the template),
+and the view is wrapped in ``@idempotent``:
+
+* the first POST with a key claims it, runs the view, and stores the
+  outcome: the redirect target and the messages it flashed;
+* any repeat with the same key (scoped to the user, the endpoint and its
+  URL arguments) gets that outcome back, flashes included, without
+  running the view. So it never touches registrations or sends email;
+* a repeat that arrives while the first is still running waits up to
+  IDEMPOTENCY_WAIT seconds for its outcome;
+* outcomes that flashed an error, and views that raised, give the key
+  back, so a genuine retry runs again.
+
+Outcomes live for IDEMPOTENCY_TTL seconds. Like project.pubsub, the
+store is picked from the environment. The in-process store is the
+stand-in for dev and single-worker deployments. With IDEMPOTENCY_URL
+(or PUBSUB_URL) set to redis://..., keys are claimed with SET NX, so
+every worker sees them (needs the optional ``redis`` package).
+POSTs without a key (old pages, scripts) run as before.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from functools import wraps
+
+from flask import flash, redirect, request, session
+from flask_login import current_user
+
+from .cache import TTLCache
+
+KEY_FIELD = "idempotency_key"
+_KEY_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+_PENDING = {"pending": True}
+
+
+class LocalStore:
+    """Keys held in this process only."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = TTLCache(default_ttl=ttl, max_entries=50000)
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        with self._lock:
+            if self._data.get(key) is not None:
+                return False
+            self._data.set(key, _PENDING)
+            return True
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def finish(self, key, outcome):
+        self._data.set(key, outcome)
+
+    def release(self, key):
+        self._data.delete(key)
+
+
+class RedisStore:
+    """Keys shared by every worker through Redis."""
+
+    prefix = "ers:idem:"
+
+    def __init__(self, url, ttl):
+        import redis  # optional dependency, only needed for this store
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def claim(self, key):
+        return bool(self._client.set(self.prefix + key, json.dumps(_PENDING), nx=True, ex=self.ttl))
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def finish(self, key, outcome):
+        self._client.set(self.prefix + key, json.dumps(outcome), ex=self.ttl)
+
+    def release(self, key):
+        self._client.delete(self.prefix + key)
+
+
+store = LocalStore(int(os.environ.get("IDEMPOTENCY_TTL", "600")))
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def _scoped_key(token):
+    args = ",".join(f"{k}={v}" for k, v in sorted((request.view_args or {}).items()))
+    return f"{current_user.get_id()}:{request.endpoint}:{args}:{token}"
+
+
+def _replay(outcome):
+    # On a double click the first response is never shown, so its
+    # messages may still be queued; don't show them twice.
+    pending = {tuple(f) for f in session.get("_flashes", [])}
+    for category, message in outcome["flashes"]:
+        if (category, message) not in pending:
+            flash(message, category)
+    return redirect(outcome["location"])
+
+
+def _wait(key):
+    deadline = time.monotonic() + float(os.environ.get("IDEMPOTENCY_WAIT", "5"))
+    while time.monotonic() < deadline:
+        outcome = store.get(key)
+        if outcome is None or not outcome.get("pending"):
+            return outcome
+        time.sleep(0.05)
+    return None
+
+
+def idempotent(view):
+    """Run a redirecting POST view at most once per idempotency key."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request.form.get(KEY_FIELD, "")
+        if not _KEY_RE.match(token):
+            return view(*args, **kwargs)
+
+        key = _scoped_key(token)
+        if not store.claim(key):
+            outcome = _wait(key)
+            if outcome is not None and not outcome.get("pending"):
+                return _replay(outcome)
+            flash("This request is already being processed.", "info")
+            return redirect(request.referrer or "/")
+
+        before = len(session.get("_flashes", []))
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            store.release(key)
+            raise
+
+        flashes = [list(f) for f in session.get("_flashes", [])[before:]]
+        location = getattr(response, "location", None)
+        if not location or any(category == "error" for category, _ in flashes):
+            store.release(key)
+        else:
+            store.finish(key, {"location": location, "flashes": flashes})
+        return response
+
+    return wrapper
+
+
+def init_idempotency(app):
+    global store
+    ttl = int(os.environ.get("IDEMPOTENCY_TTL", "600"))
+    url = os.environ.get("IDEMPOTENCY_URL") or os.environ.get("PUBSUB_URL", "")
+    if url.startswith(("redis://", "rediss://")):
+        store = RedisStore(url, ttl)
+    else:
+        store = LocalStore(ttl)
+    app.jinja_env.globals["idempotency_key"] = new_key
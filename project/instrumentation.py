@@ -0,0 +1,144 @@
+# project/instrumentation.py
+"""Per-request timing: DB time vs. template render time.
+
+Every request gets a RequestTimings object on flask.g. SQLAlchemy cursor
+events add to the DB totals and Jinja render signals add per-template
+times (with any DB time spent inside the render, e.g. lazy loads,
+subtracted so the two never double count).
+
+With SERVER_TIMING=1 the numbers are returned in a Server-Timing header,
+which shows up in the browser devtools Timing tab. Each request is also
+logged as one structured record: INFO, sampled by LOG_SAMPLE (see
+project.logs); WARNING, never sampled, when it took SLOW_REQUEST_MS or
+more. With CAPTURE_SQL on
+(tools/query_plan_report.py sets it) every executed statement and its
+parameters are kept on the timings object as well.
+"""
+import logging
+import os
+import time
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from . import db
+
+log = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    __slots__ = ("start", "db_time", "db_count", "templates", "statements", "_render_stack")
+
+    def __init__(self, capture_sql=False):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.db_count = 0
+        self.templates = []  # [(template name, seconds)]
+        self.statements = [] if capture_sql else None  # [(sql, parameters, executemany)]
+        self._render_stack = []
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def template_time(self):
+        return sum(t for _, t in self.templates)
+
+    def server_timing(self):
+        parts = [f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count} queries"']
+        parts += [f'tpl;dur={t * 1000:.1f};desc="{name}"' for name, t in self.templates]
+        parts.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current_timings():
+    """RequestTimings for the active request, or None outside one."""
+    if not has_request_context():
+        return None
+    return g.get("timings")
+
+
+# ----------------------------------------------------------
+# SQLAlchemy hooks
+# ----------------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    timings = current_timings()
+    if timings is not None:
+        timings.db_time += time.perf_counter() - started
+        timings.db_count += 1
+        if timings.statements is not None:
+            timings.statements.append((statement, parameters, executemany))
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    stack = conn.info.get("query_start") if conn is not None else None
+    if stack:
+        stack.pop()
+
+
+# ----------------------------------------------------------
+# Jinja hooks
+# ----------------------------------------------------------
+def _before_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings._render_stack.append((time.perf_counter(), timings.db_time))
+
+
+def _after_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is None or not timings._render_stack:
+        return
+    started, db_before = timings._render_stack.pop()
+    spent = time.perf_counter() - started - (timings.db_time - db_before)
+    timings.templates.append((template.name, spent))
+
+
+def init_instrumentation(app):
+    app.config.setdefault("SERVER_TIMING", os.environ.get("SERVER_TIMING", "0") == "1")
+    app.config.setdefault("CAPTURE_SQL", False)
+    app.config.setdefault("SLOW_REQUEST_MS", int(os.environ.get("SLOW_REQUEST_MS", "1000")))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def _start_timings():
+        g.timings = RequestTimings(capture_sql=app.config["CAPTURE_SQL"])
+
+    @app.after_request
+    def _report_timings(response):
+        timings = g.get("timings")
+        if timings is None:
+            return response
+        if app.config["SERVER_TIMING"]:
+            response.headers["Server-Timing"] = timings.server_timing()
+        total_ms = timings.elapsed * 1000
+        log.log(
+            logging.WARNING if total_ms >= app.config["SLOW_REQUEST_MS"] else logging.INFO,
+            "%s %s %s", request.method, request.path, response.status_code,
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "total_ms": round(total_ms, 1),
+                "db_ms": round(timings.db_time * 1000, 1),
+                "db_count": timings.db_count,
+                "tpl_ms": round(timings.template_time * 1000, 1),
+            },
+        )
+        return response
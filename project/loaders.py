@@ -0,0 +1,97 @@
+# project/loaders.py
+"""Data loaders for the scheduling flow.
+
+The schedule page (GET /student/exams), the review step (POST
+/student/exams) and confirm-final all need the same data: the location
+dropdown, every exam session with its remaining seats, and the
+exam/location labels for the one being booked. ``exam_catalog()`` fetches
+the sessions in one round trip (queries.EXAM_CATALOG), takes locations
+and labels from project.refdata, and caches the result under the current
+"catalog" and "refdata" versions. Those versions are counters in each
+worker's memory (project.cache). Any booking or cancel bumps the local one
+and publishes on the "seats" channel (project.seats); other workers bump
+theirs when the message arrives. Edits to the exams and courses it shows
+(project.admin) call ``catalog_changed()``, which does the same through
+the "catalog" channel. That only reaches other processes through a shared
+PUBSUB_URL broker; with one, stale seat counts last no longer than the
+pub/sub hop. Without one (or if a message is lost) other workers catch up
+after EXAM_CATALOG_TTL, and the booking itself is still refused by the
+INSERT's own checks. In the normal GET → review → confirm sequence only
+the first request queries.
+"""
+import os
+
+from . import queries
+from .cache import TTLCache, bump_version, get_version
+from .pubsub import broker
+from .refdata import refdata
+
+CATALOG_CHANNEL = "catalog"
+
+_catalogs = TTLCache(
+    default_ttl=int(os.environ.get("EXAM_CATALOG_TTL", "60")),
+    max_entries=4,
+)
+
+
+class ExamCatalog:
+    """Locations and exam sessions as the scheduling pages use them."""
+
+    def __init__(self, rows, ref):
+        sessions = {}
+        for r in rows:
+            sessions[(r["exam_id"], r["location_id"])] = {
+                "exam_id": r["exam_id"],
+                "exam_type": r["exam_type"],
+                "exam_date": r["exam_date"],
+                "course_code": r["course_code"],
+                "professor_name": r["professor_name"],
+                "location_id": r["location_id"],
+                "full_location": ref.label(r["location_id"]),
+                "remaining": r["capacity"] - r["used_seats"],
+            }
+
+        self.locations = [{"id": loc.id, "name": loc.name} for loc in ref.locations]
+        self.sessions = sessions
+
+    def session(self, exam_id, location_id):
+        """The session for a submitted (exam_id, location_id), or None."""
+        try:
+            return self.sessions.get((int(exam_id), int(location_id)))
+        except (TypeError, ValueError):
+            return None
+
+    def available(self):
+        """Sessions with seats left, soonest first, shaped for schedule_exam.html."""
+        out = []
+        for s in sorted(self.sessions.values(), key=lambda s: s["exam_date"]):
+            if s["remaining"] > 0:
+                out.append({
+                    "exam_id": s["exam_id"],
+                    "exam_type": s["exam_type"],
+                    "exam_date": s["exam_date"].strftime("%Y-%m-%d"),
+                    "professor_name": s["professor_name"],
+                    "location_id": s["location_id"],
+                    "remaining": s["remaining"],
+                })
+        return out
+
+
+def exam_catalog():
+    """The current ExamCatalog (one query on a miss)."""
+    ref = refdata()
+    key = (get_version("catalog"), get_version("refdata"))
+    return _catalogs.get_or_set(key, lambda: ExamCatalog(queries.EXAM_CATALOG.all(), ref))
+
+
+def catalog_changed():
+    """Call after committing an edit to exams or courses the catalog shows."""
+    bump_version("catalog")
+    broker.publish(CATALOG_CHANNEL, {})
+
+
+def _on_catalog_change(message):
+    bump_version("catalog")
+
+
+broker.listen(CATALOG_CHANNEL, _on_catalog_change)
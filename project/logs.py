@@ -0,0 +1,230 @@
+# project/logs.py
+"""Structured, non-blocking application logging.
+
+Diagnostics used to be print() calls, which under gunicorn are a
+blocking write to stdout on the request path and never reach a log
+handler. Now modules log through the standard library
+(``log = logging.getLogger(__name__)``) and ``init_logging`` wires the
+root logger as follows:
+
+* Records are formatted as one JSON object per line: ts, level, logger,
+  msg, request_id, anything passed in ``extra=`` and the traceback as
+  exc. Formatting happens in the caller; the record then goes onto a
+  bounded queue. A QueueListener thread does the actual writing, to
+  stderr and, with LOG_FILE set, to that file as well. A request never
+  waits on log I/O. If the writer falls behind, records beyond
+  LOG_QUEUE_SIZE are dropped and counted (``dropped()``).
+* Every request gets an id: the X-Request-ID header when the router sent
+  one (Heroku does), else a fresh one. It is stamped on every record
+  logged during the request and echoed back in the response header.
+* LOG_LEVEL sets the root level (default INFO). LOG_LEVELS overrides it
+  per logger, e.g. ``project.instrumentation=DEBUG,sqlalchemy.engine=INFO``.
+* LOG_SAMPLE keeps only a fraction of a logger's records below WARNING,
+  e.g. ``project.instrumentation=0.1`` (the default) for the per-request
+  timing lines. Kept records carry the rate as ``sample``, so counts can
+  be scaled back up. Warnings and errors are never sampled.
+
+After a fork (gunicorn preload) call ``after_fork()`` so the child starts
+its own writer thread; gunicorn.conf.py does this in post_fork.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{8,128}$")
+
+# LogRecord attributes that are not user-supplied ``extra`` fields.
+_STANDARD_ATTRS = (set(vars(logging.makeLogRecord({})))
+                   | {"message", "asctime", "request_id", "sample"})
+
+_handler = None
+_listener = None
+_outputs = []
+
+
+# ==========================================================
+#  Formatting + filters
+# ==========================================================
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        sample = getattr(record, "sample", None)
+        if sample is not None:
+            entry["sample"] = sample
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = g.get("request_id") if has_request_context() else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep ``rate`` of a logger's records below WARNING (longest prefix wins)."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda kv: -len(kv[0]))
+
+    def _rate(self, name):
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return None
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate is None:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample = rate
+        return True
+
+
+class AsyncHandler(logging.handlers.QueueHandler):
+    """QueueHandler that formats in the caller and never blocks on a full queue."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener only writes; ship the finished line.
+        line = self.format(record)
+        return logging.makeLogRecord({"msg": line, "levelno": record.levelno,
+                                      "levelname": record.levelname, "name": record.name})
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def dropped():
+    """Records dropped because the writer thread fell behind."""
+    return _handler.dropped if _handler is not None else 0
+
+
+# ==========================================================
+#  Setup
+# ==========================================================
+def _pairs(spec):
+    """``a=1,b=2`` -> [("a", "1"), ("b", "2")]; malformed parts are skipped."""
+    out = []
+    for part in spec.split(","):
+        name, sep, value = part.strip().partition("=")
+        if sep and name.strip() and value.strip():
+            out.append((name.strip(), value.strip()))
+    return out
+
+
+def _start_listener():
+    global _listener
+    _handler.queue = queue.Queue(int(os.environ.get("LOG_QUEUE_SIZE", "10000")))
+    _listener = logging.handlers.QueueListener(_handler.queue, *_outputs,
+                                               respect_handler_level=False)
+    _listener.start()
+
+
+def after_fork():
+    """Start a writer thread in a forked child (threads don't survive fork)."""
+    if _handler is not None:
+        _start_listener()
+
+
+def _stop():
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def configure():
+    """(Re)wire the root logger from the environment."""
+    global _handler, _outputs
+
+    _stop()
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    for output in _outputs:
+        output.close()
+
+    plain = logging.Formatter("%(message)s")
+    _outputs = [logging.StreamHandler(sys.stderr)]
+    if os.environ.get("LOG_FILE"):
+        _outputs.append(logging.FileHandler(os.environ["LOG_FILE"], encoding="utf-8"))
+    for output in _outputs:
+        output.setFormatter(plain)
+
+    _handler = AsyncHandler(None)
+    _handler.setFormatter(JsonFormatter())
+    rates = {}
+    for name, value in _pairs(os.environ.get("LOG_SAMPLE", "project.instrumentation=0.1")):
+        try:
+            rates[name] = min(max(float(value), 0.0), 1.0)
+        except ValueError:
+            pass
+    if rates:
+        _handler.addFilter(SamplingFilter(rates))
+    _handler.addFilter(RequestIdFilter())
+    root.addHandler(_handler)
+    _start_listener()
+
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    for name, level in _pairs(os.environ.get("LOG_LEVELS", "")):
+        try:
+            logging.getLogger(name).setLevel(level.upper())
+        except ValueError:
+            root.warning("LOG_LEVELS: unknown level %r for %s", level, name)
+
+
+atexit.register(_stop)
+
+
+def init_logging(app):
+    configure()
+    # Flask's own stderr handler would print every app.logger record twice.
+    app.logger.removeHandler(default_handler)
+
+    @app.before_request
+    def _assign_request_id():
+        incoming = request.headers.get("X-Request-ID", "")
+        g.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def _echo_request_id(response):
+        request_id = g.get("request_id")
+        if request_id:
+            response.headers["X-Request-ID"] = request_id
+        return response
@@ -1,4 +1,5 @@
 from flask_login import UserMixin
+from sqlalchemy.dialects import mysql
 from project import db
 
 
@@ -6,7 +7,7 @@ from project import db
 # Role
 # ----------------------------
 class Role(db.Model):
-    __tablename__ = 'Roles'
+    __tablename__ = 'roles'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
@@ -18,7 +19,7 @@ class Role(db.Model):
 # Department
 # ----------------------------
 class Department(db.Model):
-    __tablename__ = 'Departments'
+    __tablename__ = 'departments'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
@@ -28,12 +29,12 @@ class Department(db.Model):
 # Major
 # ----------------------------
 class Major(db.Model):
-    __tablename__ = 'Majors'
+    __tablename__ = 'majors'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
 
-    department_id = db.Column(db.Integer, db.ForeignKey('Departments.id'), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False)
     department = db.relationship("Department", backref="majors", lazy=True)
 
 
@@ -41,7 +42,7 @@ class Major(db.Model):
 # User (Authentication + Domain User)
 # ----------------------------
 class User(db.Model, UserMixin):
-    __tablename__ = 'Users'
+    __tablename__ = 'users'
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -54,17 +55,23 @@ class User(db.Model, UserMixin):
 
     password_hash = db.Column(db.String(255), nullable=False)
 
-    role_id = db.Column(db.Integer, db.ForeignKey('Roles.id'), nullable=False)
-    department_id = db.Column(db.Integer, db.ForeignKey('Departments.id'))
-    major_id = db.Column(db.Integer, db.ForeignKey('Majors.id'))
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'))
+    major_id = db.Column(db.Integer, db.ForeignKey('majors.id'))
 
     status = db.Column(db.Enum('Active', 'Inactive'), default='Active')
 
     department = db.relationship("Department", lazy=True)
     major = db.relationship("Major", lazy=True)
 
+    @property
+    def role_name(self):
+        """Lower-cased role name from the in-memory reference data (no query)."""
+        from project.refdata import refdata
+        return refdata().role_name(self.role_id)
+
     def __repr__(self):
-        return f"<User {self.email} ({self.role.name})>"
+        return f"<User {self.email} ({self.role_name})>"
 
 
 # ----------------------------
@@ -72,15 +79,15 @@ class User(db.Model, UserMixin):
 # One-to-One with Users
 # ----------------------------
 class Authentication(db.Model):
-    __tablename__ = 'Authentication'
+    __tablename__ = 'authentication'
 
     auth_id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
 
     username = db.Column(db.String(150), nullable=False)
     email = db.Column(db.String(150), nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    role_id = db.Column(db.Integer, db.ForeignKey('Roles.id'), nullable=False)
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
 
     user = db.relationship("User", backref=db.backref("auth_record", uselist=False))
     role = db.relationship("Role", lazy=True)
@@ -90,10 +97,10 @@ class Authentication(db.Model):
 # Professors
 # ----------------------------
 class Professor(db.Model):
-    __tablename__ = 'Professors'
+    __tablename__ = 'professors'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     title = db.Column(db.String(50))
 
@@ -104,11 +111,12 @@ class Professor(db.Model):
 # Locations (Campus)
 # ----------------------------
 class Location(db.Model):
-    __tablename__ = 'Locations'
+    __tablename__ = 'locations'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)  # Campus Name
     room_number = db.Column(db.String(50), nullable=False)  # Required
+    max_seats = db.Column(db.Integer)  # room limit for exam capacity; NULL = DEFAULT_ROOM_SEATS
 
     buildings = db.relationship("Building", backref="campus", lazy=True)
 
@@ -120,12 +128,15 @@ class Location(db.Model):
 # Buildings
 # ----------------------------
 class Building(db.Model):
-    __tablename__ = 'Buildings'
+    __tablename__ = 'buildings'
+    __table_args__ = (
+        db.Index('ix_buildings_location', 'location_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)  # Building name
 
-    location_id = db.Column(db.Integer, db.ForeignKey('Locations.id'), nullable=False)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=False)
 
     def full_label(self):
         return f"{self.campus.name} — {self.name}"
@@ -135,13 +146,13 @@ class Building(db.Model):
 # Courses
 # ----------------------------
 class Course(db.Model):
-    __tablename__ = 'Courses'
+    __tablename__ = 'courses'
 
     id = db.Column(db.Integer, primary_key=True)
     course_code = db.Column(db.String(20), nullable=False)
     course_name = db.Column(db.String(150), nullable=False)
 
-    department_id = db.Column(db.Integer, db.ForeignKey('Departments.id'), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False)
 
     department = db.relationship("Department", backref="courses", lazy=True)
 
@@ -150,7 +161,7 @@ class Course(db.Model):
 # Timeslots
 # ----------------------------
 class Timeslot(db.Model):
-    __tablename__ = 'Timeslots'
+    __tablename__ = 'timeslots'
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.Time, nullable=False)
@@ -161,27 +172,31 @@ class Timeslot(db.Model):
 # Exams
 # ----------------------------
 class Exam(db.Model):
-    __tablename__ = 'Exams'
+    __tablename__ = 'exams'
+    __table_args__ = (
+        db.Index('ix_exams_date_time', 'exam_date', 'exam_time'),
+        db.Index('ix_exams_date_id', 'exam_date', 'id'),  # keyset paging
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
     exam_type = db.Column(db.String(255), nullable=False)
 
-    course_id = db.Column(db.Integer, db.ForeignKey('Courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
     course = db.relationship("Course", backref="exams", lazy=True)
 
     exam_date = db.Column(db.Date, nullable=False)
     exam_time = db.Column(db.Time)
 
-    location_id = db.Column(db.Integer, db.ForeignKey('Locations.id'), nullable=False)
-    building_id = db.Column(db.Integer, db.ForeignKey('Buildings.id'), nullable=False)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=False)
+    building_id = db.Column(db.Integer, db.ForeignKey('buildings.id'), nullable=False)
 
     capacity = db.Column(db.Integer, default=20)
 
-    professor_id = db.Column(db.Integer, db.ForeignKey('Professors.id'))
+    professor_id = db.Column(db.Integer, db.ForeignKey('professors.id'))
     professor = db.relationship("Professor", backref="exams", lazy=True)
 
-    timeslot_id = db.Column(db.Integer, db.ForeignKey('Timeslots.id'))
+    timeslot_id = db.Column(db.Integer, db.ForeignKey('timeslots.id'))
     timeslot = db.relationship("Timeslot", lazy=True)
 
     location = db.relationship("Location", lazy=True)
@@ -195,15 +210,25 @@ class Exam(db.Model):
 # Registrations
 # ----------------------------
 class Registration(db.Model):
-    __tablename__ = 'Registrations'
+    __tablename__ = 'registrations'
+    __table_args__ = (
+        # one row per student and exam; a reschedule moves it (bookings)
+        db.UniqueConstraint('exam_id', 'user_id', name='uq_registrations_exam_user'),
+        # seat counts per (exam, location) session
+        db.Index('ix_reg_exam_loc_status', 'exam_id', 'location_id', 'status'),
+        # active-limit and duplicate-booking checks per student
+        db.Index('ix_reg_user_status_exam', 'user_id', 'status', 'exam_id'),
+        db.Index('ix_reg_exam_status', 'exam_id', 'status'),
+        db.Index('ix_reg_regid', 'registration_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     registration_id = db.Column(db.String(10), unique=True)
 
-    exam_id = db.Column(db.Integer, db.ForeignKey('Exams.id'), nullable=False)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
     exam = db.relationship("Exam", backref="registrations", lazy=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     user = db.relationship("User", backref="registrations", lazy=True)
 
     timeslot_id = db.Column(db.Integer)
@@ -214,3 +239,189 @@ class Registration(db.Model):
 
     def __repr__(self):
         return f"<Reg {self.registration_id} for exam {self.exam_id}>"
+
+
+# ----------------------------
+# Exam sessions (exam offered at a campus, with its own capacity)
+# ----------------------------
+class ExamLocation(db.Model):
+    __tablename__ = 'exam_locations'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'location_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id', ondelete='CASCADE'), nullable=False)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id', ondelete='CASCADE'),
+                            nullable=False)
+    capacity = db.Column(db.Integer, nullable=False, default=20)
+
+    exam = db.relationship("Exam", backref="sessions", lazy=True)
+    location = db.relationship("Location", lazy=True)
+
+
+# ----------------------------
+# Registrations archive
+# Rows moved out of `registrations` once their exam term is over, so hot
+# queries never scan history. Keeps the original primary key.
+# ----------------------------
+class RegistrationArchive(db.Model):
+    __tablename__ = 'registrations_archive'
+    __table_args__ = (
+        db.Index('ix_reg_archive_user', 'user_id'),
+        db.Index('ix_reg_archive_exam', 'exam_id'),
+        db.Index('ix_reg_archive_regid', 'registration_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    registration_id = db.Column(db.String(10))
+
+    exam_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+
+    timeslot_id = db.Column(db.Integer)
+    location_id = db.Column(db.Integer)
+
+    registration_date = db.Column(db.DateTime)
+    status = db.Column(db.Enum('Active', 'Canceled'))
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    def __repr__(self):
+        return f"<ArchivedReg {self.registration_id} for exam {self.exam_id}>"
+
+
+# ----------------------------
+# Exam-day check-ins
+# One row per registration a proctor marked as arrived. Written in bulk by
+# the room kiosk (project.checkin); keyed by registrations.id so a
+# re-sent batch is a no-op.
+# ----------------------------
+class CheckIn(db.Model):
+    __tablename__ = 'checkins'
+    __table_args__ = (
+        db.Index('ix_checkins_location_date', 'location_id', 'exam_date'),
+    )
+
+    registration_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    location_id = db.Column(db.Integer, nullable=False)
+    exam_date = db.Column(db.Date, nullable=False)
+    checked_in_at = db.Column(db.DateTime, nullable=False)
+    checked_in_by = db.Column(db.Integer)  # users.id of the proctor
+
+    def __repr__(self):
+        return f"<CheckIn reg {self.registration_id} at location {self.location_id}>"
+
+
+# ----------------------------
+# Exam reminders
+# Queue of reminder emails (24h / 1h before the exam) and faculty notices
+# ('canceled', 'moved'). One row per (registration, kind), so a reminder
+# is never queued twice; drained by `flask send-reminders`
+# (project.reminders), which claims rows ('Sending', claimed_by) before
+# sending so overlapping runs never send the same one.
+# ----------------------------
+class Reminder(db.Model):
+    __tablename__ = 'reminders'
+    __table_args__ = (
+        db.UniqueConstraint('registration_id', 'kind', name='uq_reminders_reg_kind'),
+        db.Index('ix_reminders_status_id', 'status', 'id'),
+        db.Index('ix_reminders_exam_date', 'exam_date'),
+        db.Index('ix_reminders_claimed_by', 'claimed_by'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    registration_id = db.Column(db.Integer, nullable=False)  # registrations.id
+    kind = db.Column(db.String(8), nullable=False)            # '24h', '1h', 'canceled', 'moved'
+    exam_date = db.Column(db.Date, nullable=False)
+
+    status = db.Column(db.Enum('Queued', 'Sending', 'Sent', 'Failed', 'Skipped'), nullable=False,
+                       default='Queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    sent_at = db.Column(db.DateTime)
+    claimed_by = db.Column(db.String(32))                     # send run holding a 'Sending' row
+    claimed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<Reminder {self.kind} for reg {self.registration_id} ({self.status})>"
+
+
+# ----------------------------
+# Booking rollups (analytics)
+# Per (exam, location, timeslot) counts kept in step with `registrations`
+# (and its archive) by project.analytics, so the capacity dashboard never
+# aggregates raw rows. timeslot_id 0 stands for "no timeslot".
+# ----------------------------
+class BookingRollup(db.Model):
+    __tablename__ = 'booking_rollups'
+    __table_args__ = (
+        db.Index('ix_booking_rollups_date', 'exam_date', 'location_id'),
+    )
+
+    exam_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    location_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    timeslot_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    exam_date = db.Column(db.Date, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False, default=0)  # of the (exam, location) session
+    bookings = db.Column(db.Integer, nullable=False, default=0)  # rows ever placed in this slot
+    cancellations = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def active(self):
+        return self.bookings - self.cancellations
+
+
+# ----------------------------
+# Booking event log (append-only)
+# One row per state change of a registration, written in the same
+# transaction as the change by project.bookings: 'booked', 'canceled',
+# 'moved' (from_* hold the old room/time). Rows are never updated or
+# deleted, so seat counts and rollups can be replayed from them
+# (project.events, `flask booking-events-replay`).
+# ----------------------------
+class BookingEvent(db.Model):
+    __tablename__ = 'booking_events'
+    __table_args__ = (
+        db.Index('ix_booking_events_user', 'user_id', 'id'),
+        db.Index('ix_booking_events_session', 'exam_id', 'location_id', 'id'),
+        db.Index('ix_booking_events_registration', 'registration_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    registration_id = db.Column(db.Integer, nullable=False)  # registrations.id
+    user_id = db.Column(db.Integer, nullable=False)          # the student
+    exam_id = db.Column(db.Integer, nullable=False)
+    location_id = db.Column(db.Integer)
+    timeslot_id = db.Column(db.Integer)
+    from_location_id = db.Column(db.Integer)                 # 'moved' only
+    from_timeslot_id = db.Column(db.Integer)
+    kind = db.Column(db.String(10), nullable=False)          # 'booked', 'canceled', 'moved'
+    actor_id = db.Column(db.Integer)                         # users.id who made the change
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    def __repr__(self):
+        return f"<BookingEvent {self.kind} reg {self.registration_id}>"
+
+
+# ----------------------------
+# Server-side sessions
+# The session cookie carries only `id`; project.sessions keeps the
+# serialized session in `data`. expires_at is epoch seconds, indexed for
+# `flask sessions-cleanup`.
+# ----------------------------
+class WebSession(db.Model):
+    __tablename__ = 'web_sessions'
+    __table_args__ = (
+        db.Index('ix_web_sessions_expires', 'expires_at'),
+    )
+
+    # Ids are case-sensitive; MySQL's default collation is not.
+    id = db.Column(db.String(43).with_variant(
+                       mysql.VARCHAR(43, charset='ascii', collation='ascii_bin'), 'mysql'),
+                   primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires_at = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<WebSession expires {self.expires_at}>"
@@ -0,0 +1,243 @@
+# project/profiling.py
+"""Sampling profiler for individual production requests.
+
+When /student/exams or faculty search gets slow under load, the timing
+record (project.instrumentation) says how long the request took, but not
+where the time went. A profiled request runs with a sampler thread. Every
+PROFILE_INTERVAL_MS (default 5) it records the request thread's Python
+stack. Nothing is traced, so the overhead is the sampling itself, and
+only on the requests chosen. A request is profiled when
+
+* it carries ``X-Profile: <token>``, a token signed with SECRET_KEY.
+  `flask profile-token` prints one, e.g.
+  ``curl -H "X-Profile: $(flask profile-token)" .../student/exams``;
+* an admin turned on "profile my requests" on /admin/profiles (a session
+  flag); or
+* it falls in the random PROFILE_SAMPLE_RATE fraction (default 0, off).
+
+Each profile goes to PROFILE_DIR (default ``<instance>/profiles``) as
+two files, written after the response has been sent:
+
+  <id>.folded  collapsed stacks, "frame;frame;frame count" per line, ready
+               for flamegraph.pl or speedscope
+  <id>.json    method, path, status, total/DB/template time, query count,
+               per-template times, sample count and request id
+
+Only the newest PROFILE_KEEP (default 500) are kept. /admin/profiles
+lists the slowest of them. The response carries ``X-Profile-Id``.
+
+Sampling uses a real OS thread, so it sees sync and threaded workers.
+Under gevent it only runs when the request yields.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request, session
+
+from .instrumentation import current_timings
+
+SESSION_FLAG = "_profile"
+TOKEN_SALT = "request-profile"
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_SITE = "site-packages" + os.sep
+_label_cache = {}
+
+
+# ==========================================================
+#  Sampler
+# ==========================================================
+def _label(code):
+    label = _label_cache.get(code)
+    if label is None:
+        path = code.co_filename
+        if _SITE in path:
+            path = path.split(_SITE, 1)[1]
+        elif path.startswith(_ROOT):
+            path = path[len(_ROOT):]
+        label = _label_cache[code] = f"{code.co_name} ({path}:{code.co_firstlineno})"
+    return label
+
+
+class Sampler:
+    """Collapsed stacks of one thread, sampled every ``interval`` seconds."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+
+# ==========================================================
+#  Opt-in
+# ==========================================================
+def _serializer(app):
+    from itsdangerous import URLSafeTimedSerializer
+
+    return URLSafeTimedSerializer(app.config["SECRET_KEY"], salt=TOKEN_SALT)
+
+
+def make_token(app):
+    return _serializer(app).dumps("profile")
+
+
+def _token_ok(app, token):
+    from itsdangerous import BadSignature
+
+    try:
+        max_age = app.config["PROFILE_TOKEN_MAX_AGE"]
+        return _serializer(app).loads(token, max_age=max_age) == "profile"
+    except BadSignature:
+        return False
+
+
+def _reason(app):
+    token = request.headers.get("X-Profile")
+    if token and _token_ok(app, token):
+        return "header"
+    if session.get(SESSION_FLAG):
+        return "admin"
+    rate = app.config["PROFILE_SAMPLE_RATE"]
+    if rate and random.random() < rate:
+        return "sample"
+    return None
+
+
+# ==========================================================
+#  Storage
+# ==========================================================
+def profile_dir(app):
+    return app.config["PROFILE_DIR"]
+
+
+def _write(directory, name, meta, stacks, keep):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name + ".folded"), "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(os.path.join(directory, name + ".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    _prune(directory, keep)
+
+
+def _prune(directory, keep):
+    names = sorted(n[:-5] for n in os.listdir(directory) if n.endswith(".json"))
+    for name in names[:-keep] if keep else []:
+        for ext in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(directory, name + ext))
+            except FileNotFoundError:
+                pass
+
+
+def recent(app, limit=50, order="total_ms"):
+    """Stored profiles' metadata, slowest (by ``order``) first."""
+    directory = profile_dir(app)
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # being written or pruned
+    profiles.sort(key=lambda p: -p.get(order, 0))
+    return profiles[:limit]
+
+
+def folded_path(app, name):
+    """Path of a stored .folded file, or None for an unknown or unsafe name."""
+    if not name.replace("-", "").replace("_", "").isalnum():
+        return None
+    path = os.path.join(profile_dir(app), name + ".folded")
+    return path if os.path.isfile(path) else None
+
+
+# ==========================================================
+#  Request hooks
+# ==========================================================
+def init_profiling(app):
+    app.config.setdefault("PROFILE_DIR", os.environ.get("PROFILE_DIR")
+                          or os.path.join(app.instance_path, "profiles"))
+    app.config.setdefault("PROFILE_SAMPLE_RATE", float(os.environ.get("PROFILE_SAMPLE_RATE", "0")))
+    app.config.setdefault("PROFILE_INTERVAL_MS", float(os.environ.get("PROFILE_INTERVAL_MS", "5")))
+    app.config.setdefault("PROFILE_KEEP", int(os.environ.get("PROFILE_KEEP", "500")))
+    app.config.setdefault("PROFILE_TOKEN_MAX_AGE",
+                          int(os.environ.get("PROFILE_TOKEN_MAX_AGE", "86400")))
+
+    @app.before_request
+    def _start_profile():
+        if request.endpoint == "static":
+            return
+        reason = _reason(app)
+        if reason:
+            interval = app.config["PROFILE_INTERVAL_MS"] / 1000
+            g.profile = (reason, Sampler(threading.get_ident(), interval).start())
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return response
+        reason, sampler = profile
+        sampler.stop()
+        timings = current_timings()
+        finished = time.time()
+        stamp = (time.strftime("%Y%m%d-%H%M%S", time.gmtime(finished))
+                 + f"{int(finished * 1000) % 1000:03d}")
+        name = f"{stamp}-{os.urandom(4).hex()}"
+        meta = {
+            "id": name,
+            "at": finished,
+            "reason": reason,
+            "method": request.method,
+            "path": request.path,
+            "query": request.query_string.decode(errors="replace")[:200],
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "request_id": g.get("request_id"),
+            "samples": sampler.samples,
+            "interval_ms": app.config["PROFILE_INTERVAL_MS"],
+        }
+        if timings is not None:
+            meta.update(
+                total_ms=round(timings.elapsed * 1000, 1),
+                db_ms=round(timings.db_time * 1000, 1),
+                db_count=timings.db_count,
+                tpl_ms=round(timings.template_time * 1000, 1),
+                templates=[[t, round(s * 1000, 1)] for t, s in timings.templates],
+            )
+        directory, keep = profile_dir(app), app.config["PROFILE_KEEP"]
+        response.call_on_close(lambda: _write(directory, name, meta, sampler.stacks, keep))
+        response.headers["X-Profile-Id"] = name
+        return response
@@ -0,0 +1,174 @@
+# project/pubsub.py
+"""Lightweight publish/subscribe for pushing changes to open pages.
+
+One ``broker`` per worker process fans each message out to every local
+subscriber (an SSE connection's queue, or a plain callback). The backend
+decides how a published message reaches the brokers:
+
+* LocalBackend (default) delivers straight back into this process. It is
+  the stand-in for dev and single-worker deployments. The cache versions
+  (project.cache) are per process and kept in step only by these
+  messages, so with several workers other processes don't hear about a
+  change and their caches serve it only once their TTLs run out (seconds
+  to minutes; bookings are re-checked by the INSERT itself either way).
+  ``warn_if_unshared`` logs this from gunicorn's post_fork.
+* RedisBackend (PUBSUB_URL=redis://...) publishes through Redis so every
+  gunicorn worker on every dyno sees the message. Requires the optional
+  ``redis`` package.
+
+Either way a change costs one publish, no matter how many tabs listen.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class LocalBackend:
+    """Deliver published messages to this process only."""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, channel, message):
+        self._deliver(channel, message)
+
+
+class RedisBackend:
+    """Share messages between processes through Redis PUBLISH/SUBSCRIBE."""
+
+    prefix = "ers:"
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for this backend
+
+        self._client = redis.Redis.from_url(url)
+
+    def start(self, deliver):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + "*")
+
+        def run():
+            for item in pubsub.listen():
+                channel = item["channel"].decode()[len(self.prefix):]
+                try:
+                    deliver(channel, json.loads(item["data"]))
+                except Exception:
+                    log.exception("pubsub: bad message on %s", channel)
+
+        threading.Thread(target=run, name="pubsub-redis", daemon=True).start()
+
+    def publish(self, channel, message):
+        self._client.publish(self.prefix + channel, json.dumps(message))
+
+
+class Subscription:
+    """A bounded queue of messages for one consumer (e.g. one browser tab).
+
+    ``keys`` optionally restricts delivery to messages whose ``key`` is in
+    the set, so a tab only wakes up for the sessions it is showing.
+    """
+
+    def __init__(self, channel, keys=None, maxsize=100):
+        self.channel = channel
+        self.keys = set(keys) if keys else None
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def wants(self, message):
+        return self.keys is None or message.get("key") in self.keys
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            pass  # slow consumer: drop rather than block the publisher
+
+    def get(self, timeout=None):
+        """Next message, or None if nothing arrived within ``timeout``."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker:
+    def __init__(self, backend=None):
+        self._backend = backend or LocalBackend()
+        self._subscriptions = {}  # channel -> set[Subscription]
+        self._listeners = {}  # channel -> [callable]
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def configure(self, backend):
+        self._backend = backend
+        self._started_pid = None
+
+    def _ensure_started(self):
+        # Backend threads don't survive fork, so start lazily per process
+        # (important with gunicorn --preload).
+        pid = os.getpid()
+        if self._started_pid != pid:
+            with self._lock:
+                if self._started_pid != pid:
+                    self._backend.start(self._deliver)
+                    self._started_pid = pid
+
+    def subscribe(self, channel, keys=None, maxsize=100):
+        self._ensure_started()
+        sub = Subscription(channel, keys, maxsize)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions.get(sub.channel, set()).discard(sub)
+
+    def listen(self, channel, callback):
+        """Call ``callback(message)`` for every message on ``channel``."""
+        with self._lock:
+            self._listeners.setdefault(channel, []).append(callback)
+
+    def publish(self, channel, message):
+        self._ensure_started()
+        try:
+            self._backend.publish(channel, message)
+        except Exception:
+            log.exception("pubsub: publish to %s failed", channel)
+
+    def subscriber_count(self, channel):
+        return len(self._subscriptions.get(channel, ()))
+
+    def _deliver(self, channel, message):
+        for callback in self._listeners.get(channel, ()):
+            try:
+                callback(message)
+            except Exception:
+                log.exception("pubsub: listener on %s failed", channel)
+        for sub in list(self._subscriptions.get(channel, ())):
+            if sub.wants(message):
+                sub.put(message)
+
+
+broker = Broker()
+
+
+def init_pubsub(app):
+    url = os.environ.get("PUBSUB_URL", "")
+    if url.startswith(("redis://", "rediss://")):
+        broker.configure(RedisBackend(url))
+    else:
+        broker.configure(LocalBackend())
+
+
+def warn_if_unshared(workers):
+    """Log when ``workers`` processes share no broker (gunicorn post_fork)."""
+    if workers > 1 and isinstance(broker._backend, LocalBackend):
+        log.warning(
+            "pubsub: %d workers without PUBSUB_URL; cache invalidations stay in the "
+            "worker that made the change and the others catch up when their TTLs expire",
+            workers,
+        )
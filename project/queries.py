@@ -0,0 +1,1229 @@
+# project/queries.py
+"""Every SQL statement the app runs, defined once.
+
+Each statement is built at import as a text() construct with typed bind
+parameters and a name. Because the construct object is reused,
+SQLAlchemy's compiled cache hits on every execution: nothing is
+assembled or compiled per request, and bound values are coerced the same
+way wherever the query is used. ``Query.execute`` also records calls and
+time per name (``stats()``), so each query can be measured on its own.
+
+Filters that change the WHERE clause (the faculty print log) get one
+statement per filter combination, built on first use and then cached
+like the rest.
+
+PyMySQL has no server-side prepared statements: it interpolates
+parameters client-side and sends plain COM_QUERY. "Prepared" here
+therefore means compiled once by SQLAlchemy. The call sites would not
+change if the driver were swapped for one with prepared cursors.
+"""
+import re
+import threading
+import time
+
+from sqlalchemy import Date, DateTime, Integer, LargeBinary, String, bindparam, text
+
+from . import db
+
+_registry = {}
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class Query:
+    __slots__ = ("name", "statement")
+
+    def __init__(self, name, sql, *binds):
+        self.name = name
+        self.statement = text(sql).bindparams(*binds)
+        _registry[name] = self
+
+    def execute(self, params=None, /, **kw):
+        """Run with keyword binds, or with a list of dicts for executemany."""
+        started = time.perf_counter()
+        try:
+            return db.session.execute(self.statement, kw if params is None else params)
+        finally:
+            _record(self.name, time.perf_counter() - started)
+
+    def execute_on(self, connection, params=None, /, **kw):
+        """Like execute, on a connection of its own instead of db.session."""
+        started = time.perf_counter()
+        try:
+            return connection.execute(self.statement, kw if params is None else params)
+        finally:
+            _record(self.name, time.perf_counter() - started)
+
+    def first(self, **params):
+        return self.execute(**params).mappings().first()
+
+    def all(self, **params):
+        return self.execute(**params).mappings().all()
+
+    def scalar(self, **params):
+        return self.execute(**params).scalar()
+
+    def __repr__(self):
+        return f"<Query {self.name}>"
+
+
+def _record(name, seconds):
+    with _stats_lock:
+        entry = _stats.get(name)
+        if entry is None:
+            entry = _stats[name] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+
+def stats():
+    """{name: {calls, total_ms, avg_ms, max_ms}} for this process, busiest first."""
+    with _stats_lock:
+        snapshot = {name: tuple(v) for name, v in _stats.items()}
+    out = {}
+    for name, (calls, total, worst) in sorted(snapshot.items(), key=lambda kv: -kv[1][1]):
+        out[name] = {
+            "calls": calls,
+            "total_ms": round(total * 1000, 2),
+            "avg_ms": round(total * 1000 / calls, 3),
+            "max_ms": round(worst * 1000, 2),
+        }
+    return out
+
+
+def registered():
+    """Every statically defined query, by name."""
+    return dict(_registry)
+
+
+# ----------------------------------------------------------
+# Reference data (project.refdata, loaded once per worker)
+# ----------------------------------------------------------
+REF_ROLES = Query("ref_roles", "SELECT id, name FROM roles")
+REF_DEPARTMENTS = Query("ref_departments", "SELECT id, name FROM departments ORDER BY name")
+REF_MAJORS = Query("ref_majors", "SELECT id, name, department_id FROM majors ORDER BY name")
+REF_LOCATIONS = Query("ref_locations",
+                      "SELECT id, name, room_number, max_seats FROM locations ORDER BY name")
+REF_BUILDINGS = Query("ref_buildings",
+                      "SELECT id, name, location_id FROM buildings ORDER BY name, id")
+
+
+# ----------------------------------------------------------
+# Exam catalog (project.loaders)
+# ----------------------------------------------------------
+# Every exam session with its seat count and the labels the review and
+# confirm steps show; location labels come from project.refdata.
+EXAM_CATALOG = Query("exam_catalog", """
+    SELECT
+        e.id AS exam_id,
+        e.exam_type,
+        e.exam_date,
+        c.course_code,
+        u.name AS professor_name,
+        el.location_id,
+        el.capacity,
+        (
+            SELECT COUNT(*)
+            FROM registrations r
+            WHERE r.exam_id = e.id
+            AND r.location_id = el.location_id
+            AND r.status = 'Active'
+        ) AS used_seats
+    FROM exam_locations el
+    JOIN exams e ON el.exam_id = e.id
+    JOIN courses c ON c.id = e.course_id
+    JOIN professors p ON e.professor_id = p.id
+    JOIN users u ON p.user_id = u.id
+    ORDER BY e.exam_date ASC
+""")
+
+SESSION_SEATS = Query("session_seats", """
+    SELECT
+        el.exam_id,
+        el.location_id,
+        el.capacity - (
+            SELECT COUNT(*)
+            FROM registrations r
+            WHERE r.exam_id = el.exam_id
+              AND r.location_id = el.location_id
+              AND r.status = 'Active'
+        ) AS remaining
+    FROM exam_locations el
+    WHERE (el.exam_id, el.location_id) IN :sessions
+""", bindparam("sessions", expanding=True))
+
+
+# ----------------------------------------------------------
+# Registrations
+# ----------------------------------------------------------
+REGISTRATION = Query("registration", """
+    SELECT id, user_id, status, exam_id, location_id, timeslot_id
+    FROM registrations
+    WHERE id = :rid
+""", bindparam("rid", type_=Integer))
+
+STUDENT_SCHEDULE = Query("student_schedule", """
+    SELECT
+        r.id AS reg_id,
+        r.registration_id AS confirmation_code,
+        r.status,
+        r.exam_id,
+        r.location_id,
+        r.timeslot_id,
+        e.exam_type,
+        e.exam_date,
+        ts.start_time AS exam_time,
+        c.course_code,
+        u.name AS professor_name
+    FROM registrations r
+    JOIN exams e ON e.id = r.exam_id
+    LEFT JOIN timeslots ts ON ts.id = r.timeslot_id
+    LEFT JOIN courses c ON c.id = e.course_id
+    LEFT JOIN professors p ON p.id = e.professor_id
+    LEFT JOIN users u ON u.id = p.user_id
+    WHERE r.user_id = :uid
+    ORDER BY e.exam_date DESC
+""", bindparam("uid", type_=Integer))
+
+MAX_REGISTRATION_CODE = Query("max_registration_code", """
+    SELECT MAX(CAST(SUBSTRING(registration_id, 4) AS UNSIGNED)) AS max_num
+    FROM registrations
+    WHERE registration_id LIKE 'CSN%%'
+""")
+
+# Inserts nothing (rowcount 0) when the student is at :max_active, already
+# holds a registration for the exam (a canceled one too: rows are unique
+# per exam_id, user_id), or has one at the same timeslot on the exam's
+# day. The checks read registrations inside the inserting statement, so
+# under InnoDB's default REPEATABLE READ they take shared locks on the
+# student's rows and a concurrent booking by the same student waits (or
+# deadlocks and is rolled back) instead of slipping past them.
+INSERT_REGISTRATION = Query("insert_registration", """
+    INSERT INTO registrations
+        (registration_id, user_id, exam_id, timeslot_id, location_id, registration_date, status)
+    SELECT :rid, :u, :e, :t, :l, NOW(), 'Active'
+    FROM exams x
+    WHERE x.id = :e
+      AND (SELECT COUNT(*) FROM registrations r
+           WHERE r.user_id = :u AND r.status = 'Active') < :max_active
+      AND NOT EXISTS (SELECT 1 FROM registrations r
+                      WHERE r.user_id = :u AND r.exam_id = :e)
+      AND NOT EXISTS (SELECT 1 FROM registrations r JOIN exams o ON o.id = r.exam_id
+                      WHERE r.user_id = :u AND r.status = 'Active'
+                        AND r.timeslot_id = :t AND o.exam_date = x.exam_date)
+""", bindparam("rid", type_=String), bindparam("u", type_=Integer), bindparam("e", type_=Integer),
+    bindparam("t", type_=Integer), bindparam("l", type_=Integer),
+    bindparam("max_active", type_=Integer))
+
+# Which INSERT_REGISTRATION rule refused a booking (read on refusal only).
+BOOKING_RULES = Query("booking_rules", """
+    SELECT
+        (SELECT COUNT(*) FROM registrations r
+         WHERE r.user_id = :u AND r.status = 'Active') AS active,
+        (SELECT COUNT(*) FROM registrations r
+         WHERE r.user_id = :u AND r.status = 'Active' AND r.exam_id = :e) AS same_exam,
+        (SELECT COUNT(*) FROM registrations r
+         WHERE r.user_id = :u AND r.exam_id = :e) AS any_exam,
+        (SELECT COUNT(*) FROM registrations r
+         JOIN exams o ON o.id = r.exam_id
+         JOIN exams x ON x.id = :e AND x.exam_date = o.exam_date
+         WHERE r.user_id = :u AND r.status = 'Active' AND r.timeslot_id = :t) AS same_slot
+""", bindparam("u", type_=Integer), bindparam("e", type_=Integer), bindparam("t", type_=Integer))
+
+# The status guard makes rowcount 0 for a row that is already canceled
+# (MySQL counts matched rows), so a second cancel records nothing.
+CANCEL_REGISTRATION = Query("cancel_registration", """
+    UPDATE registrations
+    SET status = 'Canceled'
+    WHERE id = :rid
+      AND status = 'Active'
+""", bindparam("rid", type_=Integer))
+
+# Reschedule: only ever cancel the student's own row.
+CANCEL_OWN_REGISTRATION = Query("cancel_own_registration", """
+    UPDATE registrations
+    SET status = 'Canceled'
+    WHERE id = :old
+      AND user_id = :u
+      AND status = 'Active'
+""", bindparam("old", type_=Integer), bindparam("u", type_=Integer))
+
+# Reschedule within the same exam: registrations are unique per (exam_id,
+# user_id), so the row itself moves instead of being canceled and
+# re-inserted. The clash check reads registrations through an aggregated
+# derived table, which MySQL materializes (it refuses a plain subquery on
+# the table being updated).
+MOVE_OWN_REGISTRATION = Query("move_own_registration", """
+    UPDATE registrations
+    SET location_id = :l, timeslot_id = :t
+    WHERE id = :old
+      AND user_id = :u
+      AND exam_id = :e
+      AND status = 'Active'
+      AND (SELECT busy.n FROM (
+              SELECT COUNT(*) AS n
+              FROM registrations r
+              JOIN exams o ON o.id = r.exam_id
+              JOIN exams x ON x.id = :e AND x.exam_date = o.exam_date
+              WHERE r.user_id = :u AND r.status = 'Active'
+                AND r.timeslot_id = :t AND r.id <> :old
+          ) busy) = 0
+""", bindparam("old", type_=Integer), bindparam("u", type_=Integer), bindparam("e", type_=Integer),
+    bindparam("l", type_=Integer), bindparam("t", type_=Integer))
+
+
+# Bulk faculty actions on one (exam, location) session (project.bookings).
+SESSION_REGISTRATIONS = Query("session_registrations", """
+    SELECT r.id, r.user_id, r.timeslot_id, e.exam_date
+    FROM registrations r
+    JOIN exams e ON e.id = r.exam_id
+    WHERE r.exam_id = :e
+      AND r.location_id = :l
+      AND r.status = 'Active'
+""", bindparam("e", type_=Integer), bindparam("l", type_=Integer))
+
+SESSION_TIMESLOT_COUNTS = Query("session_timeslot_counts", """
+    SELECT timeslot_id, COUNT(*) AS booked
+    FROM registrations
+    WHERE exam_id = :e
+      AND location_id = :l
+      AND status = 'Active'
+    GROUP BY timeslot_id
+""", bindparam("e", type_=Integer), bindparam("l", type_=Integer))
+
+# The students' other Active bookings on a day, for the move conflict
+# check (ix_reg_user_status_exam).
+OTHER_BOOKINGS_ON_DAY = Query("other_bookings_on_day", """
+    SELECT r.id AS reg_id, r.user_id, r.timeslot_id, r.status, e.exam_date
+    FROM registrations r
+    JOIN exams e ON e.id = r.exam_id
+    WHERE r.user_id IN :users
+      AND r.status = 'Active'
+      AND r.exam_id <> :e
+      AND e.exam_date = :day
+""", bindparam("users", expanding=True), bindparam("e", type_=Integer),
+    bindparam("day", type_=Date))
+
+# Run once per timeslot of the rows read by SESSION_REGISTRATIONS. Rows
+# canceled or moved since that read no longer match, so the caller can
+# tell from rowcount whether its deltas still describe what changed.
+CANCEL_REGISTRATIONS = Query("cancel_registrations", """
+    UPDATE registrations
+    SET status = 'Canceled'
+    WHERE id IN :ids
+      AND status = 'Active'
+      AND location_id = :from_l
+      AND COALESCE(timeslot_id, 0) = :from_t
+""", bindparam("ids", expanding=True), bindparam("from_l", type_=Integer),
+    bindparam("from_t", type_=Integer))
+
+MOVE_REGISTRATIONS = Query("move_registrations", """
+    UPDATE registrations
+    SET location_id = :l, timeslot_id = :t
+    WHERE id IN :ids
+      AND status = 'Active'
+      AND location_id = :from_l
+      AND COALESCE(timeslot_id, 0) = :from_t
+""", bindparam("ids", expanding=True), bindparam("l", type_=Integer), bindparam("t", type_=Integer),
+    bindparam("from_l", type_=Integer), bindparam("from_t", type_=Integer))
+
+# ----------------------------------------------------------
+# Faculty
+# ----------------------------------------------------------
+_PRINT_LOG_FILTERS = {
+    "start": "e.exam_date >= :start",
+    "end": "e.exam_date <= :end",
+    "exam_q": "e.exam_type LIKE :exam_q",
+    "status": "r.status = :status",
+}
+_PRINT_LOG_BINDS = {
+    "start": bindparam("start", type_=Date),
+    "end": bindparam("end", type_=Date),
+    "exam_q": bindparam("exam_q", type_=String),
+    "status": bindparam("status", type_=String),
+}
+_print_log_variants = {}
+
+
+def print_log_query(filters):
+    """The print-log statement for this set of filter names (see _PRINT_LOG_FILTERS)."""
+    key = tuple(f for f in _PRINT_LOG_FILTERS if f in filters)
+    query = _print_log_variants.get(key)
+    if query is None:
+        where_sql = ""
+        if key:
+            where_sql = "WHERE " + " AND ".join(_PRINT_LOG_FILTERS[f] for f in key)
+        query = _print_log_variants[key] = Query(f"print_log[{','.join(key)}]", f"""
+            SELECT
+                e.exam_type       AS exam_name,
+                e.exam_date,
+                ts.start_time     AS exam_time,
+                r.location_id,
+                u.name            AS student_name,
+                r.registration_id AS confirmation_code,
+                r.status
+            FROM registrations r
+            JOIN exams e      ON e.id = r.exam_id
+            JOIN users u      ON u.id = r.user_id
+            JOIN timeslots ts ON ts.id = r.timeslot_id
+            {where_sql}
+            ORDER BY e.exam_date, ts.start_time, r.location_id, student_name
+        """, *(_PRINT_LOG_BINDS[f] for f in key))
+    return query
+
+
+ARCHIVE_COLUMNS = (
+    "id, registration_id, exam_id, user_id, timeslot_id, location_id, "
+    "registration_date, status"
+)
+
+_SEARCH_SQL = """
+    SELECT
+        r.id                AS reg_id,
+        r.registration_id   AS confirmation_code,
+        r.status,
+
+        u.name              AS student_name,
+        c.course_code       AS course_code,
+
+        e.exam_type,
+        e.exam_date,
+
+        ts.start_time       AS exam_time,
+
+        profuser.name       AS professor_name,
+
+        r.location_id,
+        {archived} AS archived
+    FROM {source} r
+    JOIN users u        ON u.id = r.user_id
+    JOIN exams e        ON e.id = r.exam_id
+    JOIN courses c      ON c.id = e.course_id
+
+    JOIN professors p   ON p.id = e.professor_id
+    JOIN users profuser ON profuser.id = p.user_id
+
+    JOIN timeslots ts   ON ts.id = r.timeslot_id
+
+    WHERE u.name LIKE :term
+       OR e.exam_type LIKE :term
+       OR r.registration_id LIKE :term
+       OR c.course_code LIKE :term
+       OR profuser.name LIKE :term
+
+    ORDER BY e.exam_date, ts.start_time
+"""
+
+SEARCH_APPOINTMENTS = Query(
+    "search_appointments",
+    _SEARCH_SQL.format(archived="0", source="registrations"),
+    bindparam("term", type_=String),
+)
+
+# Same search over live + archived rows (faculty opt in to past terms).
+SEARCH_APPOINTMENTS_WITH_HISTORY = Query(
+    "search_appointments_with_history",
+    _SEARCH_SQL.format(archived="r.archived", source=f"""(
+        SELECT {ARCHIVE_COLUMNS}, 0 AS archived FROM registrations
+        UNION ALL
+        SELECT {ARCHIVE_COLUMNS}, 1 AS archived FROM registrations_archive
+    )"""),
+    bindparam("term", type_=String),
+)
+
+
+# ----------------------------------------------------------
+# Exam-day check-in (project.checkin)
+# ----------------------------------------------------------
+# Active registrations for one room on one day: exams by date
+# (ix_exams_date_id), then registrations per exam (ix_reg_exam_loc_status).
+ROOM_ROSTER = Query("room_roster", """
+    SELECT
+        r.id              AS reg_id,
+        r.registration_id AS confirmation_code,
+        u.name            AS student_name,
+        u.nshe_id,
+        e.exam_type,
+        ts.start_time     AS exam_time
+    FROM exams e
+    JOIN registrations r   ON r.exam_id = e.id
+                          AND r.location_id = :loc
+                          AND r.status = 'Active'
+    JOIN users u           ON u.id = r.user_id
+    LEFT JOIN timeslots ts ON ts.id = r.timeslot_id
+    WHERE e.exam_date = :day
+    ORDER BY ts.start_time, u.name
+""", bindparam("loc", type_=Integer), bindparam("day", type_=Date))
+
+ROOM_CHECKINS = Query("room_checkins", """
+    SELECT registration_id
+    FROM checkins
+    WHERE location_id = :loc
+      AND exam_date = :day
+""", bindparam("loc", type_=Integer), bindparam("day", type_=Date))
+
+# Run with a list of parameter sets; PyMySQL folds it into one multi-row INSERT.
+INSERT_CHECKINS = Query("insert_checkins", """
+    INSERT INTO checkins
+        (registration_id, location_id, exam_date, checked_in_at, checked_in_by)
+    VALUES
+        (:rid, :loc, :day, :at, :by)
+""", bindparam("rid", type_=Integer), bindparam("loc", type_=Integer), bindparam("day", type_=Date),
+    bindparam("at", type_=DateTime), bindparam("by", type_=Integer))
+
+
+# ----------------------------------------------------------
+# Exam reminders (project.reminders)
+# ----------------------------------------------------------
+# Active registrations for exams in [first, last]; the exact start time is
+# compared in Python. Exams by date (ix_exams_date_id), then
+# registrations per exam (ix_reg_exam_status).
+REMINDER_CANDIDATES = Query("reminder_candidates", """
+    SELECT
+        r.id AS reg_id,
+        e.exam_date,
+        COALESCE(ts.start_time, e.exam_time) AS start_time
+    FROM exams e
+    JOIN registrations r   ON r.exam_id = e.id
+                          AND r.status = 'Active'
+    LEFT JOIN timeslots ts ON ts.id = r.timeslot_id
+    WHERE e.exam_date BETWEEN :first AND :last
+""", bindparam("first", type_=Date), bindparam("last", type_=Date))
+
+QUEUED_REMINDER_KEYS = Query("queued_reminder_keys", """
+    SELECT registration_id, kind
+    FROM reminders
+    WHERE exam_date >= :first
+""", bindparam("first", type_=Date))
+
+# Run with a list of parameter sets (one multi-row INSERT on PyMySQL).
+INSERT_REMINDERS = Query("insert_reminders", """
+    INSERT INTO reminders (registration_id, kind, exam_date, status, attempts, created_at)
+    VALUES (:rid, :kind, :day, 'Queued', 0, NOW())
+""", bindparam("rid", type_=Integer), bindparam("kind", type_=String), bindparam("day", type_=Date))
+
+# Moved registrations: forget earlier reminders and notices so the 24h/1h
+# reminders are queued again for the new time.
+RESET_REMINDERS = Query("reset_reminders", """
+    DELETE FROM reminders
+    WHERE registration_id IN :ids
+      AND kind <> 'canceled'
+""", bindparam("ids", expanding=True))
+
+# Drop reminders whose exam has already happened (or was archived).
+EXPIRE_REMINDERS = Query("expire_reminders", """
+    UPDATE reminders
+    SET status = 'Skipped'
+    WHERE status = 'Queued'
+      AND exam_date < :today
+""", bindparam("today", type_=Date))
+
+# Claim the next page of the queue for one send run. The page is picked
+# in a derived table (MySQL allows neither LIMIT in an IN subquery nor
+# reading the updated table directly). The outer status check is what
+# makes the claim exclusive: InnoDB re-reads each row's latest committed
+# version under its row lock, so a row another run claimed first no
+# longer matches and is left alone.
+CLAIM_REMINDERS = Query("claim_reminders", """
+    UPDATE reminders
+    SET status = 'Sending', claimed_by = :run, claimed_at = NOW()
+    WHERE status = 'Queued'
+      AND id IN (
+          SELECT id FROM (
+              SELECT id FROM reminders
+              WHERE status = 'Queued'
+                AND id > :after
+              ORDER BY id
+              LIMIT :batch_size
+          ) AS page
+      )
+""", bindparam("run", type_=String), bindparam("after", type_=Integer),
+    bindparam("batch_size", type_=Integer))
+
+# The rows this run claimed, with everything the email needs (ix_reminders_claimed_by).
+CLAIMED_REMINDERS = Query("claimed_reminders", """
+    SELECT
+        rm.id,
+        rm.kind,
+        r.status          AS reg_status,
+        r.registration_id AS confirmation_code,
+        r.location_id,
+        u.name            AS student_name,
+        u.email           AS student_email,
+        e.exam_type,
+        e.exam_date,
+        COALESCE(ts.start_time, e.exam_time) AS exam_time
+    FROM reminders rm
+    JOIN registrations r   ON r.id = rm.registration_id
+    JOIN users u           ON u.id = r.user_id
+    JOIN exams e           ON e.id = r.exam_id
+    LEFT JOIN timeslots ts ON ts.id = r.timeslot_id
+    WHERE rm.claimed_by = :run
+      AND rm.status = 'Sending'
+    ORDER BY rm.id
+""", bindparam("run", type_=String))
+
+# Put a run's unfinished claims back in the queue (the send raised).
+RELEASE_REMINDERS = Query("release_reminders", """
+    UPDATE reminders
+    SET status = 'Queued', claimed_by = NULL
+    WHERE claimed_by = :run
+      AND status = 'Sending'
+""", bindparam("run", type_=String))
+
+# Claims older than :cutoff belong to a run that died; requeue them.
+RELEASE_STALE_REMINDERS = Query("release_stale_reminders", """
+    UPDATE reminders
+    SET status = 'Queued', claimed_by = NULL
+    WHERE status = 'Sending'
+      AND claimed_at < :cutoff
+""", bindparam("cutoff", type_=DateTime))
+
+MARK_REMINDERS_SENT = Query("mark_reminders_sent", """
+    UPDATE reminders
+    SET status = 'Sent', attempts = attempts + 1, sent_at = NOW()
+    WHERE id IN :ids
+""", bindparam("ids", expanding=True))
+
+MARK_REMINDERS_SKIPPED = Query("mark_reminders_skipped", """
+    UPDATE reminders
+    SET status = 'Skipped'
+    WHERE id IN :ids
+""", bindparam("ids", expanding=True))
+
+# Failed sends stay queued for the next run until max_attempts. status is
+# assigned first: MySQL evaluates SET left to right with updated values.
+MARK_REMINDERS_FAILED = Query("mark_reminders_failed", """
+    UPDATE reminders
+    SET status = CASE WHEN attempts + 1 >= :max_attempts THEN 'Failed' ELSE 'Queued' END,
+        attempts = attempts + 1
+    WHERE id IN :ids
+""", bindparam("ids", expanding=True), bindparam("max_attempts", type_=Integer))
+
+
+# ----------------------------------------------------------
+# Booking event log (project.events)
+# ----------------------------------------------------------
+INSERT_BOOKING_EVENTS = Query("insert_booking_events", """
+    INSERT INTO booking_events
+        (registration_id, user_id, exam_id, location_id, timeslot_id,
+         from_location_id, from_timeslot_id, kind, actor_id, created_at)
+    VALUES
+        (:rid, :u, :e, :l, :t, :fl, :ft, :kind, :actor, NOW())
+""", bindparam("rid", type_=Integer), bindparam("u", type_=Integer), bindparam("e", type_=Integer),
+    bindparam("l", type_=Integer), bindparam("t", type_=Integer), bindparam("fl", type_=Integer),
+    bindparam("ft", type_=Integer), bindparam("kind", type_=String),
+    bindparam("actor", type_=Integer))
+
+_EVENT_COLUMNS = """
+        be.id, be.registration_id, be.user_id, be.exam_id, be.location_id, be.timeslot_id,
+        be.from_location_id, be.from_timeslot_id, be.kind, be.actor_id, be.created_at
+"""
+
+# Newest first, keyset-paged on id (:before = last id of the previous page).
+STUDENT_EVENTS = Query("student_events", f"""
+    SELECT {_EVENT_COLUMNS}
+    FROM booking_events be
+    WHERE be.user_id = :u
+      AND be.id < :before
+    ORDER BY be.id DESC
+    LIMIT :limit
+""", bindparam("u", type_=Integer), bindparam("before", type_=Integer),
+    bindparam("limit", type_=Integer))
+
+SESSION_EVENTS = Query("session_events", f"""
+    SELECT {_EVENT_COLUMNS}
+    FROM booking_events be
+    WHERE be.exam_id = :e
+      AND (be.location_id = :l OR be.from_location_id = :l)
+      AND be.id < :before
+    ORDER BY be.id DESC
+    LIMIT :limit
+""", bindparam("e", type_=Integer), bindparam("l", type_=Integer),
+    bindparam("before", type_=Integer),
+    bindparam("limit", type_=Integer))
+
+# Replay reads the whole log in id order, one page at a time.
+BOOKING_EVENTS_PAGE = Query("booking_events_page", """
+    SELECT id, registration_id, exam_id, location_id, timeslot_id,
+           from_location_id, from_timeslot_id, kind
+    FROM booking_events
+    WHERE id > :after
+    ORDER BY id
+    LIMIT :batch_size
+""", bindparam("after", type_=Integer), bindparam("batch_size", type_=Integer))
+
+# Current state of every registration, live and archived, to check a replay.
+REGISTRATION_STATES = Query("registration_states", f"""
+    SELECT id, exam_id, location_id, timeslot_id, status
+    FROM (
+        SELECT {ARCHIVE_COLUMNS} FROM registrations
+        UNION ALL
+        SELECT {ARCHIVE_COLUMNS} FROM registrations_archive
+    ) r
+    WHERE r.location_id IS NOT NULL
+""")
+
+# Registrations made before the log existed get a 'booked' event dated
+# at registration time, then a 'canceled' one if they are canceled now.
+# One that was moved after the log started is booked where its first
+# move took it from.
+_FIRST_MOVE = """
+    SELECT be.{column} FROM booking_events be
+    WHERE be.registration_id = r.id AND be.kind = 'moved'
+    ORDER BY be.id LIMIT 1
+"""
+
+BACKFILL_BOOKED_EVENTS = Query("backfill_booked_events", f"""
+    INSERT INTO booking_events
+        (registration_id, user_id, exam_id, location_id, timeslot_id, kind, created_at)
+    SELECT
+        r.id, r.user_id, r.exam_id,
+        CASE WHEN EXISTS ({_FIRST_MOVE.format(column="id")})
+             THEN ({_FIRST_MOVE.format(column="from_location_id")}) ELSE r.location_id END,
+        CASE WHEN EXISTS ({_FIRST_MOVE.format(column="id")})
+             THEN ({_FIRST_MOVE.format(column="from_timeslot_id")}) ELSE r.timeslot_id END,
+        'booked', r.registration_date
+    FROM (
+        SELECT {ARCHIVE_COLUMNS} FROM registrations
+        UNION ALL
+        SELECT {ARCHIVE_COLUMNS} FROM registrations_archive
+    ) r
+    WHERE r.location_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM booking_events be
+                      WHERE be.registration_id = r.id AND be.kind = 'booked')
+    ORDER BY r.id
+""")
+
+BACKFILL_CANCELED_EVENTS = Query("backfill_canceled_events", f"""
+    INSERT INTO booking_events
+        (registration_id, user_id, exam_id, location_id, timeslot_id, kind, created_at)
+    SELECT r.id, r.user_id, r.exam_id, r.location_id, r.timeslot_id, 'canceled', r.registration_date
+    FROM (
+        SELECT {ARCHIVE_COLUMNS} FROM registrations
+        UNION ALL
+        SELECT {ARCHIVE_COLUMNS} FROM registrations_archive
+    ) r
+    WHERE r.location_id IS NOT NULL
+      AND r.status = 'Canceled'
+      AND NOT EXISTS (SELECT 1 FROM booking_events be
+                      WHERE be.registration_id = r.id AND be.kind = 'canceled')
+    ORDER BY r.id
+""")
+
+
+# ----------------------------------------------------------
+# Booking rollups (project.analytics)
+# ----------------------------------------------------------
+ROLLUP_BUMP = Query("rollup_bump", """
+    UPDATE booking_rollups
+    SET bookings = bookings + :b,
+        cancellations = cancellations + :c
+    WHERE exam_id = :e
+      AND location_id = :l
+      AND timeslot_id = :t
+""", bindparam("b", type_=Integer), bindparam("c", type_=Integer), bindparam("e", type_=Integer),
+    bindparam("l", type_=Integer), bindparam("t", type_=Integer))
+
+# First event for a slot: create its row with the session's date and capacity.
+ROLLUP_INSERT = Query("rollup_insert", """
+    INSERT INTO booking_rollups
+        (exam_id, location_id, timeslot_id, exam_date, capacity, bookings, cancellations)
+    SELECT e.id, :l, :t, e.exam_date, COALESCE(el.capacity, 0), :b, :c
+    FROM exams e
+    LEFT JOIN exam_locations el ON el.exam_id = e.id AND el.location_id = :l
+    WHERE e.id = :e
+""", bindparam("b", type_=Integer), bindparam("c", type_=Integer), bindparam("e", type_=Integer),
+    bindparam("l", type_=Integer), bindparam("t", type_=Integer))
+
+ROLLUPS_IN_RANGE = Query("rollups_in_range", """
+    SELECT exam_id, location_id, timeslot_id, exam_date, capacity, bookings, cancellations
+    FROM booking_rollups
+    WHERE exam_date BETWEEN :start AND :end
+""", bindparam("start", type_=Date), bindparam("end", type_=Date))
+
+ROLLUPS_ALL = Query("rollups_all", """
+    SELECT exam_id, location_id, timeslot_id, exam_date, capacity, bookings, cancellations
+    FROM booking_rollups
+""")
+
+# Rollups recomputed from raw rows; live and archived registrations both
+# count, so the archive job never changes them.
+_RAW_ROLLUPS_SQL = f"""
+    SELECT
+        r.exam_id,
+        r.location_id,
+        COALESCE(r.timeslot_id, 0) AS timeslot_id,
+        e.exam_date,
+        COALESCE(el.capacity, 0) AS capacity,
+        COUNT(*) AS bookings,
+        SUM(CASE WHEN r.status = 'Canceled' THEN 1 ELSE 0 END) AS cancellations
+    FROM (
+        SELECT {ARCHIVE_COLUMNS} FROM registrations
+        UNION ALL
+        SELECT {ARCHIVE_COLUMNS} FROM registrations_archive
+    ) r
+    JOIN exams e ON e.id = r.exam_id
+    LEFT JOIN exam_locations el ON el.exam_id = r.exam_id AND el.location_id = r.location_id
+    WHERE r.location_id IS NOT NULL
+    GROUP BY r.exam_id, r.location_id, COALESCE(r.timeslot_id, 0), e.exam_date, el.capacity
+"""
+
+RAW_ROLLUPS = Query("raw_rollups", _RAW_ROLLUPS_SQL)
+
+DELETE_ROLLUPS = Query("delete_rollups", "DELETE FROM booking_rollups")
+
+ZERO_ROLLUPS = Query("zero_rollups", "UPDATE booking_rollups SET bookings = 0, cancellations = 0")
+
+# Every (session, timeslot) nobody has booked yet gets a zero row, so empty
+# sessions count toward utilization and bookings only ever need the UPDATE.
+REBUILD_ROLLUPS = Query("rebuild_rollups", f"""
+    INSERT INTO booking_rollups
+        (exam_id, location_id, timeslot_id, exam_date, capacity, bookings, cancellations)
+    {_RAW_ROLLUPS_SQL}
+    UNION ALL
+    SELECT el.exam_id, el.location_id, ts.id, e.exam_date, el.capacity, 0, 0
+    FROM exam_locations el
+    JOIN exams e ON e.id = el.exam_id
+    CROSS JOIN timeslots ts
+    WHERE NOT EXISTS (SELECT 1 FROM registrations r
+                      WHERE r.exam_id = el.exam_id AND r.location_id = el.location_id
+                        AND r.timeslot_id = ts.id)
+      AND NOT EXISTS (SELECT 1 FROM registrations_archive ra
+                      WHERE ra.exam_id = el.exam_id AND ra.location_id = el.location_id
+                        AND ra.timeslot_id = ts.id)
+""")
+
+
+# ----------------------------------------------------------
+# Demand forecast (project.forecast)
+# ----------------------------------------------------------
+# Every session of exams dated [since, before), booked or not.
+FORECAST_HISTORY_SESSIONS = Query("forecast_history_sessions", """
+    SELECT el.exam_id, el.location_id, e.course_id, e.exam_date, el.capacity
+    FROM exam_locations el
+    JOIN exams e ON e.id = el.exam_id
+    WHERE e.exam_date >= :since
+      AND e.exam_date < :before
+    ORDER BY el.exam_id, el.location_id
+""", bindparam("since", type_=Date), bindparam("before", type_=Date))
+
+# Booking curves: bookings per session per day, live and archived rows
+# alike. Canceled registrations are left out (we don't keep when they
+# were canceled), so the curves describe seats that were actually used.
+FORECAST_HISTORY_BOOKINGS = Query("forecast_history_bookings", f"""
+    SELECT r.exam_id, r.location_id, DATE(r.registration_date) AS booked_on, COUNT(*) AS n
+    FROM (
+        SELECT {ARCHIVE_COLUMNS} FROM registrations
+        UNION ALL
+        SELECT {ARCHIVE_COLUMNS} FROM registrations_archive
+    ) r
+    JOIN exams e ON e.id = r.exam_id
+    WHERE r.status <> 'Canceled'
+      AND r.location_id IS NOT NULL
+      AND r.registration_date IS NOT NULL
+      AND e.exam_date >= :since
+      AND e.exam_date < :before
+    GROUP BY r.exam_id, r.location_id, DATE(r.registration_date)
+""", bindparam("since", type_=Date), bindparam("before", type_=Date))
+
+FORECAST_UPCOMING_SESSIONS = Query("forecast_upcoming_sessions", """
+    SELECT
+        el.exam_id,
+        el.location_id,
+        e.course_id,
+        e.exam_date,
+        el.capacity,
+        (
+            SELECT COUNT(*)
+            FROM registrations r
+            WHERE r.exam_id = el.exam_id
+              AND r.location_id = el.location_id
+              AND r.status = 'Active'
+        ) AS booked
+    FROM exam_locations el
+    JOIN exams e ON e.id = el.exam_id
+    WHERE e.exam_date >= :first
+    ORDER BY el.exam_id, el.location_id
+""", bindparam("first", type_=Date))
+
+SET_SESSION_CAPACITY = Query("set_session_capacity", """
+    UPDATE exam_locations
+    SET capacity = :capacity
+    WHERE exam_id = :e
+      AND location_id = :l
+""", bindparam("capacity", type_=Integer), bindparam("e", type_=Integer),
+    bindparam("l", type_=Integer))
+
+SET_ROLLUP_CAPACITY = Query("set_rollup_capacity", """
+    UPDATE booking_rollups
+    SET capacity = :capacity
+    WHERE exam_id = :e
+      AND location_id = :l
+""", bindparam("capacity", type_=Integer), bindparam("e", type_=Integer),
+    bindparam("l", type_=Integer))
+
+
+# ----------------------------------------------------------
+# Room timetabling (project.timetable)
+# ----------------------------------------------------------
+TIMETABLE_SLOTS = Query("timetable_slots", "SELECT id, start_time FROM timeslots ORDER BY id")
+
+# Registrations of any status pin an exam: its sessions and rollups must stay.
+TIMETABLE_EXAMS = Query("timetable_exams", """
+    SELECT
+        e.id,
+        e.exam_date,
+        e.capacity,
+        e.professor_id,
+        e.location_id,
+        e.timeslot_id,
+        (SELECT COUNT(*) FROM registrations r WHERE r.exam_id = e.id) AS registrations
+    FROM exams e
+    WHERE e.exam_date BETWEEN :start AND :end
+    ORDER BY e.exam_date, e.id
+""", bindparam("start", type_=Date), bindparam("end", type_=Date))
+
+PROVISION_EXAMS = Query("provision_exams", """
+    UPDATE exams
+    SET location_id = :l,
+        building_id = COALESCE(:b, building_id),
+        timeslot_id = :t,
+        exam_time = :start
+    WHERE id = :e
+""", bindparam("e", type_=Integer), bindparam("l", type_=Integer), bindparam("b", type_=Integer),
+    bindparam("t", type_=Integer))
+
+DELETE_EXAM_SESSIONS = Query("delete_exam_sessions", """
+    DELETE FROM exam_locations
+    WHERE exam_id IN :ids
+""", bindparam("ids", expanding=True))
+
+INSERT_EXAM_SESSIONS = Query("insert_exam_sessions", """
+    INSERT INTO exam_locations (exam_id, location_id, capacity)
+    VALUES (:e, :l, :capacity)
+""", bindparam("e", type_=Integer), bindparam("l", type_=Integer),
+    bindparam("capacity", type_=Integer))
+
+DELETE_EXAM_ROLLUPS = Query("delete_exam_rollups", """
+    DELETE FROM booking_rollups
+    WHERE exam_id IN :ids
+""", bindparam("ids", expanding=True))
+
+# Zero rows for the new sessions, as rebuild_rollups would create them.
+INSERT_EXAM_ROLLUPS = Query("insert_exam_rollups", """
+    INSERT INTO booking_rollups
+        (exam_id, location_id, timeslot_id, exam_date, capacity, bookings, cancellations)
+    SELECT el.exam_id, el.location_id, ts.id, e.exam_date, el.capacity, 0, 0
+    FROM exam_locations el
+    JOIN exams e ON e.id = el.exam_id
+    CROSS JOIN timeslots ts
+    WHERE el.exam_id IN :ids
+""", bindparam("ids", expanding=True))
+
+
+# ----------------------------------------------------------
+# Admin (project.admin)
+# ----------------------------------------------------------
+# Keyset-paged lists: a page is `id > :after ORDER BY id LIMIT :limit` on
+# the primary key (`id < :before ... DESC` going back), so the 2,000th
+# page of users costs what the first does. Each filter combination gets
+# its own statement, built on first use like print_log_query.
+_ADMIN_LISTS = {
+    "users": ("u", """
+        SELECT u.id, u.name, u.email, u.phone, u.nshe_id, u.employee_id,
+               u.role_id, u.department_id, u.major_id, u.status
+        FROM users u
+    """),
+    "courses": ("c", """
+        SELECT c.id, c.course_code, c.course_name, c.department_id
+        FROM courses c
+    """),
+    "exams": ("e", """
+        SELECT e.id, e.exam_type, e.course_id, c.course_code, e.exam_date, e.timeslot_id,
+               e.location_id, e.capacity, e.professor_id
+        FROM exams e
+        JOIN courses c ON c.id = e.course_id
+    """),
+    "sessions": ("el", """
+        SELECT el.id, el.exam_id, e.exam_type, e.exam_date, el.location_id, el.capacity,
+               (
+                   SELECT COUNT(*)
+                   FROM registrations r
+                   WHERE r.exam_id = el.exam_id
+                     AND r.location_id = el.location_id
+                     AND r.status = 'Active'
+               ) AS booked
+        FROM exam_locations el
+        JOIN exams e ON e.id = el.exam_id
+    """),
+}
+_ADMIN_FILTERS = {
+    # An email prefix as a range, so both MySQL and SQLite use the unique index.
+    "users": {
+        "email": "u.email >= :email AND u.email < :email_end",
+        "role_id": "u.role_id = :role_id",
+        "status": "u.status = :status",
+    },
+    "courses": {
+        "code": "c.course_code LIKE :code",
+        "department_id": "c.department_id = :department_id",
+    },
+    "exams": {
+        "start": "e.exam_date >= :start",
+        "end": "e.exam_date <= :end",
+        "course_id": "e.course_id = :course_id",
+        "exam_type": "e.exam_type LIKE :exam_type",
+    },
+    "sessions": {
+        "exam_id": "el.exam_id = :exam_id",
+        "location_id": "el.location_id = :location_id",
+        "start": "e.exam_date >= :start",
+        "end": "e.exam_date <= :end",
+    },
+}
+# Filters selective enough to drive the query. With one set, the ORDER BY
+# is written as `id + 0` so the planner can't walk the primary key for it
+# (both MySQL and SQLite would, scanning every row until LIMIT matches);
+# the few matching rows are sorted instead.
+_ADMIN_DRIVING_FILTERS = {"email"}
+_ADMIN_BINDS = {
+    "email": String, "email_end": String, "status": String, "code": String, "exam_type": String,
+    "role_id": Integer, "department_id": Integer, "course_id": Integer,
+    "exam_id": Integer, "location_id": Integer,
+    "start": Date, "end": Date,
+}
+_admin_list_variants = {}
+
+
+def admin_list_query(entity, filters, backwards=False):
+    """One keyset page of ``entity`` for this set of filter names (see _ADMIN_FILTERS).
+
+    Binds :after (or :before when ``backwards``), :limit and the filters.
+    """
+    key = (entity, tuple(f for f in _ADMIN_FILTERS[entity] if f in filters), backwards)
+    query = _admin_list_variants.get(key)
+    if query is None:
+        alias, select_sql = _ADMIN_LISTS[entity]
+        cursor = f"{alias}.id < :before" if backwards else f"{alias}.id > :after"
+        where_sql = " AND ".join([cursor] + [_ADMIN_FILTERS[entity][f] for f in key[1]])
+        order = f"{alias}.id + 0" if _ADMIN_DRIVING_FILTERS & set(key[1]) else f"{alias}.id"
+        query = _admin_list_variants[key] = Query(
+            f"admin_{entity}[{','.join(key[1])}]{'<' if backwards else '>'}", f"""
+            {select_sql}
+            WHERE {where_sql}
+            ORDER BY {order} {'DESC' if backwards else 'ASC'}
+            LIMIT :limit
+        """, bindparam("before" if backwards else "after", type_=Integer),
+            bindparam("limit", type_=Integer),
+            *(bindparam(b, type_=_ADMIN_BINDS[b])
+              for f in key[1] for b in re.findall(r":(\w+)", _ADMIN_FILTERS[entity][f])))
+    return query
+
+
+# CSV imports update by id (and insert rows without one) for whichever
+# editable columns the file has; one statement per table and column set.
+_admin_write_variants = {}
+
+
+def admin_update_query(table, columns):
+    """UPDATE ``table`` SET each of ``columns`` WHERE id = :id (run as executemany)."""
+    key = ("update", table, tuple(columns))
+    query = _admin_write_variants.get(key)
+    if query is None:
+        assignments = ", ".join(f"{c} = :{c}" for c in columns)
+        query = _admin_write_variants[key] = Query(
+            f"admin_update_{table}[{','.join(columns)}]",
+            f"UPDATE {table} SET {assignments} WHERE id = :id",
+            bindparam("id", type_=Integer),
+        )
+    return query
+
+
+def admin_insert_query(table, columns):
+    """INSERT INTO ``table`` (columns) VALUES (...) (run as executemany)."""
+    key = ("insert", table, tuple(columns))
+    query = _admin_write_variants.get(key)
+    if query is None:
+        query = _admin_write_variants[key] = Query(
+            f"admin_insert_{table}[{','.join(columns)}]",
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + c for c in columns)})",
+        )
+    return query
+
+
+# Bulk edits: one set-based UPDATE for every selected id.
+ADMIN_SET_USER_STATUS = Query("admin_set_user_status", """
+    UPDATE users SET status = :status WHERE id IN :ids
+""", bindparam("status", type_=String), bindparam("ids", expanding=True))
+
+ADMIN_SET_USER_ROLE = Query("admin_set_user_role", """
+    UPDATE users SET role_id = :role_id WHERE id IN :ids
+""", bindparam("role_id", type_=Integer), bindparam("ids", expanding=True))
+
+# authentication keeps its own copy of each user's role.
+ADMIN_SYNC_AUTH_ROLE = Query("admin_sync_auth_role", """
+    UPDATE authentication
+    SET role_id = (SELECT u.role_id FROM users u WHERE u.id = authentication.user_id)
+    WHERE user_id IN :ids
+""", bindparam("ids", expanding=True))
+
+ADMIN_SET_USER_DEPARTMENT = Query("admin_set_user_department", """
+    UPDATE users SET department_id = :department_id WHERE id IN :ids
+""", bindparam("department_id", type_=Integer), bindparam("ids", expanding=True))
+
+ADMIN_SET_COURSE_DEPARTMENT = Query("admin_set_course_department", """
+    UPDATE courses SET department_id = :department_id WHERE id IN :ids
+""", bindparam("department_id", type_=Integer), bindparam("ids", expanding=True))
+
+ADMIN_SET_EXAM_CAPACITY = Query("admin_set_exam_capacity", """
+    UPDATE exams SET capacity = :capacity WHERE id IN :ids
+""", bindparam("capacity", type_=Integer), bindparam("ids", expanding=True))
+
+ADMIN_SET_EXAM_PROFESSOR = Query("admin_set_exam_professor", """
+    UPDATE exams SET professor_id = :professor_id WHERE id IN :ids
+""", bindparam("professor_id", type_=Integer), bindparam("ids", expanding=True))
+
+ADMIN_SET_SESSION_CAPACITY = Query("admin_set_session_capacity", """
+    UPDATE exam_locations SET capacity = :capacity WHERE id IN :ids
+""", bindparam("capacity", type_=Integer), bindparam("ids", expanding=True))
+
+ADMIN_ADD_SESSION_CAPACITY = Query("admin_add_session_capacity", """
+    UPDATE exam_locations
+    SET capacity = CASE WHEN capacity + :delta < 0 THEN 0 ELSE capacity + :delta END
+    WHERE id IN :ids
+""", bindparam("delta", type_=Integer), bindparam("ids", expanding=True))
+
+ADMIN_SESSION_KEYS = Query("admin_session_keys", """
+    SELECT exam_id, location_id FROM exam_locations WHERE id IN :ids
+""", bindparam("ids", expanding=True))
+
+# booking_rollups keeps each session's capacity for the dashboard.
+ADMIN_SYNC_ROLLUP_CAPACITY = Query("admin_sync_rollup_capacity", """
+    UPDATE booking_rollups
+    SET capacity = (
+        SELECT el.capacity
+        FROM exam_locations el
+        WHERE el.exam_id = booking_rollups.exam_id
+          AND el.location_id = booking_rollups.location_id
+    )
+    WHERE (exam_id, location_id) IN :sessions
+""", bindparam("sessions", expanding=True))
+
+# New sessions get zero rollup rows, as rebuild_rollups would create them.
+ADMIN_INSERT_SESSION_ROLLUPS = Query("admin_insert_session_rollups", """
+    INSERT INTO booking_rollups
+        (exam_id, location_id, timeslot_id, exam_date, capacity, bookings, cancellations)
+    SELECT el.exam_id, el.location_id, ts.id, e.exam_date, el.capacity, 0, 0
+    FROM exam_locations el
+    JOIN exams e ON e.id = el.exam_id
+    CROSS JOIN timeslots ts
+    WHERE (el.exam_id, el.location_id) IN :sessions
+      AND NOT EXISTS (SELECT 1 FROM booking_rollups br
+                      WHERE br.exam_id = el.exam_id AND br.location_id = el.location_id
+                        AND br.timeslot_id = ts.id)
+""", bindparam("sessions", expanding=True))
+
+# Students whose schedule snapshots show these exams or courses.
+ADMIN_EXAM_STUDENTS = Query("admin_exam_students", """
+    SELECT DISTINCT user_id FROM registrations WHERE exam_id IN :ids
+""", bindparam("ids", expanding=True))
+
+ADMIN_COURSE_STUDENTS = Query("admin_course_students", """
+    SELECT DISTINCT r.user_id
+    FROM registrations r
+    JOIN exams e ON e.id = r.exam_id
+    WHERE e.course_id IN :ids
+""", bindparam("ids", expanding=True))
+
+ADMIN_USER_BY_EMAIL = Query("admin_user_by_email", """
+    SELECT id, name, role_id FROM users WHERE email = :email
+""", bindparam("email", type_=String))
+
+
+# ----------------------------------------------------------
+# Server-side sessions (project.sessions)
+# ----------------------------------------------------------
+# expires_at is epoch seconds. Each call runs on its own connection.
+SESSION_LOAD = Query("session_load", """
+    SELECT data, expires_at
+    FROM web_sessions
+    WHERE id = :sid AND expires_at > :now
+""", bindparam("sid", type_=String), bindparam("now", type_=Integer))
+
+SESSION_INSERT = Query("session_insert", """
+    INSERT INTO web_sessions (id, data, expires_at)
+    VALUES (:sid, :data, :expires)
+""", bindparam("sid", type_=String), bindparam("data", type_=LargeBinary),
+    bindparam("expires", type_=Integer))
+
+SESSION_UPDATE = Query("session_update", """
+    UPDATE web_sessions
+    SET data = :data, expires_at = :expires
+    WHERE id = :sid
+""", bindparam("sid", type_=String), bindparam("data", type_=LargeBinary),
+    bindparam("expires", type_=Integer))
+
+SESSION_TOUCH = Query("session_touch", """
+    UPDATE web_sessions
+    SET expires_at = :expires
+    WHERE id = :sid
+""", bindparam("sid", type_=String), bindparam("expires", type_=Integer))
+
+SESSION_DELETE = Query("session_delete", """
+    DELETE FROM web_sessions
+    WHERE id = :sid
+""", bindparam("sid", type_=String))
+
+SESSION_EXPIRED_BATCH = Query("session_expired_batch", """
+    SELECT id
+    FROM web_sessions
+    WHERE expires_at <= :now
+    ORDER BY expires_at
+    LIMIT :batch_size
+""", bindparam("now", type_=Integer), bindparam("batch_size", type_=Integer))
+
+SESSION_DELETE_BATCH = Query("session_delete_batch", """
+    DELETE FROM web_sessions
+    WHERE id IN :ids
+""", bindparam("ids", expanding=True))
+
+
+# ----------------------------------------------------------
+# Archive job (project.archive)
+# ----------------------------------------------------------
+ARCHIVE_COUNT = Query("archive_count", """
+    SELECT COUNT(*)
+    FROM registrations r
+    JOIN exams e ON e.id = r.exam_id
+    WHERE e.exam_date < :before
+""", bindparam("before", type_=Date))
+
+ARCHIVE_SELECT_BATCH = Query("archive_select_batch", """
+    SELECT r.id
+    FROM registrations r
+    JOIN exams e ON e.id = r.exam_id
+    WHERE e.exam_date < :before
+    ORDER BY r.id
+    LIMIT :batch_size
+""", bindparam("before", type_=Date), bindparam("batch_size", type_=Integer))
+
+ARCHIVE_COPY_BATCH = Query("archive_copy_batch", f"""
+    INSERT INTO registrations_archive ({ARCHIVE_COLUMNS})
+    SELECT {ARCHIVE_COLUMNS}
+    FROM registrations
+    WHERE id IN :ids
+""", bindparam("ids", expanding=True))
+
+ARCHIVE_DELETE_BATCH = Query("archive_delete_batch", """
+    DELETE FROM registrations
+    WHERE id IN :ids
+""", bindparam("ids", expanding=True))
+
+MAX_ARCHIVED_CODE = Query("max_archived_code", """
+    SELECT MAX(CAST(SUBSTRING(registration_id, 4) AS UNSIGNED))
+    FROM registrations_archive
+    WHERE registration_id LIKE 'CSN%%'
+""")
@@ -0,0 +1,130 @@
+# project/refdata.py
+"""Reference data held in memory: roles, departments, majors, locations
+and buildings.
+
+These tables change a few times a term, but signup, login, the nav bar
+and every page that shows "Campus – Building, Room N" used to query or
+join them on each request. ``refdata()`` returns an immutable snapshot
+with dict lookups and prebuilt location labels. The snapshot is loaded
+per worker (one small query per table) and keyed by the "refdata"
+version. Anything that edits these tables calls ``refdata_changed()``
+after its commit: that bumps the version here and, through the
+"refdata" channel, in every other worker, so the next read reloads.
+A snapshot is also reloaded once it is REFDATA_TTL seconds old (default
+300), which covers a lost message and rows edited by hand.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from . import queries
+from .cache import bump_version, get_version
+from .pubsub import broker
+
+REFDATA_CHANNEL = "refdata"
+
+# Seats assumed for a room whose locations.max_seats is not set.
+DEFAULT_ROOM_SEATS = int(os.environ.get("DEFAULT_ROOM_SEATS", "40"))
+
+REFDATA_TTL = int(os.environ.get("REFDATA_TTL", "300"))
+
+RoleRef = namedtuple("RoleRef", "id name")
+DepartmentRef = namedtuple("DepartmentRef", "id name")
+MajorRef = namedtuple("MajorRef", "id name department_id")
+LocationRef = namedtuple("LocationRef", "id name room_number max_seats")
+BuildingRef = namedtuple("BuildingRef", "id name location_id")
+
+
+def location_label(campus, building, room):
+    label = campus or ""
+    if building:
+        label += f" – {building}"
+    if room:
+        label += f", Room {room}"
+    return label
+
+
+class RefData:
+    def __init__(self, roles, departments, majors, locations, buildings):
+        self.roles = roles
+        self.departments = departments        # sorted by name
+        self.majors = majors                  # sorted by name
+        self.locations = locations            # sorted by name
+        self.buildings = buildings
+
+        self.roles_by_id = {r.id: r for r in roles}
+        self.roles_by_name = {r.name.lower(): r for r in roles}
+        self.departments_by_id = {d.id: d for d in departments}
+        self.majors_by_id = {m.id: m for m in majors}
+        self.majors_by_name = {m.name: m for m in majors}
+        self.locations_by_id = {loc.id: loc for loc in locations}
+
+        self.buildings_by_location = {}
+        for b in buildings:  # name order, so [0] is the building labels use
+            self.buildings_by_location.setdefault(b.location_id, []).append(b)
+
+        self.location_labels = {}
+        for loc in locations:
+            first = self.buildings_by_location.get(loc.id)
+            self.location_labels[loc.id] = location_label(
+                loc.name, first[0].name if first else None, loc.room_number
+            )
+
+    def role_name(self, role_id):
+        """Lower-cased role name ('student', 'faculty', ...) or ''."""
+        role = self.roles_by_id.get(role_id)
+        return role.name.lower() if role else ""
+
+    def seat_limit(self, location_id):
+        """The room's max_seats, or DEFAULT_ROOM_SEATS when it isn't set."""
+        loc = self.locations_by_id.get(location_id)
+        return loc.max_seats if loc is not None and loc.max_seats else DEFAULT_ROOM_SEATS
+
+    def label(self, location_id):
+        """"Campus – Building, Room N" for a location id ('' if unknown)."""
+        return self.location_labels.get(location_id, "")
+
+
+_current = None  # (version, expires_at, RefData)
+_load_lock = threading.Lock()
+
+
+def _load():
+    return RefData(
+        roles=[RoleRef(**r) for r in queries.REF_ROLES.all()],
+        departments=[DepartmentRef(**r) for r in queries.REF_DEPARTMENTS.all()],
+        majors=[MajorRef(**r) for r in queries.REF_MAJORS.all()],
+        locations=[LocationRef(**r) for r in queries.REF_LOCATIONS.all()],
+        buildings=[BuildingRef(**r) for r in queries.REF_BUILDINGS.all()],
+    )
+
+
+def _fresh(current, version):
+    return current is not None and current[0] == version and current[1] > time.monotonic()
+
+
+def refdata():
+    """The current RefData snapshot, loading it if the version moved or it expired."""
+    global _current
+    version = get_version("refdata")
+    current = _current
+    if _fresh(current, version):
+        return current[2]
+    with _load_lock:
+        if not _fresh(_current, version):
+            _current = (version, time.monotonic() + REFDATA_TTL, _load())
+        return _current[2]
+
+
+def refdata_changed():
+    """Call after committing an edit to any reference table."""
+    bump_version("refdata")
+    broker.publish(REFDATA_CHANNEL, {})
+
+
+def _on_refdata_change(message):
+    bump_version("refdata")
+
+
+broker.listen(REFDATA_CHANNEL, _on_refdata_change)
@@ -0,0 +1,196 @@
+# project/reminders.py
+"""Exam reminder emails (24 hours and 1 hour before the exam) and notices.
+
+Run by `flask send-reminders` from cron every few minutes. Each run has
+two steps:
+
+``enqueue_due()`` finds reminders that are now due. One query returns
+every Active registration for exams in the next two days. A second query
+returns the reminders already queued for those days. The exact start
+(exam_date + timeslot) is compared in Python, and the new (registration,
+kind) pairs are inserted in batches. The unique key on (registration_id,
+kind) guarantees nobody is reminded twice, even if two runs overlap.
+
+``send_queued()`` drains the queue in keyset pages. Each page is first
+claimed for the run: one UPDATE moves the next Queued rows to 'Sending'
+under a fresh run id (claimed_by) and commits, so an overlapping run
+(cron firing again while a slow run is still sending) claims different
+rows and nobody is emailed twice. One query then returns everything the
+emails of the claimed rows need. Each email goes out through a
+rate-limited transport, and each page's outcome is written back with one
+UPDATE per status. Emails are rendered from templates/email (TEMPLATES,
+project.emails). Reminders for registrations canceled since queuing
+are skipped. Failed sends stay queued until MAX_ATTEMPTS. If sending
+raises, the page's unsent claims go back to the queue. Claims left
+behind by a run that died are requeued after CLAIM_TIMEOUT.
+
+The same queue carries the "canceled" and "moved" notices that faculty
+bulk actions enqueue (project.bookings.cancel_session / move_session);
+they go out on the next run.
+"""
+import datetime
+import uuid
+
+from sqlalchemy.exc import IntegrityError
+
+from . import db, queries
+from .email_utils import RateLimitedTransport
+from .emails import render_batch
+from .refdata import refdata
+
+# (kind, lead time), longest first. A registration gets only the
+# shortest reminder that is due, so a booking made 30 minutes before
+# the exam is not sent a "tomorrow" reminder as well.
+REMINDER_KINDS = (
+    ("24h", datetime.timedelta(hours=24)),
+    ("1h", datetime.timedelta(hours=1)),
+)
+MAX_ATTEMPTS = 3
+
+# A 'Sending' claim older than this belongs to a run that died (a page
+# takes minutes at the transport's rate limit); its rows are requeued.
+CLAIM_TIMEOUT = datetime.timedelta(hours=1)
+
+# Email template per queue kind (templates/email/<name>.html/.txt).
+TEMPLATES = {
+    "24h": "exam_reminder",
+    "1h": "exam_reminder",
+    "canceled": "session_canceled",
+    "moved": "session_moved",
+}
+
+# Exams without a timeslot or exam_time are treated as starting at the
+# first slot of the day.
+DEFAULT_START = datetime.time(8, 0)
+
+
+def _as_time(value):
+    """A TIME column as datetime.time (PyMySQL returns timedelta)."""
+    if value is None:
+        return DEFAULT_START
+    if isinstance(value, datetime.time):
+        return value
+    if isinstance(value, datetime.timedelta):
+        return (datetime.datetime.min + value).time()
+    return datetime.time.fromisoformat(str(value)[:8])
+
+
+def due_kind(start, now):
+    """The reminder kind due for an exam starting at ``start``, or None."""
+    if start <= now:
+        return None
+    due = None
+    for kind, lead in REMINDER_KINDS:
+        if start - lead <= now:
+            due = kind
+    return due
+
+
+def enqueue_due(now=None, batch_size=1000, dry_run=False):
+    """Queue every reminder due at ``now``; returns {kind: count}."""
+    now = now or datetime.datetime.now()
+    first = now.date()
+    last = (now + max(lead for _, lead in REMINDER_KINDS)).date()
+
+    queued = {(r["registration_id"], r["kind"])
+              for r in queries.QUEUED_REMINDER_KEYS.all(first=first)}
+
+    rows = []
+    for r in queries.REMINDER_CANDIDATES.all(first=first, last=last):
+        start = datetime.datetime.combine(r["exam_date"], _as_time(r["start_time"]))
+        kind = due_kind(start, now)
+        if kind and (r["reg_id"], kind) not in queued:
+            rows.append({"rid": r["reg_id"], "kind": kind, "day": r["exam_date"]})
+
+    counts = {kind: 0 for kind, _ in REMINDER_KINDS}
+    for row in rows:
+        counts[row["kind"]] += 1
+    if dry_run or not rows:
+        return counts
+
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        try:
+            queries.INSERT_REMINDERS.execute(batch)
+            db.session.commit()
+        except IntegrityError:
+            # An overlapping run queued some of these first; fall back to
+            # row-by-row for this batch and drop the duplicates.
+            db.session.rollback()
+            for row in batch:
+                try:
+                    queries.INSERT_REMINDERS.execute(**row)
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+                    counts[row["kind"]] -= 1
+    return counts
+
+
+def _still_due(row):
+    """Cancel notices always go out; everything else needs an Active booking."""
+    return row["kind"] == "canceled" or row["reg_status"] == "Active"
+
+
+def reminder_context(row, ref):
+    """Template context for one queued reminder row (no further queries)."""
+    context = dict(row)
+    context["full_location"] = ref.label(row["location_id"])
+    return context
+
+
+def send_queued(transport=None, batch_size=200, limit=None):
+    """Send queued reminders; returns {"sent", "failed", "skipped"} counts."""
+    transport = transport or RateLimitedTransport()
+    ref = refdata()
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+    run = uuid.uuid4().hex
+
+    queries.RELEASE_STALE_REMINDERS.execute(cutoff=datetime.datetime.now() - CLAIM_TIMEOUT)
+    queries.EXPIRE_REMINDERS.execute(today=datetime.date.today())
+    db.session.commit()
+
+    after = 0
+    while limit is None or counts["sent"] + counts["failed"] < limit:
+        size = batch_size
+        if limit is not None:
+            size = min(batch_size, limit - counts["sent"] - counts["failed"])
+        claimed = queries.CLAIM_REMINDERS.execute(run=run, after=after, batch_size=size).rowcount
+        db.session.commit()
+        if not claimed:
+            # Queue drained, or an overlapping run holds the rest of it.
+            break
+        rows = queries.CLAIMED_REMINDERS.all(run=run)
+        if not rows:
+            break
+        after = rows[-1]["id"]
+
+        sent, failed = [], []
+        due = [row for row in rows if _still_due(row)]
+        skipped = [row["id"] for row in rows if not _still_due(row)]
+
+        by_template = {}
+        for row in due:
+            by_template.setdefault(TEMPLATES[row["kind"]], []).append(row)
+        try:
+            for template, group in by_template.items():
+                messages = render_batch(template, (reminder_context(row, ref) for row in group))
+                for row, email in zip(group, messages):
+                    ok = transport(to_email=row["student_email"], subject=email.subject,
+                                   html_body=email.html, text_body=email.text)
+                    (sent if ok is not None else failed).append(row["id"])
+        finally:
+            if sent:
+                queries.MARK_REMINDERS_SENT.execute(ids=sent)
+            if failed:
+                queries.MARK_REMINDERS_FAILED.execute(ids=failed, max_attempts=MAX_ATTEMPTS)
+            if skipped:
+                queries.MARK_REMINDERS_SKIPPED.execute(ids=skipped)
+            if len(sent) + len(failed) + len(skipped) < len(rows):
+                queries.RELEASE_REMINDERS.execute(run=run)
+            db.session.commit()
+
+        counts["sent"] += len(sent)
+        counts["failed"] += len(failed)
+        counts["skipped"] += len(skipped)
+    return counts
@@ -0,0 +1,234 @@
+# project/schedule.py
+"""Per-student schedule snapshots.
+
+A snapshot holds every registration of one student with its display
+labels already resolved (course, professor, and the location label from
+project.refdata),
+so the schedule, appointments and confirm pages can answer "how many
+active bookings?", "already booked this exam?", "already busy at that
+time?" and "list my bookings" without touching the database.
+
+For the time question each snapshot keeps ``busy``, an interval index
+mapping exam date ('YYYY-MM-DD') to a bitmap of the timeslots the
+student holds an Active booking in (bit n = timeslot n). It is rebuilt
+whenever the snapshot changes, so a conflict check is one dict lookup
+and one AND.
+
+Snapshots are loaded with one query on first read, updated write-through
+by the booking service (project.bookings) and expire after
+STUDENT_SCHEDULE_TTL seconds. When a student's rows change in another
+worker, an invalidation on the "schedule" channel drops this worker's
+copy so the next read reloads it.
+"""
+import datetime
+import os
+import uuid
+
+from . import queries
+from .cache import TTLCache
+from .pubsub import broker
+from .refdata import refdata
+
+MAX_ACTIVE = 3
+SCHEDULE_CHANNEL = "schedule"
+
+# Timeslots 1-9 (08:00-17:00). The busy index keeps one bit per slot, so
+# anything from a form must be checked against this before it is shifted.
+TIMESLOT_IDS = range(1, 10)
+
+# Identifies this process on the channel so a worker ignores its own
+# invalidations (it has already applied the change write-through). The PID
+# is part of it because preloaded workers share everything set at import.
+_BOOT_ID = uuid.uuid4().hex
+
+
+def _origin():
+    return f"{_BOOT_ID}:{os.getpid()}"
+
+
+_snapshots = TTLCache(
+    default_ttl=int(os.environ.get("STUDENT_SCHEDULE_TTL", "120")),
+    max_entries=20000,
+)
+
+
+def format_time(value):
+    """'HH:MM' for a TIME column (PyMySQL returns timedelta), time or str."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.timedelta):
+        minutes = int(value.total_seconds()) // 60
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    if isinstance(value, datetime.time):
+        return value.strftime("%H:%M")
+    return str(value)[:5]
+
+
+def day_key(value):
+    """'YYYY-MM-DD' for a DATE column value (date or ISO string)."""
+    return str(value)[:10]
+
+
+def _busy_index(bookings):
+    busy = {}
+    for b in bookings:
+        if b["status"] == "Active" and b.get("timeslot_id") and b.get("exam_date"):
+            day = day_key(b["exam_date"])
+            busy[day] = busy.get(day, 0) | (1 << int(b["timeslot_id"]))
+    return busy
+
+
+def busy_users(bookings, exam_date, timeslot_id):
+    """User ids whose Active ``bookings`` already hold ``timeslot_id`` on ``exam_date``.
+
+    The StudentSchedule.has_conflict bitmask test, for many students at
+    once; each booking needs user_id, status, exam_date and timeslot_id.
+    """
+    by_user = {}
+    for b in bookings:
+        by_user.setdefault(b["user_id"], []).append(b)
+    day, bit = day_key(exam_date), 1 << int(timeslot_id)
+    return {user_id for user_id, rows in by_user.items() if _busy_index(rows).get(day, 0) & bit}
+
+
+class StudentSchedule:
+    def __init__(self, user_id, bookings):
+        self.user_id = user_id
+        self.bookings = bookings  # newest exam first, like the appointments page
+        self.reindex()
+
+    def reindex(self):
+        """Rebuild ``busy`` after bookings were added or changed status."""
+        self.busy = _busy_index(self.bookings)
+
+    @property
+    def active(self):
+        return [b for b in self.bookings if b["status"] == "Active"]
+
+    @property
+    def active_count(self):
+        return len(self.active)
+
+    @property
+    def remaining_slots(self):
+        return max(MAX_ACTIVE - self.active_count, 0)
+
+    def find(self, reg_id):
+        for b in self.bookings:
+            if b["reg_id"] == reg_id:
+                return b
+        return None
+
+    def has_active_booking_for(self, exam_id, ignore_reg_id=None):
+        exam_id = int(exam_id)
+        return any(
+            b["exam_id"] == exam_id and b["reg_id"] != ignore_reg_id
+            for b in self.active
+        )
+
+    def has_conflict(self, exam_date, timeslot_id, ignore_reg_id=None):
+        """True if an Active booking already holds this date and timeslot.
+
+        ``ignore_reg_id`` is the booking being rescheduled; it doesn't
+        count against its own replacement.
+        """
+        busy = self.busy
+        if ignore_reg_id is not None:
+            busy = _busy_index([b for b in self.bookings if b["reg_id"] != ignore_reg_id])
+        return bool(busy.get(day_key(exam_date), 0) & (1 << int(timeslot_id)))
+
+    def busy_slots(self, ignore_reg_id=None):
+        """{date: [timeslot ids]} held by Active bookings, for the booking page."""
+        busy = self.busy
+        if ignore_reg_id is not None:
+            busy = _busy_index([b for b in self.bookings if b["reg_id"] != ignore_reg_id])
+        return {
+            day: [t for t in range(bits.bit_length()) if bits >> t & 1]
+            for day, bits in busy.items()
+        }
+
+    def filtered(self, q="", start="", end=""):
+        """Bookings matching the appointments page filters."""
+        q = q.lower()
+        out = []
+        for b in self.bookings:
+            haystack = f"{b['course_code'] or ''}\n{b['exam_type'] or ''}".lower()
+            if q and q not in haystack:
+                continue
+            if start and str(b["exam_date"]) < start:
+                continue
+            if end and str(b["exam_date"]) > end:
+                continue
+            out.append(b)
+        return out
+
+
+def _load(user_id):
+    rows = queries.STUDENT_SCHEDULE.all(uid=user_id)
+    ref = refdata()
+
+    bookings = []
+    for r in rows:
+        d = dict(r)
+        d["exam_time"] = format_time(d["exam_time"])
+        d["full_location"] = ref.label(d["location_id"])
+        bookings.append(d)
+    return StudentSchedule(user_id, bookings)
+
+
+def get_schedule(user_id):
+    """The student's snapshot, loading it (one query) if missing or expired."""
+    return _snapshots.get_or_set(user_id, lambda: _load(user_id))
+
+
+# ----------------------------------------------------------
+# Write-through (called by project.bookings after commit)
+# ----------------------------------------------------------
+def record_booking(user_id, booking):
+    snapshot = _snapshots.get(user_id)
+    if snapshot is not None:
+        # Swap in a new list so concurrent readers never see a half-sorted one.
+        snapshot.bookings = sorted(
+            snapshot.bookings + [booking], key=lambda b: str(b["exam_date"]), reverse=True
+        )
+        snapshot.reindex()
+    _announce(user_id)
+
+
+def record_status(user_id, reg_id, status):
+    snapshot = _snapshots.get(user_id)
+    if snapshot is not None:
+        booking = snapshot.find(reg_id)
+        if booking is None:
+            _snapshots.delete(user_id)
+        else:
+            booking["status"] = status
+            snapshot.reindex()
+    _announce(user_id)
+
+
+def invalidate(user_id):
+    _snapshots.delete(user_id)
+    _announce(user_id)
+
+
+def invalidate_many(user_ids):
+    """Drop many students' snapshots with a single announcement (bulk faculty actions)."""
+    user_ids = sorted(set(user_ids))
+    for user_id in user_ids:
+        _snapshots.delete(user_id)
+    if user_ids:
+        broker.publish(SCHEDULE_CHANNEL, {"user_ids": user_ids, "origin": _origin()})
+
+
+def _announce(user_id):
+    broker.publish(SCHEDULE_CHANNEL, {"user_id": user_id, "origin": _origin()})
+
+
+def _on_schedule_change(message):
+    if message.get("origin") != _origin():
+        for user_id in message.get("user_ids") or [message["user_id"]]:
+            _snapshots.delete(user_id)
+
+
+broker.listen(SCHEDULE_CHANNEL, _on_schedule_change)
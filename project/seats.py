@@ -0,0 +1,51 @@
+# project/seats.py
+"""Seat inventory change notifications.
+
+Anything that adds or removes an Active registration calls
+``seats_changed()`` after its commit. That publishes the new remaining
+count for each affected (exam, location) session on the "seats" channel:
+open schedule pages receive it over SSE (gevent workers only; under sync
+workers they poll remaining_seats instead), and every worker bumps its
+"catalog" cache version so cached catalog fragments are rebuilt.
+"""
+from . import queries
+from .cache import bump_version
+from .pubsub import broker
+
+SEATS_CHANNEL = "seats"
+
+
+def session_key(exam_id, location_id):
+    return f"{int(exam_id)}:{int(location_id)}"
+
+
+def remaining_seats(sessions):
+    """{(exam_id, location_id): remaining} for the given sessions, one query."""
+    sessions = sorted({(int(e), int(l)) for e, l in sessions if e is not None and l is not None})
+    if not sessions:
+        return {}
+
+    rows = queries.SESSION_SEATS.all(sessions=sessions)
+
+    return {(r["exam_id"], r["location_id"]): max(r["remaining"], 0) for r in rows}
+
+
+def seats_changed(sessions):
+    """Publish fresh remaining counts for sessions touched by a commit."""
+    remaining = remaining_seats(sessions)
+    if not remaining:
+        bump_version("catalog")
+    for (exam_id, location_id), left in remaining.items():
+        broker.publish(SEATS_CHANNEL, {
+            "key": session_key(exam_id, location_id),
+            "exam_id": exam_id,
+            "location_id": location_id,
+            "remaining": left,
+        })
+
+
+def _invalidate_catalog(message):
+    bump_version("catalog")
+
+
+broker.listen(SEATS_CHANNEL, _invalidate_catalog)
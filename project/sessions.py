@@ -0,0 +1,315 @@
+# project/sessions.py
+"""Server-side sessions.
+
+Flask's default session is the whole dict, signed and base64'd into a
+cookie. Here that meant the Flask-Login state, the CSRF token,
+``reschedule_old_id`` and any queued flashes travelled on every request,
+static files included, and were decoded and verified each time. Now the
+cookie holds only a random session id, and the data lives in a store:
+
+* DbStore (default) keeps rows in ``web_sessions``, so every worker and
+  dyno shares them. A read is one primary-key lookup, on its own pooled
+  connection so it never joins or commits the view's transaction.
+* LocalStore (SESSION_STORE=local) keeps them in this process. It is the
+  stand-in for dev and single-worker deployments.
+* RedisStore (SESSION_STORE=redis://...) needs the optional ``redis``
+  package.
+
+SESSION_STORE=cookie switches back to Flask's signed cookie.
+
+The session is loaded lazily, on first use, and static files skip it
+altogether. Flask-Login's after-request hook reads it on every other
+request that sends the cookie, so a page costs one keyed lookup. It is
+written back only when it changed. Data is Flask's tagged JSON, and
+zlib-compressed when that is larger than COMPRESS_OVER bytes. Sessions
+idle for SESSION_TTL seconds (default a day) expire. Reads refresh the
+expiry once less than half of it is left, so a busy session is not
+rewritten on every request. Expired rows are deleted by `flask
+sessions-cleanup`; the other stores expire entries themselves.
+
+Login and logout call ``regenerate()``, so a session id issued before
+login never carries into the logged-in session, and one used while logged
+in is gone after logout.
+"""
+import os
+import re
+import secrets
+import time
+import zlib
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from . import db, queries
+from .cache import TTLCache
+
+COMPRESS_OVER = 512
+_SID_RE = re.compile(r"^[A-Za-z0-9_-]{43}$")
+_serializer = TaggedJSONSerializer()
+
+
+def new_sid():
+    return secrets.token_urlsafe(32)
+
+
+def dumps(data):
+    raw = _serializer.dumps(data).encode()
+    if len(raw) > COMPRESS_OVER:
+        return b"z" + zlib.compress(raw)
+    return b"j" + raw
+
+
+def loads(blob):
+    blob = bytes(blob)
+    raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    return _serializer.loads(raw.decode())
+
+
+# ==========================================================
+#  Stores
+# ==========================================================
+# load(sid) -> (blob, expires_at) or None, where expires_at is in epoch
+# seconds. save/touch take a TTL in seconds.
+class DbStore:
+    """Sessions in the web_sessions table."""
+
+    def __init__(self, app):
+        self.app = app
+        self._engine = None
+
+    @property
+    def engine(self):
+        # Sessions can be opened and saved outside an app context (the
+        # test client's session_transaction), so look the engine up once.
+        if self._engine is None:
+            with self.app.app_context():
+                self._engine = db.engine
+        return self._engine
+
+    def load(self, sid):
+        with self.engine.connect() as conn:
+            row = queries.SESSION_LOAD.execute_on(conn, sid=sid, now=int(time.time())).first()
+        return (row[0], row[1]) if row else None
+
+    def save(self, sid, blob, ttl, new):
+        expires = int(time.time()) + ttl
+        with self.engine.begin() as conn:
+            if not new and queries.SESSION_UPDATE.execute_on(
+                    conn, sid=sid, data=blob, expires=expires).rowcount:
+                return
+            queries.SESSION_INSERT.execute_on(conn, sid=sid, data=blob, expires=expires)
+
+    def touch(self, sid, ttl):
+        with self.engine.begin() as conn:
+            queries.SESSION_TOUCH.execute_on(conn, sid=sid, expires=int(time.time()) + ttl)
+
+    def delete(self, sid):
+        with self.engine.begin() as conn:
+            queries.SESSION_DELETE.execute_on(conn, sid=sid)
+
+    def cleanup(self, batch_size=1000):
+        """Delete expired rows in batches; returns rows deleted."""
+        deleted = 0
+        now = int(time.time())
+        while True:
+            with self.engine.begin() as conn:
+                ids = [r[0] for r in queries.SESSION_EXPIRED_BATCH.execute_on(
+                    conn, now=now, batch_size=batch_size)]
+                if not ids:
+                    return deleted
+                deleted += queries.SESSION_DELETE_BATCH.execute_on(conn, ids=ids).rowcount
+
+
+class LocalStore:
+    """Sessions held in this process only."""
+
+    def __init__(self, max_entries=100000):
+        self._data = TTLCache(max_entries=max_entries)
+
+    def load(self, sid):
+        return self._data.get(sid)
+
+    def save(self, sid, blob, ttl, new):
+        self._data.set(sid, (blob, int(time.time()) + ttl), ttl)
+
+    def touch(self, sid, ttl):
+        entry = self._data.get(sid)
+        if entry is not None:
+            self.save(sid, entry[0], ttl, False)
+
+    def delete(self, sid):
+        self._data.delete(sid)
+
+    def cleanup(self, batch_size=1000):
+        return 0
+
+
+class RedisStore:
+    """Sessions shared by every worker through Redis."""
+
+    prefix = "ers:sess:"
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for this store
+
+        self._client = redis.Redis.from_url(url)
+
+    def load(self, sid):
+        pipe = self._client.pipeline()
+        pipe.get(self.prefix + sid)
+        pipe.ttl(self.prefix + sid)
+        blob, ttl = pipe.execute()
+        return (blob, int(time.time()) + ttl) if blob is not None else None
+
+    def save(self, sid, blob, ttl, new):
+        self._client.set(self.prefix + sid, blob, ex=ttl)
+
+    def touch(self, sid, ttl):
+        self._client.expire(self.prefix + sid, ttl)
+
+    def delete(self, sid):
+        self._client.delete(self.prefix + sid)
+
+    def cleanup(self, batch_size=1000):
+        return 0
+
+
+# ==========================================================
+#  Session object + interface
+# ==========================================================
+class ServerSession(CallbackDict, SessionMixin):
+    """A session dict that reads its store on first use."""
+
+    def __init__(self, store, sid):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(None, on_update)
+        self.store = store
+        self.cookie_sid = sid      # what the browser sent
+        self.sid = sid             # what the response will carry; None = issue a new one
+        self.stale_sid = None      # replaced by regenerate(), deleted on save
+        self.expires_at = None
+        self.loaded = sid is None
+        self.new = True
+        self.modified = False
+        self.accessed = False
+
+    def _load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        entry = self.store.load(self.sid)
+        if entry is None:
+            # Unknown or expired: never adopt an id the server didn't issue.
+            self.sid = None
+            return
+        blob, self.expires_at = entry
+        dict.update(self, loads(blob))
+        self.new = False
+
+    def regenerate(self):
+        """Keep the data under a new id (call on login)."""
+        self._load()
+        if self.sid is not None and not self.new:
+            self.stale_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+def _loading(name):
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._load()
+        self.accessed = True
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ("__getitem__", "__setitem__", "__delitem__", "__contains__", "__iter__", "__len__",
+              "__eq__", "__repr__", "get", "keys", "items", "values", "copy", "setdefault",
+              "pop", "popitem", "update", "clear"):
+    setattr(ServerSession, _name, _loading(_name))
+ServerSession.__hash__ = None
+
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        if app.static_url_path and request.path.startswith(app.static_url_path + "/"):
+            return self.make_null_session(app)
+        sid = request.cookies.get(self.get_cookie_name(app))
+        return ServerSession(self.store, sid if sid and _SID_RE.match(sid) else None)
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add("Cookie")
+        if not session.loaded:
+            return
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.stale_sid:
+            self.store.delete(session.stale_sid)
+
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+            if session.cookie_sid:
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       partitioned=self.get_cookie_partitioned(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        if session.sid is None:
+            session.sid = new_sid()
+        if session.modified or session.new:
+            self.store.save(session.sid, dumps(dict(session)), self.ttl, session.new)
+        elif session.expires_at - time.time() < self.ttl / 2:
+            self.store.touch(session.sid, self.ttl)
+
+        if session.sid != session.cookie_sid or session.permanent:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                partitioned=self.get_cookie_partitioned(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def regenerate(session):
+    """New session id for the same data; a no-op under cookie sessions."""
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+def make_store(app, spec):
+    if spec.startswith(("redis://", "rediss://")):
+        return RedisStore(spec)
+    if spec == "local":
+        return LocalStore()
+    return DbStore(app)
+
+
+def init_sessions(app):
+    spec = os.environ.get("SESSION_STORE", "db")
+    if spec == "cookie":
+        return
+    app.session_interface = ServerSessionInterface(
+        make_store(app, spec), int(os.environ.get("SESSION_TTL", "86400"))
+    )
@@ -0,0 +1,160 @@
+/* Exam-day check-in kiosk.
+ *
+ * Works from a copy of the room's roster kept in localStorage, so a
+ * reload or a dropped connection does not lose the list. The roster is
+ * re-validated with If-None-Match (a 304 costs the server nothing), and
+ * check-ins are queued locally and sent in batches; the server answers
+ * each batch with the room's full checked-in set.
+ */
+var CheckinKiosk = (function () {
+  var SYNC_MS = 5000;        // flush queued check-ins
+  var PULL_MS = 30000;       // pick up other kiosks' check-ins
+  var ROSTER_MS = 60000;     // re-validate the roster
+
+  var opts, state, syncing = false, lastSync = 0;
+
+  function load() {
+    try {
+      return JSON.parse(localStorage.getItem(opts.storageKey)) || {};
+    } catch (e) {
+      return {};
+    }
+  }
+
+  function save() {
+    try {
+      localStorage.setItem(opts.storageKey, JSON.stringify(state));
+    } catch (e) { /* private mode / quota: keep working in memory */ }
+  }
+
+  function localTimestamp() {
+    var d = new Date(), p = function (n) { return (n < 10 ? "0" : "") + n; };
+    return d.getFullYear() + "-" + p(d.getMonth() + 1) + "-" + p(d.getDate()) +
+      "T" + p(d.getHours()) + ":" + p(d.getMinutes()) + ":" + p(d.getSeconds());
+  }
+
+  function setStatus(text) {
+    document.getElementById("kioskStatus").textContent = text;
+  }
+
+  function isCheckedIn(regId) {
+    if (state.checkedIn.indexOf(regId) !== -1) return true;
+    return state.pending.some(function (p) { return p.reg_id === regId; });
+  }
+
+  function render() {
+    var body = document.getElementById("kioskRows");
+    var filter = document.getElementById("kioskFilter").value.trim().toLowerCase();
+    var roster = state.roster;
+    body.innerHTML = "";
+    if (!roster) return;
+
+    var col = {};
+    roster.columns.forEach(function (name, i) { col[name] = i; });
+    document.getElementById("kioskEmpty").style.display = roster.rows.length ? "none" : "";
+
+    roster.rows.forEach(function (row) {
+      var haystack = [row[col.name], row[col.nshe_id], row[col.code]].join(" ").toLowerCase();
+      if (filter && haystack.indexOf(filter) === -1) return;
+
+      var tr = document.createElement("tr");
+      [row[col.time] || "TBA", row[col.name], row[col.nshe_id] || "", row[col.exam], row[col.code]]
+        .forEach(function (value) {
+          var td = document.createElement("td");
+          td.style.padding = "8px";
+          td.textContent = value;
+          tr.appendChild(td);
+        });
+
+      var action = document.createElement("td");
+      action.style.padding = "8px";
+      if (isCheckedIn(row[col.reg_id])) {
+        action.textContent = "✓ Checked in";
+      } else {
+        var btn = document.createElement("button");
+        btn.className = "btn btn-primary-blue";
+        btn.style.padding = "4px 12px";
+        btn.textContent = "Check In";
+        btn.onclick = function () { checkIn(row[col.reg_id]); };
+        action.appendChild(btn);
+      }
+      tr.appendChild(action);
+      body.appendChild(tr);
+    });
+  }
+
+  function checkIn(regId) {
+    if (isCheckedIn(regId)) return;
+    state.pending.push({ reg_id: regId, at: localTimestamp() });
+    save();
+    render();
+    setStatus(state.pending.length + " waiting to sync");
+  }
+
+  function refreshRoster() {
+    var headers = {};
+    if (state.etag && state.roster) headers["If-None-Match"] = state.etag;
+    return fetch(opts.rosterUrl, { headers: headers, credentials: "same-origin" })
+      .then(function (resp) {
+        if (resp.status === 304) return;
+        if (!resp.ok) throw new Error("roster " + resp.status);
+        state.etag = resp.headers.get("ETag");
+        return resp.json().then(function (roster) {
+          state.roster = roster;
+          save();
+          render();
+        });
+      })
+      .catch(function () { setStatus("Offline – using saved roster"); });
+  }
+
+  function sync(force) {
+    if (syncing) return;
+    if (!state.pending.length && !force && Date.now() - lastSync < PULL_MS) return;
+
+    var batch = state.pending.slice();
+    syncing = true;
+    fetch(opts.syncUrl, {
+      method: "POST",
+      credentials: "same-origin",
+      headers: { "Content-Type": "application/json", "X-CSRFToken": opts.csrfToken },
+      body: JSON.stringify({ date: opts.date, checkins: batch })
+    })
+      .then(function (resp) {
+        if (!resp.ok) throw new Error("sync " + resp.status);
+        return resp.json();
+      })
+      .then(function (result) {
+        var sent = batch.map(function (p) { return p.reg_id; });
+        state.pending = state.pending.filter(function (p) { return sent.indexOf(p.reg_id) === -1; });
+        state.checkedIn = result.checked_in;
+        lastSync = Date.now();
+        save();
+        render();
+        setStatus(state.pending.length ? state.pending.length + " waiting to sync"
+                                       : "Synced " + new Date().toLocaleTimeString());
+        if (result.rejected.length) refreshRoster();
+      })
+      .catch(function () {
+        setStatus("Offline – " + state.pending.length + " waiting to sync");
+      })
+      .then(function () { syncing = false; });
+  }
+
+  function start(options) {
+    opts = options;
+    state = load();
+    state.pending = state.pending || [];
+    state.checkedIn = state.checkedIn || [];
+
+    document.getElementById("kioskFilter").addEventListener("input", render);
+    window.addEventListener("online", function () { sync(true); });
+
+    render();
+    refreshRoster().then(function () { sync(true); });
+    setInterval(sync, SYNC_MS);
+    setInterval(refreshRoster, ROSTER_MS);
+  }
+
+  return { start: start };
+})();
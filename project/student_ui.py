@@ -1,15 +1,30 @@
-import os
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session
+import json
+import logging
+import re
+import time
+from flask import (Blueprint, Response, current_app, render_template, request, flash, redirect,
+                   url_for, session)
 from flask_login import login_required, current_user
-from sqlalchemy import text
 from datetime import date, timedelta
-from project import db
+from project import queries
 from project.email_utils import send_exam_confirmation
+from project.emails import render
+from project.idempotency import idempotent
+from project.bookings import BookingRejected, cancel_booking, create_booking
+from project.loaders import exam_catalog
+from project.pubsub import broker
+from project.schedule import MAX_ACTIVE, TIMESLOT_IDS, get_schedule
+from project.seats import SEATS_CHANNEL, remaining_seats, session_key
 
 student_ui = Blueprint("student_ui", __name__)
+log = logging.getLogger(__name__)
 
-print("📁 student_ui.py loaded from:", os.path.abspath(__file__))
-print("🚀 student_ui blueprint registered as 'student_ui'")
+TIME_CONFLICT_MESSAGE = "You already have an exam booked at that time on that day."
+LIMIT_MESSAGE = "You already have 3 active exam registrations. You cannot book more."
+DUPLICATE_MESSAGE = "You already have an active reservation for this exam."
+CANCELED_MESSAGE = ("You canceled this exam earlier. "
+                    "Please contact the testing center to book it again.")
+TIMESLOT_MESSAGE = "Please choose a valid time slot."
 
 
 # =====================================================================
@@ -28,6 +43,15 @@ def get_timeslot_label(timeslot_id):
     return f"{hour:02d}:00", f"{hour+1:02d}:00"
 
 
+def valid_timeslot(value):
+    """The form's timeslot_id as an int, or None unless it is one of TIMESLOT_IDS."""
+    try:
+        tid = int(value)
+    except (TypeError, ValueError):
+        return None
+    return tid if tid in TIMESLOT_IDS else None
+
+
 
 
 # =====================================================================
@@ -38,11 +62,7 @@ def get_timeslot_label(timeslot_id):
 def start_reschedule(reg_id):
 
     # Find appointment
-    reg = db.session.execute(text("""
-        SELECT id, user_id, status
-        FROM registrations
-        WHERE id = :rid
-    """), {"rid": reg_id}).mappings().first()
+    reg = queries.REGISTRATION.first(rid=reg_id)
 
     # Validate
     if not reg or reg["user_id"] != current_user.id:
@@ -78,61 +98,16 @@ def student_exams():
     # -------------------------------------------------------------
     # HELPER: active registration counts for this student
     # -------------------------------------------------------------
-    max_allowed = 3
-    row = db.session.execute(text("""
-        SELECT COUNT(*) AS cnt
-        FROM registrations
-        WHERE user_id = :uid
-          AND status = 'Active'
-    """), {"uid": current_user.id}).mappings().first()
-
-    active_count = row["cnt"] if row and row["cnt"] is not None else 0
-    remaining_slots = max_allowed - active_count
-    if remaining_slots < 0:
-        remaining_slots = 0
-
-    # Load locations
-    locations = db.session.execute(text("""
-        SELECT id, name
-        FROM locations
-        ORDER BY name
-    """)).mappings().all()
-
-    # Load exams (using exam_locations table)
-    raw = db.session.execute(text("""
-        SELECT 
-            e.id AS exam_id,
-            e.exam_type,
-            e.exam_date,
-            u.name AS professor_name,
-            el.location_id,
-            el.capacity,
-            (
-                SELECT COUNT(*)
-                FROM registrations r
-                WHERE r.exam_id = e.id
-                AND r.location_id = el.location_id
-                AND r.status = 'Active'
-            ) AS used_seats
-        FROM exam_locations el
-        JOIN exams e ON el.exam_id = e.id
-        JOIN professors p ON e.professor_id = p.id
-        JOIN users u ON p.user_id = u.id
-        ORDER BY e.exam_date ASC
-    """)).mappings().all()
-
-    exams = []
-    for r in raw:
-        remaining = r["capacity"] - r["used_seats"]
-        if remaining > 0:
-            exams.append({
-                "exam_id": r["exam_id"],
-                "exam_type": r["exam_type"],
-                "exam_date": r["exam_date"].strftime("%Y-%m-%d"),
-                "professor_name": r["professor_name"],
-                "location_id": r["location_id"],
-                "remaining": remaining
-            })
+    schedule = get_schedule(current_user.id)
+    max_allowed = MAX_ACTIVE
+    active_count = schedule.active_count
+    remaining_slots = schedule.remaining_slots
+
+    # Locations, sessions and seat counts: one query, shared with the
+    # review POST and confirm-final (see project.loaders).
+    catalog = exam_catalog()
+    locations = catalog.locations
+    exams = catalog.available()
 
     # Build timeslots 8am–5pm
     timeslots = [
@@ -153,35 +128,30 @@ def student_exams():
             flash("Please complete all fields.", "error")
             return redirect(url_for("student_ui.student_exams"))
 
-        # Load exam + location info
-        exam_info = db.session.execute(text("""
-            SELECT 
-                e.exam_type AS exam_title,
-                e.exam_date,
-                u.name AS professor_name,
-
-                l.name AS campus,
-                b.name AS building,
-                l.room_number AS room
-            FROM exams e
-            JOIN professors p ON e.professor_id = p.id
-            JOIN users u ON p.user_id = u.id
-            JOIN locations l ON l.id = :loc
-            JOIN buildings b ON b.location_id = l.id
-            WHERE e.id = :eid
-        """), {"eid": exam_id, "loc": loc_id}).mappings().first()
+        timeslot_id = valid_timeslot(timeslot_id)
+        if timeslot_id is None:
+            flash(TIMESLOT_MESSAGE, "error")
+            return redirect(url_for("student_ui.student_exams"))
+
+        # Exam + location labels come from the catalog already loaded above.
+        exam_info = catalog.session(exam_id, loc_id)
 
         if not exam_info:
             flash("Could not load exam details.", "error")
             return redirect(url_for("student_ui.student_exams"))
 
+        if schedule.has_conflict(exam_info["exam_date"], timeslot_id,
+                                 ignore_reg_id=reschedule_old_id):
+            flash(TIME_CONFLICT_MESSAGE, "error")
+            return redirect(url_for("student_ui.student_exams"))
+
         start_time, end_time = get_timeslot_label(timeslot_id)
 
         info = {
-            "exam_title": exam_info["exam_title"],
+            "exam_title": exam_info["exam_type"],
             "exam_date": exam_info["exam_date"],
             "professor_name": exam_info["professor_name"],
-            "full_location": f"{exam_info['campus']} – {exam_info['building']}, Room {exam_info['room']}",
+            "full_location": exam_info["full_location"],
             "start_time": start_time,
             "end_time": end_time,
             "selected_exam": exam_id,
@@ -199,21 +169,100 @@ def student_exams():
         locations=locations,
         timeslots=timeslots,
         exam_dates=exam_dates,         # REQUIRED
+        busy_slots=schedule.busy_slots(ignore_reg_id=reschedule_old_id),
         reschedule_old_id=reschedule_old_id,
+        # live seat updates: SSE on async workers, polling otherwise
+        seat_stream=current_app.config["SEAT_STREAM"],
+        seat_poll_seconds=current_app.config["SEAT_POLL_SECONDS"],
         # helper data
         active_count=active_count,
         max_allowed=max_allowed,
         remaining_slots=remaining_slots,
     )
 
+
+# =====================================================================
+# LIVE SEAT AVAILABILITY (Server-Sent Events, or polling on sync workers)
+# =====================================================================
+SESSION_KEY_RE = re.compile(r"^\d+:\d+$")
+MAX_WATCHED_SESSIONS = 200
+
+
+def _watched_keys():
+    raw = (request.args.get("sessions") or "").split(",")
+    return {k for k in raw if SESSION_KEY_RE.match(k)}
+
+
+@student_ui.route("/exams/seats")
+@login_required
+def exam_seats():
+    """Remaining seats for ?sessions=<exam_id>:<location_id>,... as JSON.
+
+    The polling fallback for live seat updates when the stream is off
+    (sync workers); one indexed query, no connection held.
+    """
+    keys = _watched_keys()
+    if not keys or len(keys) > MAX_WATCHED_SESSIONS:
+        return Response("Pass 1 to 200 sessions.", status=400)
+    remaining = remaining_seats(tuple(map(int, k.split(":"))) for k in keys)
+    return {"seats": [
+        {"key": session_key(e, l), "exam_id": e, "location_id": l, "remaining": left}
+        for (e, l), left in remaining.items()
+    ]}
+
+
+@student_ui.route("/exams/stream")
+@login_required
+def exam_seat_stream():
+    """Push remaining-seat updates for the sessions the page is showing.
+
+    ?sessions=<exam_id>:<location_id>,... (omit for every session). The
+    connection is closed after SSE_MAX_SECONDS and EventSource reconnects
+    on its own. Only served when SEAT_STREAM is on (gevent workers); with
+    sync workers a 204 tells EventSource to stop, and pages poll
+    exam_seats instead.
+    """
+    if not current_app.config["SEAT_STREAM"]:
+        return Response(status=204)
+    keys = _watched_keys()
+    if len(keys) > MAX_WATCHED_SESSIONS:
+        return Response("Too many sessions.", status=400)
+
+    max_seconds = current_app.config["SSE_MAX_SECONDS"]
+    heartbeat = min(15, max_seconds)
+
+    def events():
+        sub = broker.subscribe(SEATS_CHANNEL, keys=keys or None)
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield "retry: 3000\n\n"
+            while time.monotonic() < deadline:
+                message = sub.get(timeout=heartbeat)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: seats\ndata: {json.dumps(message)}\n\n"
+        finally:
+            broker.unsubscribe(sub)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # =====================================================================
 # FINAL CONFIRM — Creates New Appointment (Normal or Reschedule)
 # =====================================================================
 @student_ui.route("/confirm-final", methods=["POST"])
 @login_required
+@idempotent
 def confirm_final():
 
     user_id = current_user.id
+    # Read before the booking commit expires current_user (saves a reload).
+    student_name, student_email = current_user.name, current_user.email
     exam_id = request.form.get("exam_id")
     timeslot_id = request.form.get("timeslot_id")
     location_id = request.form.get("location_id")
@@ -225,145 +274,103 @@ def confirm_final():
         flash("Missing appointment information.", "error")
         return redirect(url_for("student_ui.student_exams"))
 
+    timeslot_id = valid_timeslot(timeslot_id)
+    if timeslot_id is None:
+        flash(TIMESLOT_MESSAGE, "error")
+        return redirect(url_for("student_ui.student_exams"))
+
     # ==============================================================
     # BUSINESS RULE CHECKS
+    # (against the cached snapshot, for a quick answer; create_booking
+    # enforces the same rules in the database and has the final say)
     # ==============================================================
 
-    # 1) Max 3 active registrations per student (normal booking only)
-    active_row = db.session.execute(text("""
-        SELECT COUNT(*) AS cnt
-        FROM registrations
-        WHERE user_id = :uid
-          AND status = 'Active'
-    """), {"uid": user_id}).mappings().first()
+    schedule = get_schedule(user_id)
 
-    active_count = active_row["cnt"] if active_row and active_row["cnt"] is not None else 0
-
-    if not is_reschedule and active_count >= 3:
-        flash("You already have 3 active exam registrations. You cannot book more.", "error")
+    # 1) Max 3 active registrations per student (normal booking only)
+    if not is_reschedule and schedule.active_count >= MAX_ACTIVE:
+        flash(LIMIT_MESSAGE, "error")
         return redirect(url_for("student_ui.student_exams"))
 
     # 2) No duplicate bookings per exam (one active reservation per exam)
     #    For reschedule, ignore the existing row being replaced.
-    dup_params = {"uid": user_id, "eid": exam_id}
-
-    if is_reschedule and old_reg_id:
-        dup_sql = """
-            SELECT COUNT(*) AS cnt
-            FROM registrations
-            WHERE user_id = :uid
-              AND exam_id = :eid
-              AND status = 'Active'
-              AND id <> :old_id
-        """
-        dup_params["old_id"] = old_reg_id
-    else:
-        dup_sql = """
-            SELECT COUNT(*) AS cnt
-            FROM registrations
-            WHERE user_id = :uid
-              AND exam_id = :eid
-              AND status = 'Active'
-        """
-
-    dup_row = db.session.execute(text(dup_sql), dup_params).mappings().first()
-    dup_count = dup_row["cnt"] if dup_row and dup_row["cnt"] is not None else 0
-
-    if dup_count > 0:
-        flash("You already have an active reservation for this exam.", "error")
+    if schedule.has_active_booking_for(exam_id,
+                                       ignore_reg_id=old_reg_id if is_reschedule else None):
+        flash(DUPLICATE_MESSAGE, "error")
+        return redirect(url_for("student_ui.student_exams"))
+
+    exam_info = exam_catalog().session(exam_id, location_id)
+
+    # 3) No two exams in the same timeslot on the same day
+    if exam_info and schedule.has_conflict(
+        exam_info["exam_date"], timeslot_id, ignore_reg_id=old_reg_id if is_reschedule else None
+    ):
+        flash(TIME_CONFLICT_MESSAGE, "error")
         return redirect(url_for("student_ui.student_exams"))
 
     # ==============================================================
-    # GENERATE REGISTRATION ID
+    # EXAM DETAILS (email + schedule snapshot)
     # ==============================================================
 
-    row = db.session.execute(text("""
-        SELECT MAX(CAST(SUBSTRING(registration_id, 4) AS UNSIGNED)) AS max_num
-        FROM registrations
-        WHERE registration_id LIKE 'CSN%%'
-    """)).mappings().first()
-
-    new_reg_id = f"CSN{(row['max_num'] or 0) + 1:03d}"
+    start_time, end_time = get_timeslot_label(timeslot_id)
+    details = None
+    if exam_info:
+        details = {
+            "exam_type": exam_info["exam_type"],
+            "exam_date": exam_info["exam_date"],
+            "exam_time": start_time,
+            "course_code": exam_info["course_code"],
+            "professor_name": exam_info["professor_name"],
+            "full_location": exam_info["full_location"],
+        }
 
     # ==============================================================
     # WRITE TO DB (handle reschedule + insert) + COMMIT
     # ==============================================================
 
     try:
-        # If reschedule → cancel old *first*
-        if is_reschedule and old_reg_id:
-            db.session.execute(text("""
-                UPDATE registrations
-                SET status = 'Canceled'
-                WHERE id = :old
-            """), {"old": old_reg_id})
-            session.pop("reschedule_old_id", None)
-
-        # Insert new appointment
-        db.session.execute(text("""
-            INSERT INTO registrations
-                (registration_id, user_id, exam_id, timeslot_id, location_id, registration_date, status)
-            VALUES
-                (:rid, :u, :e, :t, :l, NOW(), 'Active')
-        """), {
-            "rid": new_reg_id,
-            "u": user_id,
-            "e": exam_id,
-            "t": timeslot_id,
-            "l": location_id
+        create_booking(
+            user_id, exam_id, location_id, timeslot_id,
+            details=details,
+            replaces=old_reg_id if is_reschedule else None,
+            actor_id=user_id,
+        )
+    except BookingRejected as rejected:
+        # The snapshot checks above passed on stale data; the database said no.
+        messages = {"limit": LIMIT_MESSAGE, "duplicate": DUPLICATE_MESSAGE,
+                    "canceled": CANCELED_MESSAGE, "conflict": TIME_CONFLICT_MESSAGE}
+        flash(messages.get(rejected.reason, "That exam is no longer available."), "error")
+        return redirect(url_for("student_ui.student_exams"))
+    except Exception:
+        log.exception("booking failed", extra={
+            "user_id": user_id, "exam_id": exam_id,
+            "location_id": location_id, "timeslot_id": timeslot_id,
         })
-
-        db.session.commit()
-
-    except Exception as e:
-        db.session.rollback()
-        print("ERROR inserting registration:", e)
         flash("Unexpected error creating appointment.", "error")
         return redirect(url_for("student_ui.student_exams"))
 
+    session.pop("reschedule_old_id", None)
+
     # ==========================
     # EMAIL CONFIRMATION
     # ==========================
-    exam_info = db.session.execute(text("""
-        SELECT 
-            e.exam_type AS exam_title,
-            e.exam_date,
-            u.name        AS professor_name,
-            l.name        AS campus,
-            b.name        AS building,
-            l.room_number AS room
-        FROM exams e
-        JOIN professors p ON e.professor_id = p.id
-        JOIN users u      ON p.user_id = u.id
-        JOIN locations l  ON l.id = :loc_id
-        JOIN buildings b  ON b.location_id = l.id
-        WHERE e.id = :exam_id
-    """), {"exam_id": exam_id, "loc_id": location_id}).mappings().first()
-
     if exam_info:
-        exam_date_str = exam_info["exam_date"].strftime("%Y-%m-%d")
-        start_time, end_time = get_timeslot_label(timeslot_id)
-        full_location = f"{exam_info['campus']} – {exam_info['building']}, Room {exam_info['room']}"
-
-        html_body = f"""
-            <p>Hi {current_user.name},</p>
-            <p>Your exam reservation is confirmed.</p>
-            <ul>
-              <li><strong>Exam:</strong> {exam_info['exam_title']}</li>
-              <li><strong>Date:</strong> {exam_date_str}</li>
-              <li><strong>Time:</strong> {start_time}–{end_time}</li>
-              <li><strong>Location:</strong> {full_location}</li>
-            </ul>
-            <p>If you need to cancel or reschedule, please log into the Exam Registration System.</p>
-        """
-
-        print("🔥 DEBUG: sending confirmation email to", current_user.email)
+        email = render("exam_confirmation", {
+            "student_name": student_name,
+            "exam_type": details["exam_type"],
+            "exam_date": details["exam_date"],
+            "start_time": start_time,
+            "end_time": end_time,
+            "full_location": details["full_location"],
+        })
 
+        log.info("sending confirmation email", extra={"user_id": user_id, "exam_id": exam_id})
 
         send_exam_confirmation(
-            to_email=current_user.email,
-            subject="CSN Exam Reservation Confirmation",
-            html_body=html_body,
+            to_email=student_email,
+            subject=email.subject,
+            html_body=email.html,
+            text_body=email.text,
         )
 
     flash("Your exam appointment has been scheduled!", "success")
@@ -375,13 +382,10 @@ def confirm_final():
 # =====================================================================
 @student_ui.route("/appointments/<int:reg_id>/cancel", methods=["POST"])
 @login_required
+@idempotent
 def cancel_appointment(reg_id):
 
-    reg = db.session.execute(text("""
-        SELECT id, user_id, status
-        FROM registrations
-        WHERE id = :rid
-    """), {"rid": reg_id}).mappings().first()
+    reg = queries.REGISTRATION.first(rid=reg_id)
 
     if not reg or reg["user_id"] != current_user.id:
         flash("Appointment not found.", "error")
@@ -391,12 +395,7 @@ def cancel_appointment(reg_id):
         flash("This appointment is already canceled.", "info")
         return redirect(url_for("student_ui.student_appointments"))
 
-    db.session.execute(text("""
-        UPDATE registrations
-        SET status='Canceled'
-        WHERE id = :rid
-    """), {"rid": reg_id})
-    db.session.commit()
+    cancel_booking(reg, actor_id=current_user.id)
 
     flash("Your appointment has been canceled.", "success")
     return redirect(url_for("student_ui.student_appointments"))
@@ -411,69 +410,17 @@ def student_appointments():
     # -------------------------------------------------------------
     # HELPER: active registration counts for this student
     # -------------------------------------------------------------
-    max_allowed = 3
-    row = db.session.execute(text("""
-        SELECT COUNT(*) AS cnt
-        FROM registrations
-        WHERE user_id = :sid
-          AND status = 'Active'
-    """), {"sid": current_user.id}).mappings().first()
-
-    active_count = row["cnt"] if row and row["cnt"] is not None else 0
-    remaining_slots = max_allowed - active_count
-    if remaining_slots < 0:
-        remaining_slots = 0
+    schedule = get_schedule(current_user.id)
+    max_allowed = MAX_ACTIVE
+    active_count = schedule.active_count
+    remaining_slots = schedule.remaining_slots
 
     q = (request.args.get("q") or "").strip()
     start = (request.args.get("start") or "").strip()
     end = (request.args.get("end") or "").strip()
 
-    filters = ""
-    params = {"sid": current_user.id}
-
-    if q:
-        filters += " AND (c.course_code LIKE :like OR e.exam_type LIKE :like)"
-        params["like"] = f"%{q}%"
-
-    if start:
-        filters += " AND e.exam_date >= :start"
-        params["start"] = start
-
-    if end:
-        filters += " AND e.exam_date <= :end"
-        params["end"] = end
-
-    rows = db.session.execute(text(f"""
-        SELECT 
-            r.id AS reg_id,
-            r.registration_id AS confirmation_code,
-            r.status,
-            e.exam_type,
-            e.exam_date,
-            ts.start_time AS exam_time,
-            c.course_code,
-            u.name AS professor_name,
-            l.name AS campus,
-            b.name AS building,
-            l.room_number AS room
-        FROM registrations r
-        JOIN exams e ON e.id = r.exam_id
-        JOIN timeslots ts ON ts.id = r.timeslot_id
-        JOIN courses c ON c.id = e.course_id
-        JOIN locations l ON l.id = r.location_id
-        JOIN buildings b ON b.location_id = l.id
-        JOIN professors p ON p.id = e.professor_id
-        JOIN users u ON u.id = p.user_id
-        WHERE r.user_id = :sid
-        {filters}
-        ORDER BY e.exam_date DESC
-    """), params).mappings().all()
-
-    bookings = []
-    for r in rows:
-        d = dict(r)
-        d["full_location"] = f"{d['campus']} – {d['building']}, Room {d['room']}"
-        bookings.append(d)
+    # Filters run over the cached snapshot instead of re-joining in SQL.
+    bookings = schedule.filtered(q=q, start=start, end=end)
 
     return render_template(
         "appointments.html",
@@ -0,0 +1,72 @@
+# project/templating.py
+"""Jinja performance setup: shared bytecode cache + {% cache %} fragments."""
+import os
+import tempfile
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from .cache import TTLCache, get_version
+
+# Rendered fragments for this worker, keyed by (name, *vary values).
+fragment_cache = TTLCache(default_ttl=300, max_entries=2048)
+
+# Upper bound on any fragment's TTL. The versions fragments are keyed on
+# are per-process counters kept in step by pub/sub messages (project.cache),
+# so a lost message must not leave a worker serving old markup for an hour.
+MAX_TTL = int(os.environ.get("FRAGMENT_CACHE_MAX_TTL", "60"))
+
+
+class FragmentCacheExtension(Extension):
+    """Cache the rendered output of a template block.
+
+    Usage::
+
+        {% cache "locations", 600, catalog_version %}
+            ...expensive markup...
+        {% endcache %}
+
+    The first argument names the fragment, the second is the TTL in
+    seconds (capped at MAX_TTL), and any further arguments are folded into
+    the cache key (user role, catalog version, ...). Never wrap markup that
+    contains per-user data such as CSRF tokens.
+    """
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render_cached", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, args, caller):
+        name, timeout, *vary = args
+        return fragment_cache.get_or_set((name, *vary), caller, ttl=min(timeout, MAX_TTL))
+
+
+def init_templating(app):
+    # Compiled templates are written to a directory every worker shares,
+    # so only the first worker after a deploy pays for compilation.
+    cache_dir = os.environ.get(
+        "JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ers-jinja-cache")
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Flask-WTF has already created app.jinja_env by now, so configure the
+    # live environment rather than app.jinja_options.
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+    @app.context_processor
+    def _cache_versions():
+        return {
+            "catalog_version": get_version("catalog"),
+            "refdata_version": get_version("refdata"),
+        }
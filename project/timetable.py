@@ -0,0 +1,304 @@
+# project/timetable.py
+"""Exam room timetabling: which room and timeslot each exam gets.
+
+An exam row carries one location/building, and its exam_locations rows
+are typed in by hand. Nothing stops two exams from landing in the same
+room at the same time, and nothing checks that the room fits the class.
+This module assigns rooms for a date range (typically finals week) in
+one pass:
+
+* every exam gets a timeslot on its own date and one or more rooms
+  whose seats cover its expected enrollment (exams.capacity, or the
+  bookings it already has if that is more);
+* no room holds two exams in the same (date, timeslot);
+* no professor has two exams in the same (date, timeslot);
+* as few seats as possible are left empty, so utilization is maximized.
+
+``solve()`` is pure and needs no database. It places the largest exams
+first, each in its best-fitting free room (several rooms only when no
+single room is big enough), with the least-loaded timeslot breaking
+ties. Local search then repeats until nothing improves or the time
+budget runs out. One move relocates an exam to a tighter room. Another
+evicts a smaller exam from a tighter room and places that exam
+elsewhere. A third does the same for exams that could not be placed at
+all. A finals week of several hundred exams takes well under a second
+(tools/bench_timetable.py).
+
+``load()`` reads the problem for a date range from the database. Exams
+that already have registrations are fixed: they keep their room and
+timeslot and only block them for the others. ``provision()`` writes a
+solution in one transaction, with one executemany per table. It sets the
+exam rows and replaces the exams' exam_locations sessions and their
+zero booking_rollups rows, then publishes the seat change. Run it as
+`flask timetable --start ... --end ... [--apply]`.
+"""
+import datetime
+import time
+from collections import namedtuple
+
+from . import db, queries
+from .refdata import refdata
+
+ExamDemand = namedtuple("ExamDemand", "exam_id exam_date enrollment professor_id")
+Room = namedtuple("Room", "location_id seats")
+Placement = namedtuple("Placement", "exam_date timeslot_id rooms seats")   # rooms: location ids
+
+
+class Timetable:
+    """A solution: placements by exam id plus the exams that did not fit."""
+
+    def __init__(self, exams, placements, unplaced, elapsed):
+        self.exams = {e.exam_id: e for e in exams}
+        self.placements = placements
+        self.unplaced = unplaced
+        self.elapsed = elapsed
+
+    @property
+    def seats(self):
+        return sum(p.seats for p in self.placements.values())
+
+    @property
+    def enrollment(self):
+        return sum(self.exams[e].enrollment for e in self.placements)
+
+    @property
+    def utilization(self):
+        return round(100.0 * self.enrollment / self.seats, 1) if self.seats else None
+
+    def conflicts(self):
+        """(date, timeslot, room or professor) keys used twice; [] when valid."""
+        seen, clashes = set(), []
+        for exam_id, p in self.placements.items():
+            keys = [("room", r) for r in p.rooms]
+            prof = self.exams[exam_id].professor_id
+            if prof:
+                keys.append(("professor", prof))
+            for kind, who in keys:
+                key = (p.exam_date, p.timeslot_id, kind, who)
+                if key in seen:
+                    clashes.append(key)
+                seen.add(key)
+        return clashes
+
+
+class _Solver:
+    def __init__(self, exams, rooms, timeslots, fixed):
+        self.exams = {e.exam_id: e for e in exams}
+        self.rooms = sorted(rooms, key=lambda r: (r.seats, r.location_id))
+        self.timeslots = list(timeslots)
+        self.rooms_used = {}     # (date, timeslot) -> {location_id: exam_id}
+        self.professors = {}     # (date, timeslot) -> {professor_id}
+        self.placements = {}
+        for exam_date, timeslot_id, location_id, professor_id in fixed:
+            key = (exam_date, timeslot_id)
+            self.rooms_used.setdefault(key, {})[location_id] = None   # None: not ours to move
+            if professor_id:
+                self.professors.setdefault(key, set()).add(professor_id)
+
+    def _need(self, exam):
+        return max(exam.enrollment, 1)
+
+    def _rooms_for(self, need, used):
+        """Best-fitting free rooms for ``need`` seats in one slot, or None."""
+        free = [r for r in self.rooms if r.location_id not in used]
+        for room in free:                      # smallest room that fits
+            if room.seats >= need:
+                return (room.location_id,), room.seats
+        picked, seats = [], 0
+        for room in reversed(free):            # else the biggest rooms until covered
+            picked.append(room.location_id)
+            seats += room.seats
+            if seats >= need:
+                return tuple(picked), seats
+        return None
+
+    def options(self, exam):
+        """Placements for ``exam`` in the current state, best first."""
+        need = self._need(exam)
+        found = []
+        for timeslot_id in self.timeslots:
+            key = (exam.exam_date, timeslot_id)
+            if exam.professor_id and exam.professor_id in self.professors.get(key, ()):
+                continue
+            used = self.rooms_used.get(key, {})
+            fit = self._rooms_for(need, used)
+            if fit:
+                rooms, seats = fit
+                found.append(((seats, len(rooms), len(used), timeslot_id),
+                              Placement(exam.exam_date, timeslot_id, rooms, seats)))
+        found.sort(key=lambda item: item[0])
+        return [p for _, p in found]
+
+    def place(self, exam_id, placement):
+        key = (placement.exam_date, placement.timeslot_id)
+        used = self.rooms_used.setdefault(key, {})
+        for location_id in placement.rooms:
+            used[location_id] = exam_id
+        professor_id = self.exams[exam_id].professor_id
+        if professor_id:
+            self.professors.setdefault(key, set()).add(professor_id)
+        self.placements[exam_id] = placement
+
+    def remove(self, exam_id):
+        placement = self.placements.pop(exam_id)
+        key = (placement.exam_date, placement.timeslot_id)
+        for location_id in placement.rooms:
+            del self.rooms_used[key][location_id]
+        professor_id = self.exams[exam_id].professor_id
+        if professor_id:
+            self.professors[key].discard(professor_id)
+        return placement
+
+    def greedy(self):
+        order = sorted(self.exams.values(), key=lambda e: (-e.enrollment, e.exam_date, e.exam_id))
+        for exam in order:
+            options = self.options(exam)
+            if options:
+                self.place(exam.exam_id, options[0])
+
+    def _relocate(self, exam_id):
+        """Move an exam to a tighter placement if one is free."""
+        old = self.remove(exam_id)
+        best = self.options(self.exams[exam_id])[0]
+        if best.seats < old.seats:
+            self.place(exam_id, best)
+            return True
+        self.place(exam_id, old)
+        return False
+
+    def _evict(self, exam_id):
+        """Take a tighter room from a smaller exam and re-place that exam.
+
+        With ``exam_id`` unplaced, any successful eviction is a gain;
+        otherwise the pair must end up using fewer seats than before.
+        """
+        exam = self.exams[exam_id]
+        need = self._need(exam)
+        old = self.placements.get(exam_id)
+        if old is not None:
+            self.remove(exam_id)
+        limit = old.seats if old is not None else None
+
+        for timeslot_id in self.timeslots:
+            key = (exam.exam_date, timeslot_id)
+            used = self.rooms_used.get(key, {})
+            if exam.professor_id and exam.professor_id in self.professors.get(key, ()):
+                continue
+            for room in self.rooms:
+                if room.seats < need or (limit is not None and room.seats >= limit):
+                    continue
+                other_id = used.get(room.location_id)
+                if other_id is None:
+                    continue   # free rooms were already tried; fixed exams stay put
+                other_old = self.placements[other_id]
+                if len(other_old.rooms) != 1:
+                    continue
+                self.remove(other_id)
+                mine = Placement(exam.exam_date, timeslot_id, (room.location_id,), room.seats)
+                self.place(exam_id, mine)
+                options = self.options(self.exams[other_id])
+                if options and (limit is None
+                                or mine.seats + options[0].seats < limit + other_old.seats):
+                    self.place(other_id, options[0])
+                    return True
+                self.remove(exam_id)
+                self.place(other_id, other_old)
+
+        if old is not None:
+            self.place(exam_id, old)
+        return False
+
+    def improve(self, deadline):
+        improved = True
+        while improved and time.monotonic() < deadline:
+            improved = False
+            unplaced = [e for e in self.exams if e not in self.placements]
+            for exam_id in sorted(unplaced, key=lambda e: -self.exams[e].enrollment):
+                options = self.options(self.exams[exam_id])
+                if options:
+                    self.place(exam_id, options[0])
+                    improved = True
+                elif self._evict(exam_id):
+                    improved = True
+                if time.monotonic() >= deadline:
+                    return
+            # Most wasteful placements first.
+            by_waste = sorted(self.placements,
+                              key=lambda e: self.exams[e].enrollment - self.placements[e].seats)
+            for exam_id in by_waste:
+                if self._relocate(exam_id) or self._evict(exam_id):
+                    improved = True
+                if time.monotonic() >= deadline:
+                    return
+
+
+def solve(exams, rooms, timeslots, fixed=(), seconds=5.0, local_search=True):
+    """Assign rooms and timeslots; returns a Timetable.
+
+    ``exams`` are ExamDemand, ``rooms`` Room, ``timeslots`` the ids
+    available every day, and ``fixed`` (date, timeslot_id, location_id,
+    professor_id) bookings the solution must work around.
+    """
+    started = time.monotonic()
+    solver = _Solver(exams, rooms, timeslots, fixed)
+    solver.greedy()
+    if local_search:
+        solver.improve(started + seconds)
+    unplaced = sorted(e for e in solver.exams if e not in solver.placements)
+    return Timetable(exams, solver.placements, unplaced, time.monotonic() - started)
+
+
+def load(start, end):
+    """(exams, rooms, timeslots, fixed) for exams dated start..end."""
+    ref = refdata()
+    rooms = [Room(loc.id, ref.seat_limit(loc.id)) for loc in ref.locations]
+    timeslots = [r["id"] for r in queries.TIMETABLE_SLOTS.all()]
+
+    exams, fixed = [], []
+    for r in queries.TIMETABLE_EXAMS.all(start=start, end=end):
+        exam_date = r["exam_date"]
+        if not isinstance(exam_date, datetime.date):
+            exam_date = datetime.date.fromisoformat(str(exam_date)[:10])
+        if r["registrations"]:
+            if r["timeslot_id"]:
+                fixed.append((exam_date, r["timeslot_id"], r["location_id"], r["professor_id"]))
+            continue
+        exams.append(ExamDemand(r["id"], exam_date, max(r["capacity"] or 0, r["registrations"]),
+                                r["professor_id"]))
+    return exams, rooms, timeslots, fixed
+
+
+def provision(timetable):
+    """Write a Timetable's placements; returns how many exams were written."""
+    from .seats import seats_changed
+
+    if not timetable.placements:
+        return 0
+    ref = refdata()
+    start_times = {r["id"]: r["start_time"] for r in queries.TIMETABLE_SLOTS.all()}
+
+    exam_rows, session_rows = [], []
+    for exam_id, p in sorted(timetable.placements.items()):
+        first = p.rooms[0]
+        buildings = ref.buildings_by_location.get(first)
+        exam_rows.append({
+            "e": exam_id, "l": first, "b": buildings[0].id if buildings else None,
+            "t": p.timeslot_id, "start": start_times.get(p.timeslot_id),
+        })
+        session_rows.extend({"e": exam_id, "l": location_id,
+                             "capacity": ref.seat_limit(location_id)}
+                            for location_id in p.rooms)
+    ids = [row["e"] for row in exam_rows]
+
+    try:
+        queries.PROVISION_EXAMS.execute(exam_rows)
+        queries.DELETE_EXAM_SESSIONS.execute(ids=ids)
+        queries.INSERT_EXAM_SESSIONS.execute(session_rows)
+        queries.DELETE_EXAM_ROLLUPS.execute(ids=ids)
+        queries.INSERT_EXAM_ROLLUPS.execute(ids=ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    seats_changed([(row["e"], row["l"]) for row in session_rows])
+    return len(exam_rows)
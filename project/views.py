@@ -1,8 +1,7 @@
-print(">>> LOADED: views.py blueprint <<<")
-
-from flask import Blueprint, render_template, jsonify, current_app, redirect, url_for, request, flash, send_from_directory
+from flask import (Blueprint, abort, render_template, jsonify, current_app, redirect, url_for,
+                   request, send_from_directory)
 from flask_login import login_required, current_user
-from . import db
+from . import db, login_manager
 from sqlalchemy import text
 import os
 import time
@@ -32,7 +31,7 @@ def favicon():
 # @login_required  # remove this for now if you haven't wired login_user yet
 def dashboard():
     # If you have roles on the user, you can pass them to the template:
-    role_name = getattr(getattr(current_user, 'role', None), 'name', None)
+    role_name = getattr(current_user, 'role_name', None)
     return render_template('dashboard.html', role=role_name)
 
 @bp.route('/test-db')
@@ -63,6 +62,20 @@ def debug_index():
         return jsonify({'error': str(e)})
 
 
+@bp.route('/__query_stats')
+def query_stats():
+    # Per-query call counts and timings for this worker (see project.queries).
+    # Diagnostics only: exposed when SERVER_TIMING is on, and to admins only.
+    if not current_app.config.get("SERVER_TIMING"):
+        return jsonify({'error': 'not found'}), 404
+    if not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    if current_user.role_name != "admin":
+        abort(403)
+    from .queries import stats
+    return jsonify(stats())
+
+
 @bp.route('/__alive')
 def alive():
     # Simple alive endpoint with timestamp so the client can verify the server is running this code
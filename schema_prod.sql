@@ -63,7 +63,8 @@ CREATE TABLE IF NOT EXISTS professors (
 CREATE TABLE IF NOT EXISTS locations (
     id          INT AUTO_INCREMENT PRIMARY KEY,
     name        VARCHAR(100) NOT NULL,   -- Campus (North Las Vegas, etc.)
-    room_number VARCHAR(50)  NOT NULL    -- Testing center room
+    room_number VARCHAR(50)  NOT NULL,   -- Testing center room
+    max_seats   INT NULL                 -- room limit for exam capacity (NULL = app default)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- 7. Buildings (per campus)
@@ -119,7 +120,7 @@ CREATE TABLE IF NOT EXISTS registrations (
     location_id       INT,
     registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     status            ENUM('Active','Canceled') DEFAULT 'Active',
-    UNIQUE(exam_id, user_id),
+    UNIQUE KEY uq_registrations_exam_user (exam_id, user_id),
     FOREIGN KEY (exam_id) REFERENCES exams(id)  ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users(id)  ON DELETE CASCADE
     -- (timeslot_id/location_id left without FK on purpose for flexibility)
@@ -149,13 +150,100 @@ CREATE TABLE IF NOT EXISTS authentication (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 
+-- 14. Registrations archive (past terms, moved out by `flask archive-registrations`)
+CREATE TABLE IF NOT EXISTS registrations_archive (
+    id                INT PRIMARY KEY,       -- original registrations.id
+    registration_id   VARCHAR(10),
+    exam_id           INT NOT NULL,
+    user_id           INT NOT NULL,
+    timeslot_id       INT,
+    location_id       INT,
+    registration_date TIMESTAMP NULL,
+    status            ENUM('Active','Canceled'),
+    archived_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_reg_archive_user   (user_id),
+    KEY ix_reg_archive_exam   (exam_id),
+    KEY ix_reg_archive_regid  (registration_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 15. Exam-day check-ins (written in bulk by the room kiosk)
+CREATE TABLE IF NOT EXISTS checkins (
+    registration_id   INT PRIMARY KEY,       -- registrations.id
+    location_id       INT NOT NULL,
+    exam_date         DATE NOT NULL,
+    checked_in_at     DATETIME NOT NULL,
+    checked_in_by     INT,                   -- users.id of the proctor
+    KEY ix_checkins_location_date (location_id, exam_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 16. Exam reminders + faculty notices queue (drained by `flask send-reminders`)
+CREATE TABLE IF NOT EXISTS reminders (
+    id                INT AUTO_INCREMENT PRIMARY KEY,
+    registration_id   INT NOT NULL,          -- registrations.id
+    kind              VARCHAR(8) NOT NULL,   -- '24h', '1h', 'canceled', 'moved'
+    exam_date         DATE NOT NULL,
+    status            ENUM('Queued','Sending','Sent','Failed','Skipped') NOT NULL DEFAULT 'Queued',
+    attempts          INT NOT NULL DEFAULT 0,
+    created_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at           DATETIME NULL,
+    claimed_by        VARCHAR(32) NULL,      -- send run holding a 'Sending' row
+    claimed_at        DATETIME NULL,
+    UNIQUE KEY uq_reminders_reg_kind (registration_id, kind),
+    KEY ix_reminders_status_id (status, id),
+    KEY ix_reminders_exam_date (exam_date),
+    KEY ix_reminders_claimed_by (claimed_by)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 17. Booking rollups for the capacity dashboard (`flask rollups-rebuild` fills them)
+CREATE TABLE IF NOT EXISTS booking_rollups (
+    exam_id           INT NOT NULL,
+    location_id       INT NOT NULL,
+    timeslot_id       INT NOT NULL,          -- 0 = no timeslot
+    exam_date         DATE NOT NULL,
+    capacity          INT NOT NULL DEFAULT 0,
+    bookings          INT NOT NULL DEFAULT 0,
+    cancellations     INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (exam_id, location_id, timeslot_id),
+    KEY ix_booking_rollups_date (exam_date, location_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 18. Append-only booking event log (`flask booking-events-replay` rebuilds counts from it)
+CREATE TABLE IF NOT EXISTS booking_events (
+    id                INT AUTO_INCREMENT PRIMARY KEY,
+    registration_id   INT NOT NULL,          -- registrations.id
+    user_id           INT NOT NULL,          -- the student
+    exam_id           INT NOT NULL,
+    location_id       INT NULL,
+    timeslot_id       INT NULL,
+    from_location_id  INT NULL,              -- 'moved' only
+    from_timeslot_id  INT NULL,
+    kind              VARCHAR(10) NOT NULL,  -- 'booked', 'canceled', 'moved'
+    actor_id          INT NULL,              -- users.id who made the change
+    created_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_booking_events_user (user_id, id),
+    KEY ix_booking_events_session (exam_id, location_id, id),
+    KEY ix_booking_events_registration (registration_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 19. Server-side sessions: the cookie carries only the id (project.sessions)
+CREATE TABLE IF NOT EXISTS web_sessions (
+    id          VARCHAR(43) CHARACTER SET ascii COLLATE ascii_bin NOT NULL PRIMARY KEY,  -- case-sensitive
+    data        BLOB NOT NULL,               -- tagged JSON, zlib'd when large
+    expires_at  INT NOT NULL,                -- epoch seconds
+    KEY ix_web_sessions_expires (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+
 -- ---------------------------------------------------------
 -- INDEXES
 -- ---------------------------------------------------------
-CREATE INDEX ix_exams_date_time   ON exams (exam_date, exam_time);
-CREATE INDEX ix_reg_user_status   ON registrations (user_id, status);
-CREATE INDEX ix_reg_exam_status   ON registrations (exam_id, status);
-CREATE INDEX ix_reg_regid         ON registrations (registration_id);
+CREATE INDEX ix_exams_date_time       ON exams (exam_date, exam_time);
+CREATE INDEX ix_exams_date_id         ON exams (exam_date, id);                          -- keyset paging
+CREATE INDEX ix_buildings_location    ON buildings (location_id);
+CREATE INDEX ix_reg_exam_loc_status   ON registrations (exam_id, location_id, status);   -- seat counts
+CREATE INDEX ix_reg_user_status_exam  ON registrations (user_id, status, exam_id);       -- limit/duplicate checks
+CREATE INDEX ix_reg_exam_status       ON registrations (exam_id, status);
+CREATE INDEX ix_reg_regid             ON registrations (registration_id);
 
 
 -- =========================================================
@@ -233,6 +321,12 @@ SELECT * FROM (
 ) AS r(name)
 WHERE NOT EXISTS (SELECT 1 FROM roles);
 
+-- Admin role for /admin (databases seeded before it existed get it here too).
+-- Promote an account with `flask grant-admin EMAIL`.
+INSERT INTO roles (name)
+SELECT 'admin' FROM DUAL
+WHERE NOT EXISTS (SELECT 1 FROM roles WHERE name = 'admin');
+
 -- DEPARTMENTS
 INSERT INTO departments (name)
 SELECT * FROM (
@@ -0,0 +1,97 @@
+"""Benchmark the admin lists and CSV export at production-like user counts.
+
+Seeds a throwaway SQLite database (tools/devdb.py) with N students, logs
+in as the seeded admin, and times GET /admin/users at the first page, the
+middle, the last page and with an email-prefix filter. For comparison it
+also times the same page read with LIMIT/OFFSET, which is what keyset
+paging avoids. Finally it streams GET /admin/users/export.csv and checks
+the row count.
+
+    python tools/bench_admin.py
+    python tools/bench_admin.py --students 200000 --requests 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from devdb import ADMIN_EMAIL, login, make_app, seed  # noqa: E402
+
+
+def _time(fn, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", type=int, default=100000)
+    ap.add_argument("--requests", type=int, default=30)
+    args = ap.parse_args()
+
+    from sqlalchemy import text
+
+    from project import db
+    from project.admin import PAGE_SIZE
+
+    app = make_app(os.path.join(tempfile.gettempdir(), "ers-admin.db"))
+    t0 = time.perf_counter()
+    seed(app, students=args.students, exams_per_term=40, bookings_per_student=0)
+    print(f"seeded {args.students} students in {time.perf_counter() - t0:.1f}s\n")
+    client = login(app, ADMIN_EMAIL)
+
+    with app.app_context():
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        ids = db.session.execute(text("SELECT id FROM users ORDER BY id")).scalars().all()
+    middle, last = ids[len(ids) // 2], ids[-PAGE_SIZE - 1]
+
+    def get(url):
+        def fn():
+            resp = client.get(url)
+            assert resp.status_code == 200, (url, resp.status_code)
+        return fn
+
+    def offset(position):
+        def fn():
+            with app.app_context():
+                db.session.execute(text(
+                    "SELECT id, name, email, phone, nshe_id, employee_id, role_id, department_id, "
+                    "major_id, status FROM users ORDER BY id LIMIT :n OFFSET :o"),
+                    {"n": PAGE_SIZE + 1, "o": position}).all()
+        return fn
+
+    cases = [
+        ("keyset first page", get("/admin/users")),
+        ("keyset middle page", get(f"/admin/users?after={middle}")),
+        ("keyset last page", get(f"/admin/users?after={last}")),
+        ("keyset email prefix", get("/admin/users?email=00000999")),
+        ("OFFSET first page (SQL only)", offset(0)),
+        ("OFFSET middle page (SQL only)", offset(len(ids) // 2)),
+        ("OFFSET last page (SQL only)", offset(len(ids) - PAGE_SIZE - 1)),
+    ]
+    print(f"{'':<32}{'median ms':>10}{'max ms':>10}")
+    for label, fn in cases:
+        median, worst = _time(fn, args.requests)
+        print(f"{label:<32}{median:>10.2f}{worst:>10.2f}")
+
+    t0 = time.perf_counter()
+    resp = client.get("/admin/users/export.csv")
+    lines = sum(chunk.count(b"\n") for chunk in resp.response)
+    elapsed = time.perf_counter() - t0
+    print(f"\nexport.csv: {lines - 1} rows in {elapsed:.2f}s")
+    if lines - 1 != len(ids):
+        raise SystemExit(f"export returned {lines - 1} rows, expected {len(ids)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Show that archiving past terms keeps the hot paths flat.
+
+Builds a throwaway SQLite database (tools/devdb.py) with one current term
+and N past terms, then times the registration hot paths three times:
+
+  baseline   current term only
+  history    current term + past terms, all still in `registrations`
+  archived   same data after `archive_registrations(today)`
+
+Hot paths:
+  exams         GET  /student/exams         (seat counts per session)
+  appointments  GET  /student/appointments  (schedule snapshot reload forced)
+  search        POST /faculty/search_appointments
+
+The exams page still lists every exam row (past terms included), so part
+of its "history" cost remains after archiving; the seat-count part goes.
+
+Usage:
+    python tools/bench_archive.py
+    python tools/bench_archive.py --students 1000 --history-terms 8 --requests 200
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from devdb import ROOT, login, make_app, seed, student_email  # noqa: E402,F401
+
+
+def _time(fn, n):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        resp = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert resp.status_code == 200, resp.status_code
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def measure(app, n):
+    from project import schedule
+
+    student = login(app, student_email(1))
+    faculty = login(app, "prof.100001@csn.edu")
+    uid = 101
+
+    def appointments():
+        schedule._snapshots.delete(uid)
+        return student.get("/student/appointments")
+
+    return {
+        "exams": _time(lambda: student.get("/student/exams"), n),
+        "appointments": _time(appointments, n),
+        "search": _time(lambda: faculty.post(
+            "/faculty/search_appointments", data={"search_term": "Student 1"}), n),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", type=int, default=500)
+    ap.add_argument("--history-terms", type=int, default=6)
+    ap.add_argument("--requests", type=int, default=100)
+    args = ap.parse_args()
+
+    db_path = os.path.join(tempfile.gettempdir(), "ers-bench-archive.db")
+    results = {}
+
+    app = make_app(db_path)
+    seed(app, students=args.students)
+    results["baseline"] = measure(app, args.requests)
+
+    app = make_app(db_path)
+    info = seed(app, students=args.students, history_terms=args.history_terms)
+    results["history"] = measure(app, args.requests)
+
+    from project import db
+    from project.archive import archive_registrations
+
+    with app.app_context():
+        moved = archive_registrations(datetime.date.today())
+        remaining = db.session.execute(db.text("SELECT COUNT(*) FROM registrations")).scalar()
+    results["archived"] = measure(app, args.requests)
+
+    print(f"{info['registrations']} registrations seeded, {moved} archived, "
+          f"{remaining} left live\n")
+    print(f"{'phase':<10}" + "".join(f"{name + ' p50/p95 ms':>28}" for name in results["baseline"]))
+    for phase, paths in results.items():
+        print(f"{phase:<10}"
+              + "".join(f"{p50:>18.2f} / {p95:<7.2f}" for p50, p95 in paths.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Compare sync vs gevent gunicorn throughput on the catalog and booking flows.
+
+Starts gunicorn once per mode against the database given with
+--database-url, logs a student in on every client thread, and hammers:
+
+  catalog  GET  /student/exams
+  booking  POST /student/exams (review) + POST /student/confirm-final
+
+The booking flow hits the real business-rule checks; once a student has
+three active registrations it keeps exercising the rejection path, which
+is the same queries.
+
+The booking flow writes registrations, so the database is never taken
+from the environment: pass a throwaway one explicitly (a scratch MySQL
+schema loaded from schema_prod.sql). Against an already running server
+(--base-url) the booking flow needs --allow-writes. Only the standard
+library is used for HTTP.
+
+Usage:
+    python tools/bench_concurrency.py --database-url mysql+pymysql://root@127.0.0.1/ers_bench \
+        --email 1234567890@student.csn.edu --password 1234567890 --exam-id 1 --location-id 1
+    python tools/bench_concurrency.py ... --modes gevent --clients 50 --seconds 20
+    # against a server that is already running:
+    python tools/bench_concurrency.py ... --base-url http://127.0.0.1:8000 --allow-writes
+"""
+import argparse
+import http.cookiejar
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSRF_RE = re.compile(r'name="csrf_token" value="([^"]+)"')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # hand 3xx back to the caller, like allow_redirects=False
+
+
+class Client:
+    """One browser-like session: keeps cookies, never follows redirects."""
+
+    def __init__(self, base):
+        self.base = base
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect
+        )
+
+    def request(self, path, data=None, timeout=30):
+        """(status, body text); ``data`` makes it a form POST."""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self._opener.open(self.base + path, body, timeout=timeout) as resp:
+                return resp.status, resp.read().decode("utf-8", "replace")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8", "replace")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(mode, workers, database_url):
+    port = _free_port()
+    env = {**os.environ, "GUNICORN_WORKER_CLASS": mode, "DATABASE_URL": database_url}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app",
+         "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(base + "/__alive", timeout=0.5).close()
+            return proc, base
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit(f"gunicorn ({mode}) did not start")
+
+
+def _login(base, email, password):
+    s = Client(base)
+    token = CSRF_RE.search(s.request("/login")[1])
+    data = {"email": email, "password": password}
+    if token:
+        data["csrf_token"] = token.group(1)
+    s.request("/login", data)
+    return s
+
+
+def _catalog(s, args):
+    status, _ = s.request("/student/exams")
+    return status == 200
+
+
+def _booking(s, args):
+    _, page = s.request("/student/exams")
+    token = CSRF_RE.search(page)
+    form = {
+        "exam_id": args.exam_id,
+        "location_id": args.location_id,
+        "timeslot_id": args.timeslot_id,
+    }
+    if token:
+        form["csrf_token"] = token.group(1)
+    _, review = s.request("/student/exams", form)
+    token = CSRF_RE.search(review)
+    if token:
+        form["csrf_token"] = token.group(1)
+    status, _ = s.request("/student/confirm-final", form)
+    return status in (200, 302)
+
+
+FLOWS = {"catalog": _catalog, "booking": _booking}
+
+
+def _run_flow(base, flow, args):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def client():
+        nonlocal errors
+        s = _login(base, args.email, args.password)
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                ok = FLOWS[flow](s, args)
+            except OSError:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                errors += 0 if ok else 1
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "requests": n,
+        "rps": n / args.seconds,
+        "p50": latencies[n // 2] * 1000 if n else 0,
+        "p95": latencies[int(n * 0.95)] * 1000 if n else 0,
+        "mean": statistics.mean(latencies) * 1000 if n else 0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--exam-id", type=int, default=1)
+    parser.add_argument("--location-id", type=int, default=1)
+    parser.add_argument("--timeslot-id", type=int, default=1)
+    parser.add_argument("--modes", default="sync,gevent")
+    parser.add_argument("--flows", default="catalog,booking")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--database-url",
+                        help="throwaway database for the started servers "
+                             "(required; the booking flow writes)")
+    parser.add_argument("--base-url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--allow-writes", action="store_true",
+                        help="with --base-url: the server's database is a throwaway, "
+                             "run the booking flow")
+    args = parser.parse_args()
+
+    if args.base_url:
+        if "booking" in args.flows.split(",") and not args.allow_writes:
+            parser.error("the booking flow writes registrations; pass --allow-writes if the server "
+                         "at --base-url uses a throwaway database, or --flows catalog")
+    elif not args.database_url:
+        parser.error("--database-url is required: the booking flow writes registrations, so the "
+                     "benchmark never uses the DATABASE_URL of this environment")
+
+    print(f"{'mode':8s} {'flow':8s} {'req':>7s} {'req/s':>8s} {'p50 ms':>8s} "
+          f"{'p95 ms':>8s} {'errors':>7s}")
+    for mode in ([None] if args.base_url else args.modes.split(",")):
+        proc, base = ((None, args.base_url) if args.base_url
+                      else _start_server(mode, args.workers, args.database_url))
+        try:
+            for flow in args.flows.split(","):
+                r = _run_flow(base, flow, args)
+                print(f"{mode or 'running':8s} {flow:8s} {r['requests']:7d} {r['rps']:8.1f} "
+                      f"{r['p50']:8.1f} {r['p95']:8.1f} {r['errors']:7d}")
+        finally:
+            if proc:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark the exam room timetabler (project/timetable.py).
+
+Part 1 generates a synthetic finals week: N exams over D days, with
+enrollments from small seminars to large lectures, R rooms of mixed
+sizes, 9 timeslots a day, and professors teaching several sections each.
+It solves this twice, greedy only and greedy plus local search, and
+reports exams placed, seat utilization, time taken, and a conflict check.
+
+Part 2 seeds a throwaway SQLite database (tools/devdb.py) with unbooked
+exams, then times load() + solve() + provision(). It also checks that
+the written exam_locations rows match the solution.
+
+    python tools/bench_timetable.py
+    python tools/bench_timetable.py --exams 800 --rooms 30 --days 5 --seed 4
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from devdb import make_app, seed  # noqa: E402
+
+ROOM_SIZES = (20, 24, 30, 40, 40, 60, 60, 80, 120, 200)
+ENROLLMENTS = ((8, 25), (20, 45), (40, 90), (80, 180), (150, 320))
+ENROLLMENT_WEIGHTS = (30, 35, 20, 10, 5)
+
+
+def synthetic(exams, rooms, days, seed_):
+    from project.timetable import ExamDemand, Room
+
+    rng = random.Random(seed_)
+    first = datetime.date(2026, 12, 14)
+    room_list = [Room(i, rng.choice(ROOM_SIZES)) for i in range(1, rooms + 1)]
+    professors = max(exams // 3, 1)
+    exam_list = []
+    for i in range(1, exams + 1):
+        low, high = rng.choices(ENROLLMENTS, ENROLLMENT_WEIGHTS)[0]
+        exam_list.append(ExamDemand(i, first + datetime.timedelta(days=rng.randrange(days)),
+                                    rng.randint(low, high), rng.randint(1, professors)))
+    return exam_list, room_list, list(range(1, 10))
+
+
+def report(label, timetable, exams):
+    conflicts = timetable.conflicts()
+    over = [e for e, p in timetable.placements.items() if p.seats < timetable.exams[e].enrollment]
+    print(f"{label:<22}{len(timetable.placements):>5}/{len(exams):<5} placed   "
+          f"utilization {timetable.utilization:>5}%   seats {timetable.seats:>6}   "
+          f"{timetable.elapsed * 1000:>8.1f} ms   "
+          f"conflicts {len(conflicts)}   undersized {len(over)}")
+    return len(conflicts) + len(over)
+
+
+def provision_bench(exams, locations):
+    from sqlalchemy import text
+
+    from project import db
+    from project.timetable import load, provision, solve
+
+    app = make_app(os.path.join(tempfile.gettempdir(), "ers-timetable.db"))
+    seed(app, students=10, exams_per_term=exams, locations=locations, bookings_per_student=0)
+    today = datetime.date.today()
+    with app.app_context():
+        t0 = time.perf_counter()
+        problem = load(today, today + datetime.timedelta(days=120))
+        t1 = time.perf_counter()
+        timetable = solve(*problem, seconds=5)
+        t2 = time.perf_counter()
+        written = provision(timetable)
+        t3 = time.perf_counter()
+
+        rows = db.session.execute(text("SELECT exam_id, location_id FROM exam_locations")).all()
+        want = {(e, loc) for e, p in timetable.placements.items() for loc in p.rooms}
+        ok = want <= set(map(tuple, rows)) and len(rows) == len(want) + sum(
+            1 for e in problem[0] if e.exam_id in timetable.unplaced for _ in range(locations))
+
+    print(f"\ndatabase: {len(problem[0])} exams, {locations} rooms -> {written} provisioned, "
+          f"{len(timetable.unplaced)} unplaced")
+    print(f"  load {1000 * (t1 - t0):.1f} ms   solve {1000 * (t2 - t1):.1f} ms   "
+          f"provision {1000 * (t3 - t2):.1f} ms   sessions match: {'yes' if ok else 'NO'}")
+    return 0 if ok else 1
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--exams", type=int, default=500)
+    ap.add_argument("--rooms", type=int, default=25)
+    ap.add_argument("--days", type=int, default=5)
+    ap.add_argument("--seconds", type=float, default=5.0, help="Local search budget.")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--db-exams", type=int, default=300)
+    ap.add_argument("--db-rooms", type=int, default=8)
+    args = ap.parse_args()
+
+    from project.timetable import solve
+
+    exams, rooms, timeslots = synthetic(args.exams, args.rooms, args.days, args.seed)
+    demand = sum(e.enrollment for e in exams)
+    supply = sum(r.seats for r in rooms) * len(timeslots) * args.days
+    print(f"{len(exams)} exams ({demand} students), {len(rooms)} rooms x {len(timeslots)} slots x "
+          f"{args.days} days ({supply} seat-slots)\n")
+
+    failures = report("greedy", solve(exams, rooms, timeslots, local_search=False), exams)
+    failures += report("greedy + local search",
+                       solve(exams, rooms, timeslots, seconds=args.seconds), exams)
+    failures += provision_bench(args.db_exams, args.db_rooms)
+    if failures:
+        raise SystemExit("timetable check failed")
+
+
+if __name__ == "__main__":
+    main()
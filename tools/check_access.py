@@ -0,0 +1,128 @@
+"""Check that staff-only pages refuse students.
+
+Builds a seeded SQLite database (tools/devdb.py), logs in as a student
+and requests every route in ROUTES: each must answer 403 and leave the
+registrations and check-ins untouched. The same GETs as faculty must not
+be refused. ADMIN_ROUTES must refuse students and faculty but not the
+admin. Exits non-zero on any failure.
+
+    python tools/check_access.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from devdb import ADMIN_EMAIL, login, make_app, seed, student_email  # noqa: E402
+
+# (label, method, url[, request kwargs]); {e}/{l} are filled with a
+# session that has bookings and {r} with one of its registration ids.
+ROUTES = [
+    ("faculty sessions", "get", "/faculty/sessions"),
+    ("faculty session", "get", "/faculty/sessions/{e}/{l}"),
+    ("faculty session cancel", "post", "/faculty/sessions/{e}/{l}/cancel"),
+    ("faculty session move", "post", "/faculty/sessions/{e}/{l}/move"),
+    # Check-in kiosk: the roster carries student names and NSHE ids.
+    ("checkin rooms", "get", "/faculty/checkin"),
+    ("checkin kiosk", "get", "/faculty/checkin/{l}"),
+    ("checkin roster", "get", "/faculty/checkin/{l}/roster.json"),
+    ("checkin sync", "post", "/faculty/checkin/{l}/sync",
+     {"json": {"checkins": [{"reg_id": "{r}"}]}}),
+    # Capacity dashboard: per-session bookings across the term.
+    ("faculty analytics", "get", "/faculty/analytics"),
+]
+
+# Admin-only GETs: students and faculty get 403, the admin does not.
+ADMIN_ROUTES = [
+    # Per-query timings (only routed with SERVER_TIMING on).
+    ("query stats", "/__query_stats"),
+]
+
+
+def _active(app):
+    from sqlalchemy import text
+
+    from project import db
+
+    with app.app_context():
+        return db.session.execute(text(
+            "SELECT COUNT(*) FROM registrations WHERE status = 'Active'")).scalar()
+
+
+def _checkins(app):
+    from sqlalchemy import text
+
+    from project import db
+
+    with app.app_context():
+        return db.session.execute(text("SELECT COUNT(*) FROM checkins")).scalar()
+
+
+def _fill(value, reg_id):
+    """Substitute the registration id into a JSON body template."""
+    if isinstance(value, dict):
+        return {k: _fill(v, reg_id) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, reg_id) for v in value]
+    return reg_id if value == "{r}" else value
+
+
+def main():
+    from sqlalchemy import text
+
+    from project import db
+
+    app = make_app(os.path.join(tempfile.gettempdir(), "ers-access.db"))
+    seed(app, students=20, exams_per_term=5)
+    with app.app_context():
+        r, e, loc = db.session.execute(text(
+            "SELECT id, exam_id, location_id FROM registrations "
+            "WHERE status = 'Active' LIMIT 1")).one()
+
+    failures = 0
+    student = login(app, student_email(1))
+    faculty = login(app, "prof.100001@csn.edu")
+    before = _active(app)
+    for label, method, url, *extra in ROUTES:
+        url = url.format(e=e, l=loc)
+        if extra:
+            kwargs = {k: _fill(v, r) for k, v in extra[0].items()}
+        else:
+            kwargs = {}
+            if method == "post":
+                kwargs = {"data": {"to_location_id": loc, "to_timeslot_id": 1}}
+        status = getattr(student, method)(url, **kwargs).status_code
+        ok = status == 403
+        if method == "get":
+            staff = faculty.get(url).status_code
+            ok = ok and staff != 403
+            print(f"{'ok' if ok else 'FAIL':<5}{label:<28} student {status}, faculty {staff}")
+        else:
+            print(f"{'ok' if ok else 'FAIL':<5}{label:<28} student {status}")
+        failures += not ok
+
+    app.config["SERVER_TIMING"] = True
+    admin = login(app, ADMIN_EMAIL)
+    for label, url in ADMIN_ROUTES:
+        codes = [client.get(url).status_code for client in (student, faculty, admin)]
+        ok = codes[0] == 403 and codes[1] == 403 and codes[2] != 403
+        print(f"{'ok' if ok else 'FAIL':<5}{label:<28} "
+              f"student {codes[0]}, faculty {codes[1]}, admin {codes[2]}")
+        failures += not ok
+
+    after = _active(app)
+    if after != before:
+        print(f"FAIL student requests changed active registrations: {before} -> {after}")
+        failures += 1
+    checked_in = _checkins(app)
+    if checked_in:
+        print(f"FAIL student requests recorded {checked_in} check-ins")
+        failures += 1
+    if failures:
+        raise SystemExit(f"{failures} access check{'s' if failures != 1 else ''} failed")
+    print("staff pages refuse students")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Fail when a hot query stops using an index.
+
+Runs EXPLAIN for the queries on the booking hot path and exits non-zero
+if any of them full-scans a table it should be reaching through an
+index. Each query lists the tables it is allowed to scan (small
+reference tables, or the driving table of a query that lists everything).
+
+By default it builds a seeded SQLite database (tools/devdb.py) and reads
+EXPLAIN QUERY PLAN; point it at MySQL to check the real plans:
+
+    python tools/check_query_plans.py
+    DATABASE_URL=mysql+pymysql://... python tools/check_query_plans.py --no-seed
+
+MySQL picks full scans on near-empty tables regardless of indexes, so run
+it against a database with realistic row counts.
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from devdb import make_app, seed  # noqa: E402
+from explain import driver_form, explain  # noqa: E402
+
+from project import queries  # noqa: E402
+
+TODAY = datetime.date.today()
+
+# name -> (sql, params, tables allowed to scan)
+HOT_QUERIES = {
+    "seat_count": ("""
+        SELECT COUNT(*)
+        FROM registrations r
+        WHERE r.exam_id = :e AND r.location_id = :l AND r.status = 'Active'
+    """, {"e": 1, "l": 1}, set()),
+
+    "active_limit": ("""
+        SELECT COUNT(*)
+        FROM registrations r
+        WHERE r.user_id = :u AND r.status = 'Active'
+    """, {"u": 101}, set()),
+
+    "duplicate_booking": ("""
+        SELECT r.id
+        FROM registrations r
+        WHERE r.user_id = :u AND r.status = 'Active' AND r.exam_id = :e
+    """, {"u": 101, "e": 1}, set()),
+
+    "student_schedule": ("""
+        SELECT r.id, e.exam_date, c.course_code, l.name, b.name
+        FROM registrations r
+        JOIN exams e ON e.id = r.exam_id
+        LEFT JOIN courses c ON c.id = e.course_id
+        LEFT JOIN locations l ON l.id = r.location_id
+        LEFT JOIN buildings b ON b.location_id = l.id
+        WHERE r.user_id = :u
+        ORDER BY e.exam_date DESC
+    """, {"u": 101}, set()),
+
+    "exam_location_label": ("""
+        SELECT l.name, b.name, l.room_number
+        FROM locations l
+        JOIN buildings b ON b.location_id = l.id
+        WHERE l.id = :l
+    """, {"l": 1}, set()),
+
+    # The catalog lists every session, so it scans the session tables;
+    # the per-session seat count must still be an index lookup.
+    "exam_catalog": (queries.EXAM_CATALOG.statement.text, {},
+                     {"locations", "exam_locations", "exams"}),
+
+    "exams_keyset_page": ("""
+        SELECT e.id, e.exam_type, e.exam_date
+        FROM exams e
+        WHERE (e.exam_date, e.id) > (:d, :id)
+        ORDER BY e.exam_date, e.id
+        LIMIT 50
+    """, {"d": TODAY, "id": 0}, set()),
+}
+
+
+def check(app):
+    from project import db
+
+    failures = 0
+    with app.app_context(), db.engine.connect() as conn:
+        for name, (sql, params, allowed) in HOT_QUERIES.items():
+            plan = explain(conn, *driver_form(conn, sql, params))
+            bad = plan.scans - allowed
+            status = "FAIL" if bad else "ok"
+            print(f"{status:<5}{name}"
+                  + (f"  full scan of: {', '.join(sorted(bad))}" if bad else ""))
+            if bad:
+                failures += 1
+                for d in plan.details:
+                    print(f"       {d}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--no-seed", action="store_true",
+                    help="Use DATABASE_URL as-is instead of a seeded SQLite file.")
+    ap.add_argument("--students", type=int, default=300)
+    args = ap.parse_args()
+
+    if args.no_seed:
+        from project import create_app
+        app = create_app()
+    else:
+        app = make_app(os.path.join(tempfile.gettempdir(), "ers-query-plans.db"))
+        seed(app, students=args.students, history_terms=1)
+        from project import db
+        with app.app_context():
+            db.session.execute(db.text("ANALYZE"))
+            db.session.commit()
+
+    failures = check(app)
+    if failures:
+        raise SystemExit(f"{failures} hot quer{'y' if failures == 1 else 'ies'} "
+                         "fell back to a full scan")
+    print("all hot queries use an index")
+
+
+if __name__ == "__main__":
+    main()
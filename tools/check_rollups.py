@@ -0,0 +1,211 @@
+"""Prove booking_rollups and the booking event log match raw registrations.
+
+Builds a seeded SQLite database (tools/devdb.py), rebuilds the rollups
+and backfills the event log. It then drives random writes through the
+real booking service: bookings, reschedules, single cancels, and bulk
+session cancels and moves. Then it cancels and reschedules from reads
+that are already out of date (a double cancel, a stale schedule snapshot,
+a stale session roster). It also archives a term. After each phase it
+checks analytics.verify() against a raw recount. It also replays
+booking_events (project.events), timing the replay, and compares the
+result with both the registrations and the rollups; an event that does
+not fit its registration's state (such as a second cancel) also fails.
+Finally it corrupts one rollup row to make sure verify() notices. Exits
+non-zero on any mismatch.
+
+    python tools/check_rollups.py
+    python tools/check_rollups.py --operations 2000 --seed 11
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from devdb import make_app, seed  # noqa: E402
+
+
+def _phase(name, verify, have_label="rollup", want_label="raw"):
+    mismatches = verify()
+    status = "FAIL" if mismatches else "ok"
+    print(f"{status:<5}{name}")
+    for key, have, want in mismatches[:10]:
+        print(f"       {key}: {have_label} {have} != {want_label} {want}")
+    return len(mismatches)
+
+
+def _replay_checks():
+    import time
+
+    from project.events import replay
+
+    started = time.perf_counter()
+    result = replay()
+    elapsed = time.perf_counter() - started
+    print(f"     replayed {result.events} events in {elapsed:.2f}s")
+    # Events that don't fit the registration's state, e.g. a second cancel.
+    problems = [(f"registration {rid}", f"{kind} event {eid}", "(unexpected in its state)")
+                for eid, rid, kind in result.problems]
+    return lambda: result.state_mismatches() + result.rollup_mismatches() + problems
+
+
+def _random_writes(rng, operations):
+    from sqlalchemy import text
+
+    from project import db, queries
+    from project.bookings import (BookingRejected, cancel_booking, cancel_session, create_booking,
+                                  move_session)
+
+    today = datetime.date.today()
+    sessions = db.session.execute(text("""
+        SELECT el.exam_id, el.location_id
+        FROM exam_locations el JOIN exams e ON e.id = el.exam_id
+        WHERE e.exam_date >= :today
+    """), {"today": today}).all()
+    students = db.session.execute(text("SELECT id FROM users WHERE role_id = 2")).scalars().all()
+
+    def active_reg():
+        return db.session.execute(text("""
+            SELECT id FROM registrations WHERE status = 'Active' ORDER BY RANDOM() LIMIT 1
+        """)).scalar()
+
+    rejected = 0
+    for _ in range(operations):
+        op = rng.random()
+        exam_id, location_id = rng.choice(sessions)
+        try:
+            if op < 0.45:
+                create_booking(rng.choice(students), exam_id, location_id, rng.randint(1, 9))
+            elif op < 0.60:
+                rid = active_reg()
+                reg = queries.REGISTRATION.first(rid=rid)
+                if rng.random() < 0.5:
+                    # Same exam, another room or time: the row is moved in place.
+                    exam_id = reg["exam_id"]
+                    location_id = rng.choice([loc for e, loc in sessions if e == exam_id]
+                                             or [reg["location_id"]])
+                create_booking(reg["user_id"], exam_id, location_id, rng.randint(1, 9),
+                               replaces=rid)
+            elif op < 0.85:
+                cancel_booking(queries.REGISTRATION.first(rid=active_reg()))
+            elif op < 0.93:
+                cancel_session(exam_id, location_id, rng.choice([None, rng.randint(1, 9)]))
+            else:
+                to_location = rng.choice([loc for e, loc in sessions if e == exam_id])
+                move_session(exam_id, location_id, to_location, rng.randint(1, 9),
+                             rng.choice([None, rng.randint(1, 9)]))
+        except BookingRejected:
+            # Refused bookings must leave the rollups and event log alone too.
+            rejected += 1
+    return rejected
+
+
+def _stale_writes(rng, count):
+    """Writes made from reads that are already out of date.
+
+    Each round cancels a registration twice from the same read (a student
+    and a faculty cancel racing past the status check), reschedules away
+    from a registration canceled behind the student's snapshot, and
+    cancels a session from a roster read before one of its rows was
+    canceled. None of them may count or log anything twice.
+    """
+    from sqlalchemy import text
+
+    from project import bookings, db, queries, schedule
+    from project.bookings import BookingRejected, cancel_booking, cancel_session, create_booking
+
+    def active_reg():
+        return queries.REGISTRATION.first(rid=db.session.execute(text("""
+            SELECT r.id FROM registrations r JOIN exams e ON e.id = r.exam_id
+            WHERE r.status = 'Active' AND e.exam_date >= :today ORDER BY RANDOM() LIMIT 1
+        """), {"today": datetime.date.today()}).scalar())
+
+    exams = db.session.execute(text("SELECT exam_id, location_id FROM exam_locations")).all()
+    read_sessions = bookings.session_registrations
+    for _ in range(count):
+        reg = active_reg()
+        cancel_booking(reg)
+        cancel_booking(reg)
+
+        reg = active_reg()
+        # Canceled in "another worker": this process keeps its snapshot.
+        snapshot = schedule.get_schedule(reg["user_id"])
+        schedule.invalidate(reg["user_id"])
+        cancel_booking(reg)
+        schedule._snapshots.set(reg["user_id"], snapshot)
+        exam_id, location_id = rng.choice(exams)
+        try:
+            create_booking(reg["user_id"], exam_id, location_id, rng.randint(1, 9),
+                           replaces=reg["id"])
+        except BookingRejected:
+            pass
+
+        reg = active_reg()
+        stale = [read_sessions(reg["exam_id"], reg["location_id"])]
+        cancel_booking(reg)
+        bookings.session_registrations = lambda *a: stale.pop() if stale else read_sessions(*a)
+        try:
+            cancel_session(reg["exam_id"], reg["location_id"])
+        finally:
+            bookings.session_registrations = read_sessions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", type=int, default=300)
+    ap.add_argument("--operations", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args()
+
+    app = make_app(os.path.join(tempfile.gettempdir(), "ers-rollups.db"))
+    seed(app, students=args.students, history_terms=1)
+    rng = random.Random(args.seed)
+
+    from sqlalchemy import text
+
+    from project import db
+    from project.analytics import rebuild, verify
+    from project.archive import archive_registrations
+    from project.events import backfill
+
+    failures = 0
+    with app.app_context():
+        print(f"rebuilt {rebuild()} rollup rows, backfilled {backfill()} events")
+        failures += _phase("after rebuild", verify)
+        failures += _phase("event replay after backfill", _replay_checks(), "stored", "replay")
+
+        rejected = _random_writes(rng, args.operations)
+        print(f"{rejected} of {args.operations} random writes refused by the booking rules")
+        failures += _phase(f"after {args.operations} random writes", verify)
+        failures += _phase("event replay after random writes", _replay_checks(), "stored", "replay")
+
+        _stale_writes(rng, 10)
+        failures += _phase("after cancels and reschedules from stale reads", verify)
+        failures += _phase("event replay after stale reads", _replay_checks(), "stored", "replay")
+
+        archive_registrations(datetime.date.today() - datetime.timedelta(days=1), batch_size=500)
+        failures += _phase("after archiving the past term", verify)
+        failures += _phase("event replay after archiving", _replay_checks(), "stored", "replay")
+
+        db.session.execute(text("""
+            UPDATE booking_rollups SET bookings = bookings + 1
+            WHERE exam_id = (SELECT MIN(exam_id) FROM booking_rollups)
+        """))
+        db.session.commit()
+        if not verify():
+            print("FAIL verify() missed a corrupted rollup row")
+            failures += 1
+        else:
+            print("ok   verify() catches a corrupted rollup row")
+
+    if failures:
+        raise SystemExit(f"{failures} rollup mismatch(es)")
+    print("rollups and event log match raw counts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Throwaway SQLite database for the benchmarks and checks in tools/.
+
+Not used by the app itself. Production runs on MySQL; this only stands in
+so the tools can build a seeded database anywhere:
+
+    from devdb import make_app, seed, login
+    app = make_app("/tmp/ers-bench.db")
+    seed(app, students=500, history_terms=4)
+    client = login(app, "0000000001@student.csn.edu")
+"""
+import datetime
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+PASSWORD = "password123"
+ADMIN_EMAIL = "admin.100006@csn.edu"
+
+
+def _sqlite_functions(dbapi_conn, record):
+    # MySQL functions used by the app's raw SQL.
+    dbapi_conn.create_function(
+        "NOW", 0, lambda: datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    )
+    dbapi_conn.create_function("CURDATE", 0, lambda: datetime.date.today().isoformat())
+
+
+def make_app(path, fresh=True):
+    """create_app() bound to a SQLite file, with the schema created."""
+    if fresh and os.path.exists(path):
+        os.remove(path)
+    # detect_types makes DATE/TIMESTAMP columns come back as date objects,
+    # the way PyMySQL returns them.
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}?detect_types=3"
+    os.environ.setdefault("CREATE_ALL_ON_STARTUP", "0")
+
+    from sqlalchemy import event
+
+    from project import create_app, db
+
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["TESTING"] = True
+
+    with app.app_context():
+        event.listen(db.engine, "connect", _sqlite_functions)
+        db.engine.dispose()
+
+        from project import models  # noqa: F401  (register tables)
+
+        db.create_all()
+    return app
+
+
+def student_email(n):
+    return f"{n:010d}@student.csn.edu"
+
+
+def seed(app, students=200, exams_per_term=40, locations=4, history_terms=0,
+         bookings_per_student=3, term_days=90, rng_seed=7):
+    """Fill the database with one current term plus ``history_terms`` past ones.
+
+    Users 1..5 are faculty/professors, user 6 is an admin (ADMIN_EMAIL)
+    and students start at id 100. Returns a dict of the generated id ranges.
+    """
+    from sqlalchemy import text
+    from werkzeug.security import generate_password_hash
+
+    from project import db
+
+    rng = random.Random(rng_seed)
+    pw = generate_password_hash(PASSWORD)
+    today = datetime.date.today()
+
+    def insert(table, rows):
+        if not rows:
+            return
+        cols = list(rows[0])
+        db.session.execute(
+            text(f"INSERT INTO {table} ({', '.join(cols)}) "
+                 f"VALUES ({', '.join(':' + c for c in cols)})"),
+            rows,
+        )
+
+    with app.app_context():
+        insert("roles", [
+            {"id": 1, "name": "faculty"}, {"id": 2, "name": "student"}, {"id": 3, "name": "admin"},
+        ])
+        insert("departments", [{"id": 1, "name": "Computer and Information Technology"}])
+        insert("majors", [{"id": 1, "name": "Computer Science", "department_id": 1}])
+        insert("courses", [
+            {"id": i, "course_code": f"CS{100 + i}", "course_name": f"Course {i}",
+             "department_id": 1}
+            for i in range(1, 11)
+        ])
+        insert("locations", [
+            {"id": i, "name": f"Campus {i}", "room_number": f"R-{i}00",
+             "max_seats": (24, 30, 40, 60)[i % 4]}
+            for i in range(1, locations + 1)
+        ])
+        insert("buildings", [
+            {"id": i, "name": f"Building {chr(64 + i)}", "location_id": i}
+            for i in range(1, locations + 1)
+        ])
+        insert("timeslots", [
+            {"id": i, "start_time": f"{h:02d}:00:00", "end_time": f"{h + 1:02d}:00:00"}
+            for i, h in enumerate(range(8, 17), start=1)
+        ])
+
+        faculty = [
+            {"id": i, "name": f"Professor {i}", "email": f"prof.{100000 + i}@csn.edu",
+             "phone": "7025550000", "nshe_id": None, "employee_id": str(100000 + i),
+             "password_hash": pw, "role_id": 1, "department_id": 1, "major_id": None,
+             "status": "Active"}
+            for i in range(1, 6)
+        ]
+        pupils = [
+            {"id": 100 + n, "name": f"Student {n}", "email": student_email(n),
+             "phone": "7025550000", "nshe_id": f"{n:010d}", "employee_id": None,
+             "password_hash": pw, "role_id": 2, "department_id": 1, "major_id": 1,
+             "status": "Active"}
+            for n in range(1, students + 1)
+        ]
+        admin = {"id": 6, "name": "Admin", "email": ADMIN_EMAIL, "phone": "7025550000",
+                 "nshe_id": None, "employee_id": "100006", "password_hash": pw, "role_id": 3,
+                 "department_id": 1, "major_id": None, "status": "Active"}
+        insert("users", faculty + [admin] + pupils)
+        insert("professors", [{"id": i, "user_id": i, "title": "Dr."} for i in range(1, 6)])
+
+        exams, sessions, regs = [], [], []
+        exam_id = 0
+        reg_id = 0
+        for term in range(history_terms, -1, -1):  # oldest first, current term last
+            term_start = (today - datetime.timedelta(days=term * term_days)
+                          + datetime.timedelta(days=1))
+            term_exams = []
+            for _ in range(exams_per_term):
+                exam_id += 1
+                loc = rng.randint(1, locations)
+                exam_date = term_start + datetime.timedelta(days=rng.randint(0, term_days - 30))
+                exams.append({
+                    "id": exam_id, "exam_type": f"CS{100 + exam_id % 10 + 1} Exam {exam_id}",
+                    "course_id": exam_id % 10 + 1,
+                    "exam_date": exam_date.isoformat(),
+                    "location_id": loc, "building_id": loc, "capacity": 20,
+                    "professor_id": exam_id % 5 + 1,
+                })
+                for location_id in range(1, locations + 1):
+                    sessions.append({"exam_id": exam_id, "location_id": location_id,
+                                     "capacity": 20})
+                term_exams.append(exam_id)
+
+            for p in pupils:
+                for e in rng.sample(term_exams, min(bookings_per_student, len(term_exams))):
+                    reg_id += 1
+                    regs.append({
+                        "id": reg_id, "registration_id": f"CSN{reg_id:06d}", "exam_id": e,
+                        "user_id": p["id"], "timeslot_id": rng.randint(1, 9),
+                        # each course leans toward one campus, so demand is uneven
+                        "location_id": rng.choices(range(1, locations + 1),
+                                                   [3 if i == e % locations + 1 else 1
+                                                    for i in range(1, locations + 1)])[0],
+                        "registration_date": (term_start - datetime.timedelta(
+                            days=rng.randint(1, 30))).isoformat(),
+                        "status": "Active" if rng.random() < 0.85 else "Canceled",
+                    })
+
+        insert("exams", exams)
+        insert("exam_locations", sessions)
+        for i in range(0, len(regs), 5000):
+            insert("registrations", regs[i:i + 5000])
+        db.session.commit()
+
+    return {"students": (101, 100 + students), "exams": exam_id, "registrations": reg_id}
+
+
+def login(app, email, password=PASSWORD):
+    client = app.test_client()
+    resp = client.post("/login", data={"email": email, "password": password})
+    assert resp.status_code == 302, f"login failed for {email}"
+    return client
@@ -0,0 +1,97 @@
+"""EXPLAIN helpers shared by check_query_plans.py and query_plan_report.py.
+
+Works on the statement as the DB-API driver sees it (qmark for SQLite,
+pyformat for PyMySQL), which is what the instrumentation captures, and
+normalises the two databases' plan output into a Plan:
+
+  scans          tables read in full (by real table name, not alias)
+  rows_examined  MySQL's nested-loop row estimate; None on SQLite, which
+                 has no row estimates in EXPLAIN QUERY PLAN
+  indexes        index names the plan uses
+  details        the raw plan lines, for the report
+"""
+import datetime
+import re
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+
+EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b", re.I)
+_ALIAS_RE = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE)\s+`?(\w+)`?"
+    r"(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|INNER\b|ORDER\b|GROUP\b|LIMIT\b|SET\b)(\w+))?",
+    re.I,
+)
+_SQLITE_INDEX_RE = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+
+@dataclass
+class Plan:
+    scans: set = field(default_factory=set)
+    rows_examined: int = None
+    indexes: set = field(default_factory=set)
+    details: list = field(default_factory=list)
+
+
+def table_aliases(sql):
+    """{alias or table name: table name} for the FROM/JOIN/UPDATE targets."""
+    aliases = {}
+    for table, alias in _ALIAS_RE.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def driver_form(conn, sql, params):
+    """Compile a text() statement with named params to the driver's form."""
+    compiled = text(sql).compile(dialect=conn.dialect)
+    values = compiled.construct_params(params)
+    if conn.dialect.name == "sqlite":
+        values = {k: v.isoformat() if isinstance(v, datetime.date) else v
+                  for k, v in values.items()}
+    if compiled.positional:
+        return compiled.string, tuple(values[k] for k in compiled.positiontup)
+    return compiled.string, values
+
+
+def explain(conn, statement, parameters=()):
+    """Plan for one driver-level statement (nothing is executed)."""
+    if conn.dialect.name == "sqlite":
+        return _explain_sqlite(conn, statement, parameters)
+    return _explain_mysql(conn, statement, parameters)
+
+
+def _explain_sqlite(conn, statement, parameters):
+    aliases = table_aliases(statement)
+    plan = Plan()
+    for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all():
+        detail = row[-1]
+        plan.details.append(detail)
+        # "SCAN r" and "SCAN r USING COVERING INDEX ix" both read every row.
+        if detail.startswith("SCAN ") and "CONSTANT ROW" not in detail:
+            name = detail.split()[1]
+            plan.scans.add(aliases.get(name, name))
+        plan.indexes.update(_SQLITE_INDEX_RE.findall(detail))
+    return plan
+
+
+def _explain_mysql(conn, statement, parameters):
+    aliases = table_aliases(statement)
+    plan = Plan(rows_examined=0)
+    loop = 1
+    for row in conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all():
+        name = row["table"]
+        plan.details.append(
+            f"{row['select_type']} {name}: type={row['type']} key={row['key']} rows={row['rows']}"
+        )
+        if name is None or name.startswith("<"):  # derived/union placeholders
+            continue
+        if row["type"] in ("ALL", "index"):
+            plan.scans.add(aliases.get(name, name))
+        if row["key"]:
+            plan.indexes.add(row["key"])
+        # Each table is probed once per row produced by the tables before it.
+        loop *= max(int(row["rows"] or 1), 1)
+        plan.rows_examined += loop
+    return plan
@@ -0,0 +1,94 @@
+"""Measure worker boot cost: module import times and create_app() time.
+
+Runs the app factory in a fresh interpreter with ``-X importtime`` so the
+numbers match what a gunicorn worker pays on boot (or what the master pays
+once with ``preload_app``).
+
+Usage:
+    python tools/profile_startup.py            # 5 runs, top 15 modules
+    python tools/profile_startup.py --runs 10 --top 30
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import project
+t1 = time.perf_counter()
+app = project.create_app()
+t2 = time.perf_counter()
+print(json.dumps({"import_project": t1 - t0, "create_app": t2 - t1}))
+"""
+
+
+def _run_once():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "CREATE_ALL_ON_STARTUP": os.environ.get("CREATE_ALL_ON_STARTUP", "0")},
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(proc.returncode)
+
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # "import time: self [us] | cumulative | imported package"
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cum_us, name = line.split(":", 1)[1].split("|")
+        modules[name.strip()] = (int(self_us), int(cum_us))
+    return timings, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = []
+    per_module = {}
+    for _ in range(args.runs):
+        t, mods = _run_once()
+        timings.append(t)
+        for name, (self_us, cum_us) in mods.items():
+            per_module.setdefault(name, []).append((self_us, cum_us))
+
+    def med(key):
+        return statistics.median(t[key] for t in timings) * 1000
+
+    print(f"runs: {args.runs}")
+    print(f"import project : {med('import_project'):8.1f} ms")
+    print(f"create_app()   : {med('create_app'):8.1f} ms")
+    print()
+
+    rows = [
+        (name, statistics.median(s for s, _ in v) / 1000, statistics.median(c for _, c in v) / 1000)
+        for name, v in per_module.items()
+    ]
+
+    print("project modules (self / cumulative ms)")
+    for name, self_ms, cum_ms in sorted(rows, key=lambda r: -r[2]):
+        if name == "project" or name.startswith("project."):
+            print(f"  {name:40s} {self_ms:8.1f} {cum_ms:8.1f}")
+    print()
+
+    print(f"top {args.top} imports by cumulative ms")
+    for name, self_ms, cum_ms in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"  {name:40s} {self_ms:8.1f} {cum_ms:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Per-endpoint query-plan report with budgets.
+
+Drives the student and faculty hot paths through the Flask test client
+with CAPTURE_SQL on, so every statement a request really executes is
+recorded (f-string-built WHERE clauses included). Each captured SELECT,
+UPDATE and DELETE is EXPLAINed and checked against the endpoint's budget:
+
+  max_queries  statements executed by the request
+  max_rows     MySQL's estimated rows examined for any single statement
+               (SQLite has no row estimates, so only scans are checked there)
+  scans        tables the endpoint may read in full, on top of the small
+               reference tables every page joins
+
+and no statement may touch the tables project.refdata keeps in memory.
+Session-store statements (project.sessions) are counted apart from
+max_queries: every request may add one keyed read of web_sessions and
+one write when the session changed.
+
+Exits non-zero if any endpoint is over budget, so it can gate a deploy.
+
+    python tools/query_plan_report.py                      # seeded SQLite
+    python tools/query_plan_report.py --json plans.json    # also write the raw report
+    DATABASE_URL=mysql+pymysql://... python tools/query_plan_report.py --no-seed \\
+        --student-email 1234567890@student.csn.edu --faculty-email x.123456@csn.edu \\
+        --admin-email admin@csn.edu --password ...
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from devdb import ADMIN_EMAIL, PASSWORD, make_app, seed, student_email  # noqa: E402
+from explain import EXPLAINABLE, explain, table_aliases  # noqa: E402
+
+# Lookup tables with a handful of rows; scanning them is cheaper than an index.
+REFERENCE_TABLES = {"courses", "timeslots"}
+
+# Served from project.refdata; hot-path SQL must not touch them at all.
+CACHED_TABLES = {"roles", "departments", "majors", "locations", "buildings"}
+
+# Session tables behind the exam catalog, and the tables the staff listings join.
+CATALOG_SCANS = {"exam_locations", "exams", "professors"}
+LISTING_SCANS = {"registrations", "exams", "users", "professors"}
+
+# max_queries is the round-trip count. The scheduling flow (exams GET →
+# review POST → confirm) shares one catalog load (project.loaders), so the
+# review step must not query beyond the user lookup. Writes include one
+# booking_rollups UPDATE per touched slot (project.analytics) and one
+# batched booking_events INSERT (project.events).
+BUDGETS = {
+    "student dashboard":        {"max_queries": 1,  "max_rows": 10,     "scans": set()},
+    "student exams":            {"max_queries": 3,  "max_rows": 50000,  "scans": CATALOG_SCANS},
+    "student exams review":     {"max_queries": 1,  "max_rows": 50000,  "scans": CATALOG_SCANS},
+    "student confirm":          {"max_queries": 7,  "max_rows": 1000,   "scans": set()},
+    # Seat poll (sync workers): the user lookup plus one keyed seat count.
+    "student seat poll":        {"max_queries": 2,  "max_rows": 1000,   "scans": set()},
+    "student appointments":     {"max_queries": 1,  "max_rows": 1000,   "scans": set()},
+    "student start reschedule": {"max_queries": 3,  "max_rows": 10,     "scans": set()},
+    "student cancel":           {"max_queries": 6,  "max_rows": 1000,   "scans": set()},
+    "faculty dashboard":        {"max_queries": 1,  "max_rows": 10,     "scans": set()},
+    # The print log and search list or LIKE-filter everything by design.
+    "faculty print log":        {"max_queries": 2,  "max_rows": 200000, "scans": LISTING_SCANS},
+    "faculty search":           {"max_queries": 2,  "max_rows": 200000, "scans": LISTING_SCANS},
+    # Capacity dashboard reads booking_rollups only.
+    "faculty analytics":        {"max_queries": 2,  "max_rows": 5000,   "scans": set()},
+    # Kiosk: roster once per room and day, then one read + one batched write per sync.
+    "faculty checkin roster":   {"max_queries": 2,  "max_rows": 1000,   "scans": set()},
+    "faculty checkin roster 304": {"max_queries": 1, "max_rows": 10,    "scans": set()},
+    "faculty checkin sync":     {"max_queries": 3,  "max_rows": 1000,   "scans": set()},
+    # Admin lists: the user lookup plus one keyset page on the primary key.
+    "admin users":              {"max_queries": 2,  "max_rows": 1000,   "scans": set()},
+    "admin users next page":    {"max_queries": 2,  "max_rows": 1000,   "scans": set()},
+    "admin users by email":     {"max_queries": 2,  "max_rows": 1000,   "scans": set()},
+    "admin exams":              {"max_queries": 2,  "max_rows": 1000,   "scans": set()},
+    "admin sessions":           {"max_queries": 2,  "max_rows": 1000,   "scans": set()},
+}
+
+# project.sessions: one keyed read, plus one write when the session changed.
+SESSION_MAX_QUERIES = 2
+_SESSION_SQL = re.compile(r"\bweb_sessions\b")
+
+
+def _capture(app):
+    """Collect g.timings.statements for every request into a list."""
+    from flask import g
+
+    captured = []
+
+    @app.after_request
+    def _grab(response):
+        timings = g.get("timings")
+        if timings is not None and timings.statements is not None:
+            captured.append(list(timings.statements))
+        return response
+
+    return captured
+
+
+def _student_steps(app, email):
+    from sqlalchemy import text
+
+    from project import db
+
+    with app.app_context():
+        uid = db.session.execute(
+            text("SELECT id FROM users WHERE email = :e"), {"e": email}).scalar()
+        booked = set(db.session.execute(
+            text("SELECT exam_id FROM registrations WHERE user_id = :u"), {"u": uid}).scalars())
+        session = db.session.execute(text("""
+            SELECT el.exam_id, el.location_id
+            FROM exam_locations el
+            JOIN exams e ON e.id = el.exam_id
+            WHERE e.exam_date >= CURRENT_DATE
+            ORDER BY e.exam_date
+        """)).all()
+        exam_id, location_id = next((e, l) for e, l in session if e not in booked)
+
+    form = {"exam_id": exam_id, "location_id": location_id, "timeslot_id": 3}
+
+    def new_reg_id():
+        with app.app_context():
+            return db.session.execute(text("""
+                SELECT id FROM registrations
+                WHERE user_id = :u AND exam_id = :e AND status = 'Active'
+            """), {"u": uid, "e": exam_id}).scalar()
+
+    return [
+        ("student dashboard", "get", lambda: "/student/dashboard", None),
+        ("student exams", "get", lambda: "/student/exams", None),
+        ("student exams review", "post", lambda: "/student/exams", form),
+        ("student seat poll", "get",
+         lambda: f"/student/exams/seats?sessions={exam_id}:{location_id}", None),
+        ("student confirm", "post", lambda: "/student/confirm-final", form),
+        ("student appointments", "get", lambda: "/student/appointments", None),
+        ("student start reschedule", "post",
+         lambda: f"/student/appointments/{new_reg_id()}/start-reschedule", None),
+        ("student cancel", "post", lambda: f"/student/appointments/{new_reg_id()}/cancel", None),
+    ]
+
+
+def _faculty_steps(app):
+    from sqlalchemy import text
+
+    from project import db
+
+    # The busiest room-day with upcoming Active registrations.
+    with app.app_context():
+        location_id, day = db.session.execute(text("""
+            SELECT r.location_id, e.exam_date
+            FROM registrations r
+            JOIN exams e ON e.id = r.exam_id
+            WHERE r.status = 'Active' AND e.exam_date >= CURRENT_DATE
+            GROUP BY r.location_id, e.exam_date
+            ORDER BY COUNT(*) DESC
+            LIMIT 1
+        """)).one()
+        reg_ids = db.session.execute(text("""
+            SELECT r.id
+            FROM registrations r
+            JOIN exams e ON e.id = r.exam_id
+            WHERE r.status = 'Active' AND r.location_id = :l AND e.exam_date = :d
+        """), {"l": location_id, "d": day}).scalars().all()
+
+    roster = f"/faculty/checkin/{location_id}/roster.json?date={day}"
+    etag = {}
+
+    def conditional():
+        return {"If-None-Match": etag["value"]}
+
+    return [
+        ("faculty dashboard", "get", lambda: "/faculty/dashboard", None),
+        ("faculty print log", "get", lambda: "/faculty/print_log?status=Active&exam=Exam", None),
+        ("faculty search", "post", lambda: "/faculty/search_appointments",
+         {"search_term": "Student 1"}),
+        ("faculty analytics", "get", lambda: "/faculty/analytics", None),
+        ("faculty checkin roster", "get", lambda: roster, None, etag),
+        ("faculty checkin roster 304", "get", lambda: roster, None, conditional),
+        ("faculty checkin sync", "post", lambda: f"/faculty/checkin/{location_id}/sync",
+         {"json": {"date": str(day), "checkins": [{"reg_id": rid} for rid in reg_ids]}}),
+    ]
+
+
+def _admin_steps(app):
+    return [
+        ("admin users", "get", lambda: "/admin/users", None),
+        ("admin users next page", "get", lambda: "/admin/users?after=150", None),
+        ("admin users by email", "get", lambda: "/admin/users?email=00000001", None),
+        ("admin exams", "get", lambda: "/admin/exams?start=2000-01-01", None),
+        ("admin sessions", "get", lambda: "/admin/sessions?location_id=1", None),
+    ]
+
+
+def run(app, student, faculty, password, admin=None):
+    from project import db
+
+    app.config["CAPTURE_SQL"] = True
+    captured = _capture(app)
+    report = {}
+
+    logins = [(student, _student_steps(app, student)), (faculty, _faculty_steps(app))]
+    if admin:
+        logins.append((admin, _admin_steps(app)))
+    for email, steps in logins:
+        client = app.test_client()
+        client.post("/login", data={"email": email, "password": password})
+        for label, method, url, data, *extra in steps:
+            del captured[:]
+            kwargs = dict(data) if data and "json" in data else {"data": data}
+            if extra and callable(extra[0]):
+                kwargs["headers"] = extra[0]()
+            resp = getattr(client, method)(url(), **kwargs)
+            if extra and isinstance(extra[0], dict):
+                extra[0]["value"] = resp.headers.get("ETag")
+            statements = captured[0] if captured else []
+            session_queries = sum(1 for sql, _, _ in statements if _SESSION_SQL.search(sql))
+            statements = [st for st in statements if not _SESSION_SQL.search(st[0])]
+            report[label] = {"status": resp.status_code, "queries": len(statements),
+                             "session_queries": session_queries, "statements": []}
+
+            with app.app_context(), db.engine.connect() as conn:
+                for sql, params, executemany in statements:
+                    if executemany or not EXPLAINABLE.match(sql):
+                        continue
+                    plan = explain(conn, sql, params)
+                    report[label]["statements"].append({
+                        "sql": " ".join(sql.split()),
+                        "tables": sorted(set(table_aliases(sql).values())),
+                        "scans": sorted(plan.scans),
+                        "indexes": sorted(plan.indexes),
+                        "rows_examined": plan.rows_examined,
+                        "plan": plan.details,
+                    })
+    return report
+
+
+def check(report):
+    """Print the report and return the number of budget violations."""
+    violations = 0
+    for label, entry in report.items():
+        budget = BUDGETS.get(label)
+        problems = []
+        if entry["session_queries"] > SESSION_MAX_QUERIES:
+            problems.append(f"{entry['session_queries']} session queries > {SESSION_MAX_QUERIES}")
+        if budget:
+            if entry["queries"] > budget["max_queries"]:
+                problems.append(f"{entry['queries']} queries > {budget['max_queries']}")
+            allowed = REFERENCE_TABLES | budget["scans"]
+            for st in entry["statements"]:
+                cached = set(st["tables"]) & CACHED_TABLES
+                if cached:
+                    problems.append(f"queries cached reference data "
+                                    f"({', '.join(sorted(cached))}): {st['sql'][:90]}")
+                bad = set(st["scans"]) - allowed
+                if bad:
+                    problems.append(f"full scan of {', '.join(sorted(bad))}: {st['sql'][:90]}")
+                if st["rows_examined"] is not None and st["rows_examined"] > budget["max_rows"]:
+                    problems.append(f"~{st['rows_examined']} rows > {budget['max_rows']}: "
+                                    f"{st['sql'][:90]}")
+
+        status = "FAIL" if problems else "ok"
+        print(f"{status:<5}{label:<26} HTTP {entry['status']}  {entry['queries']} queries"
+              f" (+{entry['session_queries']} session)")
+        for st in entry["statements"]:
+            rows = "" if st["rows_examined"] is None else f" ~{st['rows_examined']} rows"
+            idx = ", ".join(st["indexes"]) or "-"
+            print(f"       [{idx}]{rows}  {st['sql'][:100]}")
+        for p in problems:
+            print(f"     ! {p}")
+        violations += len(problems)
+    return violations
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--no-seed", action="store_true",
+                    help="Use DATABASE_URL as-is instead of a seeded SQLite file.")
+    ap.add_argument("--students", type=int, default=300)
+    ap.add_argument("--student-email", default=student_email(1))
+    ap.add_argument("--faculty-email", default="prof.100001@csn.edu")
+    ap.add_argument("--admin-email", default=ADMIN_EMAIL, help="Empty to skip the admin pages.")
+    ap.add_argument("--password", default=PASSWORD)
+    ap.add_argument("--json", help="Write the full report to this file.")
+    args = ap.parse_args()
+
+    if args.no_seed:
+        from project import create_app
+        app = create_app()
+        app.config["WTF_CSRF_ENABLED"] = False
+    else:
+        app = make_app(os.path.join(tempfile.gettempdir(), "ers-plan-report.db"))
+        seed(app, students=args.students, bookings_per_student=2)
+        from project import db
+        from project.analytics import rebuild
+        with app.app_context():
+            rebuild()
+            db.session.execute(db.text("ANALYZE"))
+            db.session.commit()
+
+    report = run(app, args.student_email, args.faculty_email, args.password, args.admin_email)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    violations = check(report)
+    if violations:
+        raise SystemExit(f"{violations} budget violation{'s' if violations != 1 else ''}")
+    print("all endpoints within budget")
+
+
+if __name__ == "__main__":
+    main()